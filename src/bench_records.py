@@ -0,0 +1,38 @@
+import timeit
+
+from pymysql.constants import FIELD_TYPE
+from sqlalchemy import text
+
+from matdb.backend.mysql import MySQLBackend
+from matdb.backend.record import record_factory
+from sqlalchemy.engine.cursor import CursorResultMetaData
+
+# Per-row cost of building records for a typical 6-column result of plain
+# ints and strings, without a database connection.
+backend = MySQLBackend("mysql://localhost/test")
+connection = backend.connection()
+_, _, context = connection._compile(text("SELECT * FROM emp"))
+description = [
+    (name, type_code, None, None, None, None, True)
+    for name, type_code in (
+        ("emp_id", FIELD_TYPE.LONG),
+        ("dept_id", FIELD_TYPE.LONG),
+        ("emp_name", FIELD_TYPE.VAR_STRING),
+        ("title", FIELD_TYPE.VAR_STRING),
+        ("city", FIELD_TYPE.VAR_STRING),
+        ("salary", FIELD_TYPE.LONGLONG),
+    )
+]
+rows = [(i, i % 10, f"name{i}", "engineer", "Chennai", 1000 * i) for i in range(10000)]
+
+
+def build(record_class):
+    metadata = CursorResultMetaData(context, description)
+    make_record = record_factory(metadata, record_class)
+    return list(map(make_record, rows))
+
+
+if __name__ == "__main__":
+    for record_class in ("row", "compact"):
+        seconds = min(timeit.repeat(lambda: build(record_class), number=10, repeat=5))
+        print(f"{record_class:>8}: {seconds / 10 / len(rows) * 1e9:8.1f} ns/row")
@@ -1,4 +1,6 @@
 from matdb.core import Database, DatabaseURL
+from matdb.aio import AsyncDatabase
+from matdb.sharding import ShardedDatabase
 
 __version__ = "0.0.2"
-__all__ = ["Database", "DatabaseURL"]
\ No newline at end of file
+__all__ = ["AsyncDatabase", "Database", "DatabaseURL", "ShardedDatabase"]
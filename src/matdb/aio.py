@@ -0,0 +1,346 @@
+import asyncio
+import functools
+import itertools
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from types import TracebackType
+
+from sqlalchemy.sql import ClauseElement
+
+from matdb.core import Connection, Database, DatabaseURL
+from matdb.interfaces import Record
+
+__all__ = ["AsyncDatabase", "AsyncTransaction"]
+
+# Records fetched per round trip to the worker thread by AsyncDatabase.iterate.
+ITERATE_CHUNK_SIZE = 500
+
+
+class _Worker:
+    """
+    A single thread. Everything a lease runs happens on it, so the thread's
+    task-local Database connection stays the same for the whole lease.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    async def run(self, func: typing.Callable, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        future = self._executor.submit(func, *args, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class _NativeLease:
+    """Backend connection held by a task for an asyncio backend transaction."""
+
+    def __init__(self, connection: typing.Any) -> None:
+        self.connection = connection
+        self.depth = 0
+
+
+class AsyncDatabase:
+    """
+    asyncio facade over a Database, offloading every call to a worker thread.
+
+    A call leases one worker for its duration; a transaction leases one for
+    the whole `async with` block, so the statements of the transaction all
+    run on the thread holding its connection. There are as many workers as
+    the pool has connections (`max_workers`, by default the pool's
+    maxsize), so a waiting coroutine waits for a worker rather than tying
+    up a thread blocked on the pool.
+
+    With an asyncio backend (`mysql+async://`) no thread is involved: calls
+    await the backend connection directly, and a transaction leases the
+    connection instead of a worker.
+    """
+
+    def __init__(
+        self,
+        url: typing.Union[str, DatabaseURL, Database],
+        *,
+        max_workers: int = None,
+        **options: typing.Any,
+    ) -> None:
+        self.database = url if isinstance(url, Database) else Database(url, **options)
+        self._max_workers = max_workers
+        self._native = getattr(self.database._backend, "is_async", False)
+        self._workers = []  # type: typing.List[_Worker]
+        self._idle = None  # type: typing.Optional[asyncio.Queue]
+        # worker leased by the current task for an open transaction
+        self._lease = ContextVar("matdb_aio_lease", default=None)  # type: ContextVar
+
+    async def connect(self) -> None:
+        if self._native:
+            await self.database._backend.connect()
+            self.database.is_connected = True
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.database.connect)
+        size = self._max_workers
+        if size is None:
+            try:
+                size = self.database.pool_stats()["maxsize"] or 10
+            except NotImplementedError:
+                size = 10
+        self._workers = [_Worker(f"matdb-aio-{index}") for index in range(size)]
+        self._idle = asyncio.Queue()
+        for worker in self._workers:
+            self._idle.put_nowait(worker)
+
+    async def disconnect(self) -> None:
+        if self._native:
+            await self.database._backend.disconnect()
+            self.database.is_connected = False
+            return
+        workers, self._workers, self._idle = self._workers, [], None
+        loop = asyncio.get_running_loop()
+        for worker in workers:
+            await loop.run_in_executor(None, worker.shutdown)
+        await loop.run_in_executor(None, self.database.disconnect)
+
+    async def __aenter__(self) -> "AsyncDatabase":
+        await self.connect()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: typing.Type[BaseException] = None,
+        exc_value: BaseException = None,
+        traceback: TracebackType = None,
+    ) -> None:
+        await self.disconnect()
+
+    async def _checkout(self) -> _Worker:
+        assert self._idle is not None, "AsyncDatabase is not connected"
+        return await self._idle.get()
+
+    def _checkin(self, worker: _Worker) -> None:
+        if self._idle is not None:
+            self._idle.put_nowait(worker)
+
+    async def _run(self, func: typing.Callable, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        worker = self._lease.get()
+        if worker is not None:
+            return await worker.run(func, *args, **kwargs)
+        worker = await self._checkout()
+        try:
+            return await worker.run(func, *args, **kwargs)
+        finally:
+            self._checkin(worker)
+
+    async def _run_native(self, method: str, *args: typing.Any) -> typing.Any:
+        lease = self._lease.get()
+        if lease is not None:
+            return await getattr(lease.connection, method)(*args)
+        connection = self.database._backend.connection()
+        await connection.acquire()
+        try:
+            return await getattr(connection, method)(*args)
+        finally:
+            await connection.release()
+
+    async def fetch_all(
+        self, query: typing.Union[ClauseElement, str], values: dict = None
+    ) -> typing.List[Record]:
+        if self._native:
+            return await self._run_native("fetch_all", Connection._build_query(query, values))
+        return await self._run(self.database.fetch_all, query, values)
+
+    async def fetch_one(
+        self, query: typing.Union[ClauseElement, str], values: dict = None
+    ) -> typing.Optional[Record]:
+        if self._native:
+            return await self._run_native("fetch_one", Connection._build_query(query, values))
+        return await self._run(self.database.fetch_one, query, values)
+
+    async def fetch_val(
+        self,
+        query: typing.Union[ClauseElement, str],
+        values: dict = None,
+        column: typing.Any = 0,
+    ) -> typing.Any:
+        if self._native:
+            return await self._run_native(
+                "fetch_val", Connection._build_query(query, values), column
+            )
+        return await self._run(self.database.fetch_val, query, values, column=column)
+
+    async def execute(
+        self, query: typing.Union[ClauseElement, str], values: dict = None
+    ) -> typing.Any:
+        if self._native:
+            return await self._run_native("execute", Connection._build_query(query, values))
+        return await self._run(self.database.execute, query, values)
+
+    async def execute_many(
+        self, query: typing.Union[ClauseElement, str], values: list
+    ) -> int:
+        if self._native:
+            return await self._run_native(
+                "execute_many", Connection._build_query(query), values
+            )
+        return await self._run(self.database.execute_many, query, values)
+
+    async def iterate(
+        self,
+        query: typing.Union[ClauseElement, str],
+        values: dict = None,
+        chunk_size: int = ITERATE_CHUNK_SIZE,
+    ) -> typing.AsyncIterator[Record]:
+        """
+        Iterate over records, fetched on the worker `chunk_size` at a time;
+        the next chunk is prefetched while the current one is consumed.
+        """
+        if self._native:
+            async for record in self._iterate_native(query, values):
+                yield record
+            return
+        leased = self._lease.get()
+        worker = leased if leased is not None else await self._checkout()
+        iterator = None
+        prefetch = None
+        try:
+            iterator = await worker.run(self.database.iterate, query, values)
+            next_chunk = functools.partial(_take, iterator, chunk_size)
+            chunk = await worker.run(next_chunk)
+            while chunk:
+                prefetch = asyncio.ensure_future(worker.run(next_chunk))
+                for record in chunk:
+                    yield record
+                chunk = await prefetch
+                prefetch = None
+        finally:
+            if prefetch is not None:
+                # the worker runs tasks in order: let the fetch finish first
+                await asyncio.wait([prefetch])
+            if iterator is not None:
+                await worker.run(iterator.close)
+            if leased is None:
+                self._checkin(worker)
+
+    async def _iterate_native(
+        self, query: typing.Union[ClauseElement, str], values: dict = None
+    ) -> typing.AsyncIterator[Record]:
+        built_query = Connection._build_query(query, values)
+        lease = self._lease.get()
+        if lease is not None:
+            async for record in lease.connection.iterate(built_query):
+                yield record
+            return
+        connection = self.database._backend.connection()
+        await connection.acquire()
+        try:
+            async for record in connection.iterate(built_query):
+                yield record
+        finally:
+            await connection.release()
+
+    def transaction(
+        self, *, force_rollback: bool = False, **kwargs: typing.Any
+    ) -> "AsyncTransaction":
+        return AsyncTransaction(self, force_rollback, **kwargs)
+
+
+def _take(iterator: typing.Iterator[Record], size: int) -> typing.List[Record]:
+    return list(itertools.islice(iterator, size))
+
+
+class AsyncTransaction:
+    """
+    `async with database.transaction():` — the outermost transaction of a
+    task leases a worker until it ends; statements awaited inside the block
+    run on that worker, and so on the transaction's connection.
+    """
+
+    def __init__(
+        self, database: AsyncDatabase, force_rollback: bool, **kwargs: typing.Any
+    ) -> None:
+        self._database = database
+        self._force_rollback = force_rollback
+        self._extra_options = kwargs
+        self._worker = None  # type: typing.Optional[_Worker]
+        self._lease = None  # type: typing.Optional[_NativeLease]
+        self._token = None  # type: typing.Any
+        self._transaction = None  # type: typing.Any
+
+    async def __aenter__(self) -> "AsyncTransaction":
+        if self._database._native:
+            await self._start_native()
+            return self
+        worker = self._database._lease.get()
+        if worker is None:
+            worker = await self._database._checkout()
+            self._token = self._database._lease.set(worker)
+        self._worker = worker
+        try:
+            self._transaction = await worker.run(self._start)
+        except BaseException:
+            self._end_lease()
+            raise
+        return self
+
+    async def _start_native(self) -> None:
+        lease = self._database._lease.get()
+        if lease is None:
+            connection = self._database.database._backend.connection()
+            await connection.acquire()
+            lease = _NativeLease(connection)
+            self._token = self._database._lease.set(lease)
+        self._lease = lease
+        self._transaction = lease.connection.transaction()
+        try:
+            await self._transaction.start(
+                is_root=lease.depth == 0, extra_options=self._extra_options
+            )
+        except BaseException:
+            await self._end_native_lease()
+            raise
+        lease.depth += 1
+
+    async def _end_native_lease(self) -> None:
+        if self._token is not None:
+            self._database._lease.reset(self._token)
+            self._token = None
+            await self._lease.connection.release()
+
+    def _start(self) -> typing.Any:
+        transaction = self._database.database.transaction(
+            force_rollback=self._force_rollback, **self._extra_options
+        )
+        return transaction.start()
+
+    async def __aexit__(
+        self,
+        exc_type: typing.Type[BaseException] = None,
+        exc_value: BaseException = None,
+        traceback: TracebackType = None,
+    ) -> None:
+        if self._database._native:
+            self._lease.depth -= 1
+            try:
+                if exc_type is not None or self._force_rollback:
+                    await self._transaction.rollback()
+                else:
+                    await self._transaction.commit()
+            finally:
+                await self._end_native_lease()
+            return
+        assert self._worker is not None
+        try:
+            if exc_type is not None or self._force_rollback:
+                await self._worker.run(self._transaction.rollback)
+            else:
+                await self._worker.run(self._transaction.commit)
+        finally:
+            self._end_lease()
+
+    def _end_lease(self) -> None:
+        if self._token is not None:
+            self._database._lease.reset(self._token)
+            self._database._checkin(self._worker)
+            self._token = None
+        self._worker = None
@@ -0,0 +1,233 @@
+import logging
+import time
+import typing
+import uuid
+
+from sqlalchemy.sql import ClauseElement
+
+from matdb.backend.bulk import key_runs, multirow_insert
+from matdb.backend.instrument import estimate_bytes
+from matdb.backend.mysql import MySQLBackend, MySQLConnection
+from matdb.backend.pool import asyncpool
+from matdb.interfaces import Record
+
+logger = logging.getLogger("databases")
+
+# The text protocol has no placeholder limit; keep multi-row INSERTs to a
+# size the server's max_allowed_packet comfortably takes.
+MAX_PARAMS = 65535
+
+
+class AsyncMySQLBackend(MySQLBackend):
+    """
+    Non-blocking MySQL backend (`mysql+async://`), used through
+    `matdb.AsyncDatabase`. Statements are compiled, cached and turned into
+    records exactly as by MySQLBackend; only the I/O is asyncio.
+    """
+
+    is_async = True
+
+    async def connect(self) -> None:  # type: ignore[override]
+        kwargs = self._get_connection_kwargs()
+        config = {'host': self._database_url.hostname, 'port': self._database_url.port or 3306,
+                  'user': self._database_url.username, 'password': self._database_url.password,
+                  'database': self._database_url.database, 'autocommit': True}
+        timeout = self._get_option('pool_timeout', 30)
+        self._pool = asyncpool.ConnectionPool(
+            size=kwargs.get('minsize', 5), maxsize=kwargs.get('maxsize', 10),
+            pre_create_num=kwargs.get('pre_create_num', 5), name='pool1',
+            timeout=None if timeout is None else float(timeout),
+            con_lifetime=int(self._get_option('pool_lifetime', 3600)),
+            lifetime_jitter=float(self._get_option('pool_lifetime_jitter', 0.1)),
+            **config)
+        await self._pool.init()
+        logger.info("MySQL asyncio connection pool initialized...")
+
+    async def disconnect(self) -> None:  # type: ignore[override]
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def pool_stats(self) -> typing.Dict[str, typing.Any]:
+        assert self._pool is not None, "DatabaseBackend is not running"
+        return self._pool.stats()
+
+    def connection(self) -> "AsyncMySQLConnection":
+        return AsyncMySQLConnection(self, self._dialect)
+
+
+class AsyncMySQLConnection(MySQLConnection):
+    """
+    Coroutine counterpart of MySQLConnection; `_compile`, `_compile_many`
+    and the record construction are inherited from it.
+    """
+
+    async def acquire(self) -> None:  # type: ignore[override]
+        assert self._connection is None, "Connection is already acquired"
+        assert self._database._pool is not None, "DatabaseBackend is not running"
+        self._connection = await self._database._pool.get_connection()
+
+    async def release(self) -> None:  # type: ignore[override]
+        assert self._connection is not None, "Connection is not acquired"
+        connection, self._connection = self._connection, None
+        await connection.close()
+
+    async def _query(
+        self, query_str: str, args: typing.Any, unbuffered: bool = False
+    ) -> asyncpool.Result:
+        """Run a compiled statement, reporting it to the query hooks if any."""
+        assert self._connection is not None, "Connection is not acquired"
+        event, self._pending_event = self._pending_event, None
+        profiler = self._database.profiler
+        if event is None and profiler is None:
+            return await self._connection.query(query_str, args, unbuffered)
+
+        hooks = self._database.hooks
+        if event is not None:
+            hooks.fire("before_execute", event)
+        result = None
+        started = time.perf_counter_ns()
+        try:
+            result = await self._connection.query(query_str, args, unbuffered)
+        except BaseException as exc:
+            if event is not None:
+                event.error = exc
+            raise
+        finally:
+            elapsed = time.perf_counter_ns() - started
+            if profiler is not None:
+                profiler.add("execute", elapsed)
+            if event is not None:
+                event.execute_time = elapsed / 1e9
+                if result is None or not unbuffered:
+                    # buffered results are read by the query itself; an
+                    # unbuffered stream is reported by iterate() once read
+                    if result is not None:
+                        event.rows = (
+                            len(result.rows)
+                            if result.description
+                            else max(result.rowcount, 0)
+                        )
+                    hooks.fire("after_execute", event)
+        return result
+
+    async def fetch_all(self, query: ClauseElement) -> typing.List[Record]:  # type: ignore[override]
+        query_str, args, context = self._compile(query)
+        result = await self._query(query_str, args)
+        make_record = self._record_factory(query, context, result.description)
+        return self._records(make_record, result.rows)
+
+    async def fetch_one(self, query: ClauseElement) -> typing.Optional[Record]:  # type: ignore[override]
+        query_str, args, context = self._compile(query)
+        result = await self._query(query_str, args)
+        if not result.rows:
+            return None
+        make_record = self._record_factory(query, context, result.description)
+        return self._records(make_record, result.rows[:1])[0]
+
+    async def fetch_val(  # type: ignore[override]
+        self, query: ClauseElement, column: typing.Any = 0
+    ) -> typing.Any:
+        row = await self.fetch_one(query)
+        return None if row is None else row[column]
+
+    async def execute(self, query: ClauseElement) -> typing.Any:  # type: ignore[override]
+        query_str, args, context = self._compile(query)
+        result = await self._query(query_str, args)
+        if not result.lastrowid:
+            return result.rowcount
+        return result.lastrowid
+
+    async def execute_many(  # type: ignore[override]
+        self, query: ClauseElement, values: typing.List[dict]
+    ) -> int:
+        if not values:
+            return 0
+        rowcount = 0
+        # rows with other keys need a statement naming other columns
+        for run in key_runs(values):
+            # the statement is compiled once per run, so only its first
+            # batch is reported to the query hooks
+            query_str, args_list = self._compile_many(query, run)
+            batch_size = self._database._execute_many_batch_size
+            statements = multirow_insert(query_str, args_list, batch_size, MAX_PARAMS)
+            if statements is None:
+                for args in args_list:
+                    rowcount += max((await self._query(query_str, args)).rowcount, 0)
+            else:
+                for batch_query, batch_args in statements:
+                    rowcount += max((await self._query(batch_query, batch_args)).rowcount, 0)
+        return rowcount
+
+    async def iterate(  # type: ignore[override]
+        self, query: ClauseElement
+    ) -> typing.AsyncIterator[Record]:
+        query_str, args, context = self._compile(query)
+        chunk_size = self._database._iterate_chunk_size
+        # the event _query() leaves open for the rows read below
+        event = self._pending_event
+        # Unbuffered: rows are read off the stream chunk by chunk.
+        result = await self._query(query_str, args, unbuffered=True)
+        try:
+            make_record = self._record_factory(query, context, result.description)
+            while True:
+                started = time.perf_counter()
+                try:
+                    rows = await result.fetchmany(chunk_size)
+                except Exception as exc:
+                    if event is not None:
+                        event.error = exc
+                    raise
+                if event is not None:
+                    event.fetch_time += time.perf_counter() - started
+                    event.rows += len(rows)
+                    event.bytes += estimate_bytes(rows)
+                if not rows:
+                    break
+                for record in self._records(make_record, rows):
+                    yield record
+        finally:
+            # an abandoned iteration must not leave rows on the pooled connection
+            await result.drain()
+            if event is not None:
+                self._database.hooks.fire("after_execute", event)
+
+    def transaction(self) -> "AsyncMySQLTransaction":
+        return AsyncMySQLTransaction(self)
+
+
+class AsyncMySQLTransaction:
+    def __init__(self, connection: AsyncMySQLConnection):
+        self._connection = connection
+        self._is_root = False
+        self._savepoint_name = ""
+
+    async def start(
+        self, is_root: bool, extra_options: typing.Dict[typing.Any, typing.Any]
+    ) -> None:
+        assert self._connection._connection is not None, "Connection is not acquired"
+        self._is_root = is_root
+        if self._is_root:
+            await self._connection._connection.begin()
+        else:
+            id = str(uuid.uuid4()).replace("-", "_")
+            self._savepoint_name = f"STARLETTE_SAVEPOINT_{id}"
+            await self._connection._connection.query(f"SAVEPOINT {self._savepoint_name}")
+
+    async def commit(self) -> None:
+        assert self._connection._connection is not None, "Connection is not acquired"
+        if self._is_root:
+            await self._connection._connection.commit()
+        else:
+            await self._connection._connection.query(
+                f"RELEASE SAVEPOINT {self._savepoint_name}"
+            )
+
+    async def rollback(self) -> None:
+        assert self._connection._connection is not None, "Connection is not acquired"
+        if self._is_root:
+            await self._connection._connection.rollback()
+        else:
+            await self._connection._connection.query(
+                f"ROLLBACK TO SAVEPOINT {self._savepoint_name}"
+            )
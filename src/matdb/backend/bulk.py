@@ -0,0 +1,74 @@
+import re
+import typing
+
+__all__ = ["batched", "key_runs", "multirow_insert"]
+
+# Matches "INSERT ... VALUES (%(a)s, %(b)s)" as compiled with the pyformat
+# paramstyle; anything else is sent through `cursor.executemany` unchanged.
+INSERT_VALUES_RE = re.compile(
+    r"\s*(INSERT\b.+\bVALUES\s*)(\(\s*%\(\w+\)s\s*(?:,\s*%\(\w+\)s\s*)*\))\s*;?\s*\Z",
+    re.IGNORECASE | re.DOTALL,
+)
+PARAM_RE = re.compile(r"%\((\w+)\)s")
+
+
+def batched(
+    values: typing.Sequence[typing.Any], batch_size: int
+) -> typing.Iterator[typing.Sequence[typing.Any]]:
+    for start in range(0, len(values), batch_size):
+        yield values[start : start + batch_size]
+
+
+def key_runs(values: typing.Sequence[dict]) -> typing.Iterator[typing.Sequence[dict]]:
+    """
+    Split parameter sets into runs of consecutive rows with the same keys,
+    each compiled into a statement of its own; rows keep their order.
+    """
+    start = 0
+    keys = values[0].keys()
+    for index in range(1, len(values)):
+        if values[index].keys() != keys:
+            yield values[start:index]
+            start, keys = index, values[index].keys()
+    yield values[start:] if start else values
+
+
+def multirow_insert(
+    query: str,
+    args_list: typing.Sequence[dict],
+    batch_size: int,
+    max_params: int,
+) -> typing.Optional[typing.Iterator[typing.Tuple[str, dict]]]:
+    """
+    Rewrite a single-row "INSERT ... VALUES (...)" into multi-row VALUES
+    statements, each carrying at most `batch_size` rows and `max_params`
+    bound parameters. Returns None when `query` is not a plain INSERT.
+    """
+    match = INSERT_VALUES_RE.match(query)
+    if match is None:
+        return None
+
+    prefix, row_template = match.group(1), match.group(2)
+    row_params = PARAM_RE.findall(row_template)
+    rows_per_batch = max(1, min(batch_size, max_params // len(row_params)))
+
+    def numbered(row_number: int) -> str:
+        return PARAM_RE.sub(
+            lambda m: f"%({m.group(1)}__{row_number})s", row_template
+        )
+
+    def statements() -> typing.Iterator[typing.Tuple[str, dict]]:
+        statement_cache = {}  # type: typing.Dict[int, str]
+        for batch in batched(args_list, rows_per_batch):
+            size = len(batch)
+            if size not in statement_cache:
+                statement_cache[size] = prefix + ", ".join(
+                    numbered(row_number) for row_number in range(size)
+                )
+            args = {}
+            for row_number, row_args in enumerate(batch):
+                for name in row_params:
+                    args[f"{name}__{row_number}"] = row_args[name]
+            yield statement_cache[size], args
+
+    return statements()
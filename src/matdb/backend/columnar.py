@@ -0,0 +1,125 @@
+import datetime
+import decimal
+import typing
+from collections.abc import Mapping
+
+try:  # pragma: no cover
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+__all__ = ["read_columns"]
+
+# dtype for values of a given Python type, used when the driver's type code
+# does not determine the column dtype (e.g. pymssql's NUMBER).
+PYTHON_DTYPES = (
+    (bool, "bool"),
+    (int, "int64"),
+    (float, "float64"),
+    (decimal.Decimal, "float64"),
+    (datetime.datetime, "datetime64[us]"),
+    (datetime.date, "datetime64[D]"),
+    (datetime.timedelta, "timedelta64[us]"),
+)
+
+
+def _infer_dtype(column: typing.Sequence[typing.Any]) -> str:
+    for value in column:
+        if value is not None:
+            for python_type, dtype in PYTHON_DTYPES:
+                if isinstance(value, python_type):
+                    return dtype
+            return "object"
+    return "object"
+
+
+def _fill_value(dtype: "numpy.dtype") -> typing.Any:
+    if dtype.kind in "mM":
+        return dtype.type("NaT")
+    if dtype.kind == "O":
+        return None
+    return dtype.type(0)
+
+
+def read_columns(
+    cursor: typing.Any,
+    type_code_dtypes: typing.Mapping[typing.Any, typing.Optional[str]],
+    dtypes: typing.Union[typing.Mapping[str, typing.Any], typing.Sequence, None],
+    chunk_size: int,
+) -> typing.Dict[str, "numpy.ma.MaskedArray"]:
+    """
+    Read the remaining rows of an executed cursor into one masked NumPy
+    array per column, without building a record per row.
+
+    Column dtypes are taken from `dtypes` (a mapping of column name to dtype,
+    or a sequence in column order), then from the driver type code in
+    `cursor.description`, and are otherwise inferred from the first non-null
+    value. NULLs are masked.
+    """
+    if numpy is None:
+        raise RuntimeError("fetch_columns() requires numpy to be installed")
+
+    description = cursor.description
+    names = [column[0] for column in description]
+    if dtypes is None:
+        requested = [None] * len(names)
+    elif isinstance(dtypes, Mapping):
+        requested = [dtypes.get(name) for name in names]
+    else:
+        requested = list(dtypes)
+
+    column_dtypes = []  # type: typing.List[typing.Optional[numpy.dtype]]
+    for requested_dtype, column in zip(requested, description):
+        if requested_dtype is None:
+            requested_dtype = type_code_dtypes.get(column[1])
+        column_dtypes.append(
+            None if requested_dtype is None else numpy.dtype(requested_dtype)
+        )
+    chunks = [[] for _ in names]  # type: typing.List[typing.List[typing.Any]]
+    masks = [[] for _ in names]  # type: typing.List[typing.List[typing.Any]]
+
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for index, column in enumerate(zip(*rows)):
+            dtype = column_dtypes[index]
+            if dtype is None:
+                dtype = column_dtypes[index] = numpy.dtype(_infer_dtype(column))
+            mask = numpy.fromiter(
+                (value is None for value in column), dtype=bool, count=len(column)
+            )
+            if mask.any():
+                fill = _fill_value(dtype)
+                column = [fill if value is None else value for value in column]
+            else:
+                mask = None
+            if dtype.kind == "O":
+                data = numpy.empty(len(column), dtype=object)
+                data[:] = column
+            else:
+                data = numpy.array(column, dtype=dtype)
+            chunks[index].append(data)
+            masks[index].append(mask)
+
+    result = {}
+    for index, name in enumerate(names):
+        dtype = column_dtypes[index]
+        if dtype is None:
+            dtype = numpy.dtype(object)
+        data = (
+            numpy.concatenate(chunks[index])
+            if chunks[index]
+            else numpy.empty(0, dtype=dtype)
+        )
+        if any(mask is not None for mask in masks[index]):
+            mask = numpy.concatenate(
+                [
+                    numpy.zeros(len(chunk), dtype=bool) if mask is None else mask
+                    for chunk, mask in zip(chunks[index], masks[index])
+                ]
+            )
+        else:
+            mask = numpy.ma.nomask
+        result[name] = numpy.ma.MaskedArray(data, mask=mask)
+    return result
@@ -0,0 +1,147 @@
+import time
+import typing
+
+from matdb.events import QueryEvent, QueryHooks
+from matdb.profiler import Profiler
+
+__all__ = ["InstrumentedCursor", "ProfiledCursor", "estimate_bytes"]
+
+
+def estimate_bytes(rows: typing.Sequence[typing.Sequence[typing.Any]]) -> int:
+    size = 0
+    for row in rows:
+        for value in row:
+            if isinstance(value, (str, bytes, bytearray)):
+                size += len(value)
+            elif value is not None:
+                size += 8
+    return size
+
+
+class InstrumentedCursor:
+    """
+    DB-API cursor proxy filling a QueryEvent: fires `before_execute` on the
+    first execute, times execute and fetch calls, counts rows and bytes, and
+    fires `after_execute` when closed. Backends only use it while hooks are
+    registered.
+    """
+
+    __slots__ = ("_cursor", "_event", "_hooks", "_started", "_closed")
+
+    def __init__(self, cursor: typing.Any, event: QueryEvent, hooks: QueryHooks) -> None:
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_event", event)
+        object.__setattr__(self, "_hooks", hooks)
+        object.__setattr__(self, "_started", False)
+        object.__setattr__(self, "_closed", False)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        setattr(self._cursor, name, value)
+
+    def _call(self, method: typing.Callable, *args: typing.Any) -> typing.Any:
+        event = self._event
+        if not self._started:
+            object.__setattr__(self, "_started", True)
+            self._hooks.fire("before_execute", event)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        except BaseException as exc:
+            event.error = exc
+            raise
+        finally:
+            event.execute_time += time.perf_counter() - started
+
+    def execute(self, query: str, args: typing.Any = None) -> typing.Any:
+        result = self._call(self._cursor.execute, query, args)
+        if self._cursor.description is None:
+            self._event.rows += max(self._cursor.rowcount, 0)
+        return result
+
+    def executemany(self, query: str, args: typing.Sequence[typing.Any]) -> typing.Any:
+        result = self._call(self._cursor.executemany, query, args)
+        self._event.rows += max(self._cursor.rowcount, 0)
+        return result
+
+    def _fetch(self, method: typing.Callable, *args: typing.Any) -> typing.Any:
+        event = self._event
+        started = time.perf_counter()
+        try:
+            rows = method(*args)
+        except BaseException as exc:
+            event.error = exc
+            raise
+        finally:
+            event.fetch_time += time.perf_counter() - started
+        return rows
+
+    def fetchone(self) -> typing.Any:
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            self._event.rows += 1
+            self._event.bytes += estimate_bytes((row,))
+        return row
+
+    def fetchmany(self, size: int = None) -> typing.List[typing.Any]:
+        rows = self._fetch(self._cursor.fetchmany, size)
+        self._event.rows += len(rows)
+        self._event.bytes += estimate_bytes(rows)
+        return rows
+
+    def fetchall(self) -> typing.List[typing.Any]:
+        rows = self._fetch(self._cursor.fetchall)
+        self._event.rows += len(rows)
+        self._event.bytes += estimate_bytes(rows)
+        return rows
+
+    def close(self) -> None:
+        try:
+            self._cursor.close()
+        finally:
+            if self._started and not self._closed:
+                object.__setattr__(self, "_closed", True)
+                self._hooks.fire("after_execute", self._event)
+
+
+class ProfiledCursor:
+    """
+    DB-API cursor proxy adding the time spent in execute and fetch calls to
+    the profiler's "execute" and "fetch" phases.
+    """
+
+    __slots__ = ("_cursor", "_profiler")
+
+    def __init__(self, cursor: typing.Any, profiler: Profiler) -> None:
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_profiler", profiler)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        setattr(self._cursor, name, value)
+
+    def _timed(self, phase: str, method: typing.Callable, *args: typing.Any) -> typing.Any:
+        started = time.perf_counter_ns()
+        try:
+            return method(*args)
+        finally:
+            self._profiler.add(phase, time.perf_counter_ns() - started)
+
+    def execute(self, query: str, args: typing.Any = None) -> typing.Any:
+        return self._timed("execute", self._cursor.execute, query, args)
+
+    def executemany(self, query: str, args: typing.Sequence[typing.Any]) -> typing.Any:
+        return self._timed("execute", self._cursor.executemany, query, args)
+
+    def fetchone(self) -> typing.Any:
+        return self._timed("fetch", self._cursor.fetchone)
+
+    def fetchmany(self, size: int = None) -> typing.List[typing.Any]:
+        return self._timed("fetch", self._cursor.fetchmany, size)
+
+    def fetchall(self) -> typing.List[typing.Any]:
+        return self._timed("fetch", self._cursor.fetchall)
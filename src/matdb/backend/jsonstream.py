@@ -0,0 +1,143 @@
+import datetime
+import decimal
+import io
+import json
+import math
+import typing
+from json.encoder import encode_basestring_ascii
+
+__all__ = ["alchemyencoder", "iter_json", "write_json"]
+
+
+def alchemyencoder(obj):
+    """JSON encoder function for SQLAlchemy special classes."""
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    elif isinstance(obj, decimal.Decimal):
+        return float(obj)
+
+
+def _encode_float(value: float) -> str:
+    if math.isfinite(value):
+        return float.__repr__(value)
+    return json.dumps(value)
+
+
+def _encode_isoformat(value: datetime.date) -> str:
+    return '"' + value.isoformat() + '"'
+
+
+def _encode_other(value: typing.Any) -> str:
+    return json.dumps(value, default=alchemyencoder)
+
+
+# Encoders producing the same text as json.dumps(..., default=alchemyencoder),
+# keyed by exact value type. datetime.time is left out on purpose:
+# alchemyencoder encodes it as null, and so does _encode_other.
+ENCODERS = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    bool: lambda value: "true" if value else "false",
+    float: _encode_float,
+    decimal.Decimal: lambda value: _encode_float(float(value)),
+    datetime.date: _encode_isoformat,
+    datetime.datetime: _encode_isoformat,
+}  # type: typing.Dict[type, typing.Callable[[typing.Any], str]]
+
+
+def _encode_value(value: typing.Any) -> str:
+    if value is None:
+        return "null"
+    return ENCODERS.get(type(value), _encode_other)(value)
+
+
+def _column_encoder(sample: typing.Any) -> typing.Callable[[typing.Any], str]:
+    """
+    Build the encoder for one column from its first non-null value; values of
+    any other type fall back to a lookup by type.
+    """
+    if sample is None:
+        return _encode_value
+    sample_type = type(sample)
+    encode = ENCODERS.get(sample_type, _encode_other)
+
+    def encode_column(value: typing.Any) -> str:
+        if value is None:
+            return "null"
+        if type(value) is sample_type:
+            return encode(value)
+        return _encode_value(value)
+
+    return encode_column
+
+
+def _column_encoders(
+    rows: typing.Sequence[typing.Sequence[typing.Any]], width: int
+) -> typing.List[typing.Callable[[typing.Any], str]]:
+    samples = [None] * width  # type: typing.List[typing.Any]
+    for index in range(width):
+        for row in rows:
+            if row[index] is not None:
+                samples[index] = row[index]
+                break
+    return [_column_encoder(sample) for sample in samples]
+
+
+def iter_json(
+    cursor: typing.Any, chunk_size: int, ndjson: bool = False
+) -> typing.Iterator[str]:
+    """
+    Encode the remaining rows of an executed cursor as a JSON array of
+    objects (or newline-delimited JSON), yielding one chunk per fetchmany
+    batch. Column names come from `cursor.description`.
+    """
+    keys = [encode_basestring_ascii(column[0]) + ": " for column in cursor.description]
+    encoders = None
+    row_separator = "\n" if ndjson else ", "
+    first = True
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        if encoders is None:
+            encoders = list(zip(keys, _column_encoders(rows, len(keys))))
+        chunk = row_separator.join(
+            [
+                "{"
+                + ", ".join(
+                    [key + encode(value) for (key, encode), value in zip(encoders, row)]
+                )
+                + "}"
+                for row in rows
+            ]
+        )
+        if ndjson:
+            yield chunk + "\n"
+        elif first:
+            yield "[" + chunk
+        else:
+            yield ", " + chunk
+        first = False
+
+    if not ndjson:
+        yield "[]" if first else "]"
+
+
+def write_json(chunks: typing.Iterable[str], out: typing.Any) -> int:
+    """
+    Write encoded chunks to a socket (anything with `sendall`), a text file
+    or a binary file, returning the number of characters written. The
+    output is ASCII, so characters and bytes are the same count.
+    """
+    if hasattr(out, "sendall"):
+        write = lambda chunk: out.sendall(chunk.encode("ascii"))  # noqa: E731
+    elif isinstance(out, io.TextIOBase):
+        write = out.write
+    else:
+        write = lambda chunk: out.write(chunk.encode("ascii"))  # noqa: E731
+
+    written = 0
+    for chunk in chunks:
+        write(chunk)
+        written += len(chunk)
+    return written
@@ -1,17 +1,27 @@
+import datetime
+import decimal
 import logging
+import re
+import time
 import typing
 import uuid
 
 import pymssql
 from sqlalchemy.dialects import *
-from sqlalchemy.engine.cursor import CursorResultMetaData
-from sqlalchemy.engine.interfaces import Dialect, ExecutionContext
-from sqlalchemy.engine.row import Row
+from sqlalchemy.engine.interfaces import Dialect
 from sqlalchemy.sql import ClauseElement
-from sqlalchemy.sql.ddl import DDLElement
-from dbutils.pooled_db import PooledDB
 
-from matdb.core import LOG_EXTRA, DatabaseURL
+from matdb.backend.bulk import batched, key_runs, multirow_insert
+from matdb.backend.columnar import read_columns
+from matdb.backend.instrument import InstrumentedCursor, ProfiledCursor
+from matdb.backend.jsonstream import iter_json
+from matdb.backend.pool.pooleddb import MeteredPooledDB
+from matdb.backend.record import RECORD_CLASSES
+from matdb.backend.statement_cache import CompilationContext, StatementCache
+from matdb.core import LOG_EXTRA, BoundStatement, DatabaseURL
+from matdb.events import QueryEvent, QueryHooks
+from matdb.profiler import Profiler
+from matdb.result_cache import ResultCache
 from matdb.interfaces import (
     ConnectionBackend,
     DatabaseBackend,
@@ -21,6 +31,54 @@ from matdb.interfaces import (
 
 logger = logging.getLogger("databases")
 
+# SQL Server caps a request at 2100 parameters and a VALUES list at 1000 rows.
+MAX_PARAMS = 2099
+MAX_INSERT_ROWS = 1000
+
+# Statements prepared with sp_prepare per server session; past it, they are all
+# unprepared.
+MAX_PREPARED_HANDLES = 256
+
+_PYFORMAT_PARAM = re.compile(r"%\((\w+)\)s")
+
+# NumPy dtypes for fetch_columns(), keyed by cursor.description type code.
+# pymssql's type objects compare equal to those int codes but are not
+# hashable, hence `.value`. All numeric columns are reported as NUMBER, so
+# those are inferred from the values.
+COLUMN_DTYPES = {
+    pymssql.STRING.value: "object",
+    pymssql.BINARY.value: "object",
+    pymssql.DATETIME.value: "datetime64[us]",
+    pymssql.DECIMAL.value: "float64",
+}
+
+
+def _sql_type(value: typing.Any) -> str:
+    """The SQL Server type sp_prepare declares a parameter bound to `value` as."""
+    if isinstance(value, bool):
+        return "bit"
+    if isinstance(value, int):
+        return "bigint"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, decimal.Decimal):
+        # the scale is part of the type, so every scale has its own handle
+        exponent = value.as_tuple().exponent
+        if isinstance(exponent, int):
+            return "decimal(38, %d)" % min(max(-exponent, 0), 38)
+        return "float"
+    if isinstance(value, datetime.datetime):
+        return "datetime2"
+    if isinstance(value, datetime.date):
+        return "date"
+    if isinstance(value, datetime.time):
+        return "time"
+    if isinstance(value, uuid.UUID):
+        return "uniqueidentifier"
+    if isinstance(value, (bytes, bytearray)):
+        return "varbinary(max)"
+    return "nvarchar(max)"
+
 
 class MSSQLBackend(DatabaseBackend):
     def __init__(
@@ -32,6 +90,30 @@ class MSSQLBackend(DatabaseBackend):
         # aiosqlite does not support decimals
         self._dialect.supports_native_decimal = True
         self._pool = None
+        self.statement_cache = StatementCache(
+            maxsize=int(self._get_option("statement_cache_size", 500)),
+            eviction=self._get_option("statement_cache_eviction", "lru"),
+        )
+        self.hooks = QueryHooks()
+        self.profiler = None  # type: typing.Optional[Profiler]
+        self.result_cache = None  # type: typing.Optional[ResultCache]
+        self._execute_many_batch_size = int(
+            self._get_option("execute_many_batch_size", 1000)
+        )
+        self._iterate_chunk_size = int(self._get_option("iterate_chunk_size", 1000))
+        # "row" builds SQLAlchemy Rows, "compact" builds CompactRecords; a
+        # query can override it with `.execution_options(record_class=...)`.
+        self._record_class = self._get_option("record_class", "row")
+        assert self._record_class in RECORD_CLASSES, "Invalid record_class option"
+
+    def _get_option(self, key: str, default: typing.Any = None) -> typing.Any:
+        """
+        Look up a backend option, keyword options taking precedence over
+        DatabaseURL query options.
+        """
+        if key in self._options:
+            return self._options[key]
+        return self._database_url.options.get(key, default)
 
     def _get_connection_kwargs(self) -> dict:
         url_options = self._database_url.options
@@ -67,27 +149,29 @@ class MSSQLBackend(DatabaseBackend):
         #Defaulted to 5, 5 and 10 for Min, Pre create and max size
         minsize = kwargs.get('minsize', 5)
         pre_create_num = kwargs.get('pre_create_num', 5)
-        maxsize = kwargs.get('pre_create_num', 10)
+        maxsize = kwargs.get('maxsize', 10)
         #self._pool = mssqlpool.ConnectionPool(size=minsize, maxsize=maxsize, pre_create_num=pre_create_num, name='pool1', **config)
-        self._pool = PooledDB(pymssql, mincached=minsize, maxcached=10, maxconnections=maxsize, **conn_kwargs)
+        self._pool = MeteredPooledDB(pymssql, mincached=minsize, maxcached=10, maxconnections=maxsize, **conn_kwargs)
         logger.info("MySQL Connection pool initialized...")
 
     def disconnect(self) -> None:
-        pass
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def pool_stats(self) -> typing.Dict[str, typing.Any]:
+        assert self._pool is not None, "DatabaseBackend is not running"
+        return self._pool.stats()
 
     def connection(self) -> "MSSQLConnection":
         return MSSQLConnection(self, self._dialect)
 
 
-class CompilationContext:
-    def __init__(self, context: ExecutionContext):
-        self.context = context
-
-
 class MSSQLConnection(ConnectionBackend):
     def __init__(self, database: MSSQLBackend, dialect: Dialect):
         self._database = database
         self._dialect = dialect
+        self._pending_event = None  # type: typing.Optional[QueryEvent]
         self._connection = None  # type: typing.Optional[pymssql.Connection]
 
     def acquire(self) -> None:
@@ -104,48 +188,68 @@ class MSSQLConnection(ConnectionBackend):
     def fetch_all(self, query: ClauseElement) -> typing.List[Record]:
         assert self._connection is not None, "Connection is not acquired"
         query_str, args, context = self._compile(query)
-        cursor = self._connection.cursor()
+        cursor = self._cursor()
         try:
             cursor.execute(query_str, args)
             rows = cursor.fetchall()
-            metadata = CursorResultMetaData(context, cursor.description)
-            return [
-                Row(
-                    metadata,
-                    metadata._processors,
-                    metadata._keymap,
-                    Row._default_key_style,
-                    row,
-                )
-                for row in rows
-            ]
+            make_record = self._record_factory(query, context, cursor.description)
+            return self._records(make_record, rows)
+        finally:
+            cursor.close()
+
+    def iterate_json(
+        self, query: ClauseElement, ndjson: bool = False
+    ) -> typing.Iterator[str]:
+        assert self._connection is not None, "Connection is not acquired"
+        query_str, args, context = self._compile(query)
+        cursor = self._cursor()
+        exhausted = False
+        try:
+            cursor.execute(query_str, args)
+            chunks = iter_json(cursor, self._database._iterate_chunk_size, ndjson)
+            if self._database.profiler is not None:
+                chunks = self._database.profiler.timed(chunks, "json", exclude="fetch")
+            yield from chunks
+            exhausted = True
+        finally:
+            if not exhausted:
+                self._cancel_pending(cursor)
+            cursor.close()
+
+    def fetch_columns(
+        self,
+        query: ClauseElement,
+        dtypes: typing.Union[typing.Mapping[str, typing.Any], typing.Sequence] = None,
+    ) -> typing.Dict[str, typing.Any]:
+        assert self._connection is not None, "Connection is not acquired"
+        query_str, args, context = self._compile(query)
+        cursor = self._cursor()
+        try:
+            cursor.execute(query_str, args)
+            return read_columns(
+                cursor, COLUMN_DTYPES, dtypes, self._database._iterate_chunk_size
+            )
         finally:
             cursor.close()
 
     def fetch_one(self, query: ClauseElement) -> typing.Optional[Record]:
         assert self._connection is not None, "Connection is not acquired"
         query_str, args, context = self._compile(query)
-        cursor = self._connection.cursor()
+        cursor = self._cursor()
         try:
             cursor.execute(query_str, args)
             row = cursor.fetchone()
             if row is None:
                 return None
-            metadata = CursorResultMetaData(context, cursor.description)
-            return Row(
-                metadata,
-                metadata._processors,
-                metadata._keymap,
-                Row._default_key_style,
-                row,
-            )
+            make_record = self._record_factory(query, context, cursor.description)
+            return self._records(make_record, (row,))[0]
         finally:
             cursor.close()
 
     def execute(self, query: ClauseElement) -> typing.Any:
         assert self._connection is not None, "Connection is not acquired"
         query_str, args, context = self._compile(query)
-        cursor = self._connection.cursor()
+        cursor = self._cursor()
         try:
             cursor.execute(query_str, args)
             if cursor.lastrowid == 0:
@@ -154,13 +258,30 @@ class MSSQLConnection(ConnectionBackend):
         finally:
             cursor.close()
 
-    def execute_many(self, queries: typing.List[ClauseElement]) -> None:
+    def execute_many(self, query: ClauseElement, values: typing.List[dict]) -> int:
         assert self._connection is not None, "Connection is not acquired"
-        cursor = self._connection.cursor()
+        if not values:
+            return 0
+        # rows with other keys need a statement naming other columns
+        return sum(self._execute_many(query, run) for run in key_runs(values))
+
+    def _execute_many(self, query: ClauseElement, values: typing.Sequence[dict]) -> int:
+        query_str, args_list = self._compile_many(query, values)
+        batch_size = min(self._database._execute_many_batch_size, MAX_INSERT_ROWS)
+        statements = multirow_insert(query_str, args_list, batch_size, MAX_PARAMS)
+        cursor = self._cursor()
+        rowcount = 0
         try:
-            for single_query in queries:
-                single_query, args, context = self._compile(single_query)
-                cursor.execute(single_query, args)
+            if statements is None:
+                # pymssql has no multi-row rewrite of its own.
+                for batch in batched(args_list, batch_size):
+                    cursor.executemany(query_str, batch)
+                    rowcount += max(cursor.rowcount, 0)
+            else:
+                for batch_query, batch_args in statements:
+                    cursor.execute(batch_query, batch_args)
+                    rowcount += max(cursor.rowcount, 0)
+            return rowcount
         finally:
             cursor.close()
 
@@ -169,18 +290,74 @@ class MSSQLConnection(ConnectionBackend):
     ) -> typing.AsyncGenerator[typing.Any, None]:
         assert self._connection is not None, "Connection is not acquired"
         query_str, args, context = self._compile(query)
-        cursor = self._connection.cursor()
+        chunk_size = self._database._iterate_chunk_size
+        # pymssql reads rows from the server as they are fetched, so pulling
+        # them in fetchmany chunks keeps memory flat for any result size.
+        cursor = self._cursor()
+        exhausted = False
         try:
             cursor.execute(query_str, args)
-            metadata = CursorResultMetaData(context, cursor.description)
-            for row in cursor:
-                yield Row(
-                    metadata,
-                    metadata._processors,
-                    metadata._keymap,
-                    Row._default_key_style,
-                    row,
-                )
+            make_record = self._record_factory(query, context, cursor.description)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    exhausted = True
+                    break
+                yield from self._records(make_record, rows)
+        finally:
+            if not exhausted:
+                # Abandoned iteration: cancel the pending rows on the server
+                # rather than leaving them on the pooled connection.
+                self._cancel_pending(cursor)
+            cursor.close()
+
+    def explain(self, query: str, args: typing.Any) -> str:
+        assert self._connection is not None, "Connection is not acquired"
+        cursor = self._connection.cursor()
+        # SET SHOWPLAN_XML must be alone in its batch; while it is on,
+        # statements return their plan instead of running.
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(query, args)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.execute("SET SHOWPLAN_XML OFF")
+            cursor.close()
+
+    def session_id(self) -> int:
+        assert self._connection is not None, "Connection is not acquired"
+        session = self._session_state()
+        spid = session.get("spid")
+        if spid is None:
+            cursor = self._connection.cursor()
+            try:
+                cursor.execute("SELECT @@SPID")
+                spid = session["spid"] = cursor.fetchone()[0]
+            finally:
+                cursor.close()
+        return spid
+
+    def _session_state(self) -> typing.Dict[str, typing.Any]:
+        """
+        State of the server session (SPID, prepared handles), kept on the
+        steady connection: the pooled wrapper is new at every checkout, and
+        the driver connection under it is new after a reconnect, which
+        starts a new session.
+        """
+        steady = self._connection._con
+        owner, state = getattr(steady, "_session_state", (None, None))
+        if owner is not steady._con:
+            state = {}
+            steady._session_state = (steady._con, state)
+        return state
+
+    def kill(self, session_id: int) -> None:
+        assert self._connection is not None, "Connection is not acquired"
+        cursor = self._connection.cursor()
+        try:
+            # SQL Server has no KILL QUERY: the session ends, and the steady
+            # connection reopens on its next use
+            cursor.execute("KILL %d" % int(session_id))
         finally:
             cursor.close()
 
@@ -190,31 +367,163 @@ class MSSQLConnection(ConnectionBackend):
     def _compile(
         self, query: ClauseElement
     ) -> typing.Tuple[str, dict, CompilationContext]:
-        compiled = query.compile(
-            dialect=self._dialect, compile_kwargs={"render_postcompile": True}
+        hooks = self._database.hooks
+        profiler = self._database.profiler
+        started = time.perf_counter() if hooks.active else None
+        started_ns = time.perf_counter_ns() if profiler is not None else None
+        if isinstance(query, BoundStatement):
+            statement, hit = query.statement, True
+            query_str, args = statement.construct(values=query.values)
+            if query.prepared.server_side:
+                query_str = self._server_prepared(query_str, args)
+        else:
+            statement, extracted_parameters, hit = self._database.statement_cache.compile(
+                query, self._dialect
+            )
+            query_str, args = statement.construct(extracted_parameters)
+        if started_ns is not None:
+            profiler.add("compile", time.perf_counter_ns() - started_ns)
+            profiler.set_statement(query_str)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            query_message = query_str.replace(" \n", " ").replace("\n", " ")
+            logger.debug(
+                "Query: %s Args: %s", query_message, repr(args), extra=LOG_EXTRA
+            )
+        if started is not None:
+            self._pending_event = QueryEvent(
+                query_str, args, len(args), hit, time.perf_counter() - started
+            )
+        return query_str, args, statement.context
+
+    def _server_prepared(self, query_str: str, args: dict) -> str:
+        """
+        `query_str` prepared on the server with sp_prepare, once per server
+        session and parameter types, as the sp_execute call running it:
+        its plan is reused instead of compiled per ad-hoc batch.
+        """
+        names = list(dict.fromkeys(_PYFORMAT_PARAM.findall(query_str)))
+        types = tuple(_sql_type(args[name]) for name in names)
+        # gone with the session, e.g. after a hedged read killed it
+        handles = self._session_state().setdefault("prepared", {})
+        handle = handles.get((query_str, types))
+        if handle is None:
+            if len(handles) >= MAX_PREPARED_HANDLES:
+                self._unprepare(handles)
+            handle = handles[query_str, types] = self._sp_prepare(query_str, names, types)
+        return "EXEC sp_execute %d" % handle + "".join(
+            ", %%(%s)s" % name for name in names
         )
 
-        execution_context = self._dialect.execution_ctx_cls()
-        execution_context.dialect = self._dialect
-
-        if not isinstance(query, DDLElement):
-            args = compiled.construct_params()
-            for key, val in args.items():
-                if key in compiled._bind_processors:
-                    args[key] = compiled._bind_processors[key](val)
+    def _sp_prepare(
+        self, query_str: str, names: typing.Sequence[str], types: typing.Sequence[str]
+    ) -> int:
+        sql = _PYFORMAT_PARAM.sub(r"@\1", query_str).replace("%%", "%")
+        declarations = ", ".join(f"@{name} {type_}" for name, type_ in zip(names, types))
+        cursor = self._connection.cursor()
+        try:
+            cursor.execute(
+                "DECLARE @handle int; "
+                "EXEC sp_prepare @handle OUTPUT, N'%s', N'%s'; "
+                "SELECT @handle AS prepared_handle"
+                % (declarations.replace("'", "''"), sql.replace("'", "''"))
+            )
+            # sp_prepare returns the result metadata of a query as an empty
+            # result set first
+            while cursor.description is None or cursor.description[0][0] != "prepared_handle":
+                if not cursor.nextset():
+                    raise pymssql.OperationalError("sp_prepare returned no handle")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
 
-            execution_context.result_column_struct = (
-                compiled._result_columns,
-                compiled._ordered_columns,
-                compiled._textual_ordered_columns,
-                compiled._loose_column_name_matching,
+    def _unprepare(self, handles: typing.Dict[typing.Tuple[str, tuple], int]) -> None:
+        cursor = self._connection.cursor()
+        try:
+            for handle in handles.values():
+                cursor.execute("EXEC sp_unprepare %d" % handle)
+        finally:
+            cursor.close()
+        handles.clear()
+
+    def _cursor(self, cursor_class: typing.Any = None) -> typing.Any:
+        """
+        Open a cursor, wrapped to report the statement compiled last to the
+        query hooks while any are registered, and to time execute and fetch
+        calls while profiling.
+        """
+        if cursor_class is None:
+            cursor = self._connection.cursor()
+        else:
+            cursor = self._connection.cursor(cursor_class)
+        if self._database.profiler is not None:
+            cursor = ProfiledCursor(cursor, self._database.profiler)
+        event, self._pending_event = self._pending_event, None
+        if event is None:
+            return cursor
+        return InstrumentedCursor(cursor, event, self._database.hooks)
+
+    def _records(
+        self,
+        make_record: typing.Callable[[typing.Sequence[typing.Any]], Record],
+        rows: typing.Sequence[typing.Sequence[typing.Any]],
+    ) -> typing.List[Record]:
+        profiler = self._database.profiler
+        if profiler is None:
+            return list(map(make_record, rows))
+        started = time.perf_counter_ns()
+        records = list(map(make_record, rows))
+        profiler.add("records", time.perf_counter_ns() - started)
+        return records
+
+    def _record_factory(
+        self,
+        query: ClauseElement,
+        context: CompilationContext,
+        description: typing.Sequence[typing.Any],
+    ) -> typing.Callable[[typing.Sequence[typing.Any]], Record]:
+        record_class = query.get_execution_options().get(
+            "record_class", self._database._record_class
+        )
+        return context.record_factory(description, record_class)
+
+    def _compile_many(
+        self, query: ClauseElement, values: typing.List[dict]
+    ) -> typing.Tuple[str, typing.List[dict]]:
+        hooks = self._database.hooks
+        profiler = self._database.profiler
+        started = time.perf_counter() if hooks.active else None
+        started_ns = time.perf_counter_ns() if profiler is not None else None
+        if isinstance(query, BoundStatement):
+            statement, extracted_parameters, hit = (
+                query.prepared.many_statement(list(values[0])), None, True
             )
         else:
-            args = {}
-
-        query_message = compiled.string.replace(" \n", " ").replace("\n", " ")
-        logger.debug("Query: %s Args: %s", query_message, repr(args), extra=LOG_EXTRA)
-        return compiled.string, args, CompilationContext(execution_context)
+            statement, extracted_parameters, hit = self._database.statement_cache.compile(
+                query, self._dialect, column_keys=list(values[0]), for_executemany=True
+            )
+        query_str, args_list = statement.construct_many(values, extracted_parameters)
+        if started_ns is not None:
+            profiler.add("compile", time.perf_counter_ns() - started_ns)
+            profiler.set_statement(query_str)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            query_message = query_str.replace(" \n", " ").replace("\n", " ")
+            logger.debug(
+                "Query: %s Args: %s",
+                query_message,
+                f"<{len(args_list)} parameter sets>",
+                extra=LOG_EXTRA,
+            )
+        if started is not None:
+            self._pending_event = QueryEvent(
+                query_str,
+                args_list,
+                sum(map(len, args_list)),
+                hit,
+                time.perf_counter() - started,
+            )
+        return query_str, args_list
 
 
     @property
@@ -222,6 +531,28 @@ class MSSQLConnection(ConnectionBackend):
         assert self._connection is not None, "Connection is not acquired"
         return self._connection
 
+    def _driver_connection(self) -> typing.Any:
+        """The pymssql connection under DBUtils' pooled and steady connection wrappers."""
+        assert self._connection is not None, "Connection is not acquired"
+        connection = self._connection
+        while hasattr(connection, "_con"):
+            connection = connection._con
+        return connection
+
+    def _cancel_pending(self, cursor: typing.Any) -> None:
+        """
+        Cancel the unread rows of `cursor`'s statement on the server. Without
+        pymssql's cancel() the rows are read and discarded instead, which
+        also leaves the connection usable, only slower.
+        """
+        cancel = getattr(getattr(self._driver_connection(), "_conn", None), "cancel", None)
+        if cancel is not None:
+            cancel()
+            return
+        logger.warning("pymssql connection has no cancel(), reading the rest of the result")
+        while cursor.description is not None and cursor.fetchmany(self._database._iterate_chunk_size):
+            pass
+
 
 class MSSQLTransaction(TransactionBackend):
     def __init__(self, connection: MSSQLConnection):
@@ -235,18 +566,18 @@ class MSSQLTransaction(TransactionBackend):
     ) -> None:
         assert self._connection._connection is not None, "Connection is not acquired"
         self._is_root = is_root
-        self._connection._connection._con._con.autocommit(False)
+        self._connection._driver_connection().autocommit(False)
         self._connection._connection.begin()
 
 
     def commit(self) -> None:
         assert self._connection._connection is not None, "Connection is not acquired"
         self._connection._connection.commit()
-        self._connection._connection._con._con.autocommit(True)
+        self._connection._driver_connection().autocommit(True)
 
 
     def rollback(self) -> None:
         assert self._connection._connection is not None, "Connection is not acquired"
         self._connection._connection.rollback()
-        self._connection._connection._con._con.autocommit(True)
+        self._connection._driver_connection().autocommit(True)
 
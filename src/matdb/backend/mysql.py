@@ -1,19 +1,25 @@
 
 import logging
+import time
 import typing
 import uuid
-import json
-import datetime, decimal
 import pymysql
+from pymysql.constants import FIELD_TYPE
 from sqlalchemy.dialects import *
-from sqlalchemy.engine.cursor import CursorResultMetaData
-from sqlalchemy.engine.interfaces import Dialect, ExecutionContext
-from sqlalchemy.engine.row import Row
+from sqlalchemy.engine.interfaces import Dialect
 from sqlalchemy.sql import ClauseElement
-from sqlalchemy.sql.ddl import DDLElement
 
 from matdb.backend.pool import mysqlpool
-from matdb.core import LOG_EXTRA, DatabaseURL
+from matdb.backend.bulk import batched, key_runs
+from matdb.backend.columnar import read_columns
+from matdb.backend.instrument import InstrumentedCursor, ProfiledCursor
+from matdb.backend.jsonstream import alchemyencoder, iter_json
+from matdb.backend.record import RECORD_CLASSES
+from matdb.backend.statement_cache import CompilationContext, StatementCache
+from matdb.core import LOG_EXTRA, BoundStatement, DatabaseURL
+from matdb.events import QueryEvent, QueryHooks
+from matdb.profiler import Profiler
+from matdb.result_cache import ResultCache
 from matdb.interfaces import (
     ConnectionBackend,
     DatabaseBackend,
@@ -23,6 +29,27 @@ from matdb.interfaces import (
 
 logger = logging.getLogger("databases")
 
+# Room left in max_allowed_packet for the packet header and statement prefix.
+MAX_PACKET_HEADROOM = 1024
+
+# NumPy dtypes for fetch_columns(), keyed by cursor.description type code.
+COLUMN_DTYPES = {
+    FIELD_TYPE.TINY: "int64",
+    FIELD_TYPE.SHORT: "int64",
+    FIELD_TYPE.LONG: "int64",
+    FIELD_TYPE.INT24: "int64",
+    FIELD_TYPE.LONGLONG: "int64",
+    FIELD_TYPE.YEAR: "int64",
+    FIELD_TYPE.FLOAT: "float64",
+    FIELD_TYPE.DOUBLE: "float64",
+    FIELD_TYPE.DECIMAL: "float64",
+    FIELD_TYPE.NEWDECIMAL: "float64",
+    FIELD_TYPE.DATE: "datetime64[D]",
+    FIELD_TYPE.DATETIME: "datetime64[us]",
+    FIELD_TYPE.TIMESTAMP: "datetime64[us]",
+    FIELD_TYPE.TIME: "timedelta64[us]",
+}
+
 
 class MySQLBackend(DatabaseBackend):
     def __init__(
@@ -34,6 +61,30 @@ class MySQLBackend(DatabaseBackend):
         # aiosqlite does not support decimals
         self._dialect.supports_native_decimal = True
         self._pool = None
+        self.statement_cache = StatementCache(
+            maxsize=int(self._get_option("statement_cache_size", 500)),
+            eviction=self._get_option("statement_cache_eviction", "lru"),
+        )
+        self.hooks = QueryHooks()
+        self.profiler = None  # type: typing.Optional[Profiler]
+        self.result_cache = None  # type: typing.Optional[ResultCache]
+        self._execute_many_batch_size = int(
+            self._get_option("execute_many_batch_size", 1000)
+        )
+        self._iterate_chunk_size = int(self._get_option("iterate_chunk_size", 1000))
+        # "row" builds SQLAlchemy Rows, "compact" builds CompactRecords; a
+        # query can override it with `.execution_options(record_class=...)`.
+        self._record_class = self._get_option("record_class", "row")
+        assert self._record_class in RECORD_CLASSES, "Invalid record_class option"
+
+    def _get_option(self, key: str, default: typing.Any = None) -> typing.Any:
+        """
+        Look up a backend option, keyword options taking precedence over
+        DatabaseURL query options.
+        """
+        if key in self._options:
+            return self._options[key]
+        return self._database_url.options.get(key, default)
 
     def _get_connection_kwargs(self) -> dict:
         url_options = self._database_url.options
@@ -71,12 +122,35 @@ class MySQLBackend(DatabaseBackend):
         #Defaulted to 5, 5 and 10 for Min, Pre create and max size
         minsize = kwargs.get('minsize', 5)
         pre_create_num = kwargs.get('pre_create_num', 5)
-        maxsize = kwargs.get('pre_create_num', 10)
-        self._pool = mysqlpool.ConnectionPool(size=minsize, maxsize=maxsize, pre_create_num=pre_create_num, name='pool1', **config)
+        maxsize = kwargs.get('maxsize', 10)
+        timeout = self._get_option('pool_timeout', 30)
+        self._pool = mysqlpool.ConnectionPool(
+            size=minsize, maxsize=maxsize, pre_create_num=pre_create_num, name='pool1',
+            timeout=None if timeout is None else float(timeout),
+            con_lifetime=int(self._get_option('pool_lifetime', 3600)),
+            lifetime_jitter=float(self._get_option('pool_lifetime_jitter', 0.1)),
+            maintenance_interval=float(self._get_option('pool_maintenance_interval', 0)),
+            idle_timeout=float(self._get_option('pool_idle_timeout', 600)),
+            ping_interval=float(self._get_option('pool_ping_interval', 300)),
+            pre_ping=self._get_pre_ping(),
+            ping_idle_threshold=float(self._get_option('ping_idle_threshold', 30)),
+            **config)
         logger.info("MySQL Connection pool initialized...")
 
+    def _get_pre_ping(self) -> typing.Union[bool, str]:
+        pre_ping = self._get_option("pre_ping", False)
+        if isinstance(pre_ping, str):
+            pre_ping = {"true": True, "false": False, "idle": "idle"}[pre_ping.lower()]
+        return pre_ping
+
     def disconnect(self) -> None:
-        pass
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def pool_stats(self) -> typing.Dict[str, typing.Any]:
+        assert self._pool is not None, "DatabaseBackend is not running"
+        return self._pool.stats()
 
     def connection(self) -> "MySQLConnection":
         return MySQLConnection(self, self._dialect)
@@ -100,23 +174,12 @@ class MySQLBackend(DatabaseBackend):
 #     def release(self, connection: pymysql.Connection) -> None:
 #         connection.close()
 
-def alchemyencoder(obj):
-    """JSON encoder function for SQLAlchemy special classes."""
-    if isinstance(obj, datetime.date):
-        return obj.isoformat()
-    elif isinstance(obj, decimal.Decimal):
-        return float(obj)
-
-class CompilationContext:
-    def __init__(self, context: ExecutionContext):
-        self.context = context
-
-
 class MySQLConnection(ConnectionBackend):
     def __init__(self, database: MySQLBackend, dialect: Dialect):
 
         self._database = database
         self._dialect = dialect
+        self._pending_event = None  # type: typing.Optional[QueryEvent]
         self._connection = None  # type: typing.Optional[pymysql.Connection]
 
     def acquire(self) -> None:
@@ -132,54 +195,67 @@ class MySQLConnection(ConnectionBackend):
     def fetch_all(self, query: ClauseElement) -> typing.List[Record]:
         assert self._connection is not None, "Connection is not acquired"
         query_str, args, context = self._compile(query)
-        cursor = self._connection.cursor()
+        cursor = self._cursor()
         try:
             cursor.execute(query_str, args)
             rows = cursor.fetchall()
-            metadata = CursorResultMetaData(context, cursor.description)
-            return [
-                Row(
-                    metadata,
-                    metadata._processors,
-                    metadata._keymap,
-                    Row._default_key_style,
-                    row,
-                )
-                for row in rows
-            ]
+            make_record = self._record_factory(query, context, cursor.description)
+            return self._records(make_record, rows)
         finally:
             cursor.close()
 
     def fetch_all_as_json_string(self, query: ClauseElement) -> typing.AnyStr:
-        rows = self.fetch_all(query)
-        result = json.dumps([dict(r) for r in rows], default=alchemyencoder)
-        return result
+        return "".join(self.iterate_json(query))
+
+    def iterate_json(
+        self, query: ClauseElement, ndjson: bool = False
+    ) -> typing.Iterator[str]:
+        assert self._connection is not None, "Connection is not acquired"
+        query_str, args, context = self._compile(query)
+        cursor = self._cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(query_str, args)
+            chunks = iter_json(cursor, self._database._iterate_chunk_size, ndjson)
+            if self._database.profiler is not None:
+                chunks = self._database.profiler.timed(chunks, "json", exclude="fetch")
+            yield from chunks
+        finally:
+            cursor.close()
 
+    def fetch_columns(
+        self,
+        query: ClauseElement,
+        dtypes: typing.Union[typing.Mapping[str, typing.Any], typing.Sequence] = None,
+    ) -> typing.Dict[str, typing.Any]:
+        assert self._connection is not None, "Connection is not acquired"
+        query_str, args, context = self._compile(query)
+        cursor = self._cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(query_str, args)
+            return read_columns(
+                cursor, COLUMN_DTYPES, dtypes, self._database._iterate_chunk_size
+            )
+        finally:
+            cursor.close()
 
     def fetch_one(self, query: ClauseElement) -> typing.Optional[Record]:
         assert self._connection is not None, "Connection is not acquired"
         query_str, args, context = self._compile(query)
-        cursor = self._connection.cursor()
+        cursor = self._cursor()
         try:
             cursor.execute(query_str, args)
             row = cursor.fetchone()
             if row is None:
                 return None
-            metadata = CursorResultMetaData(context, cursor.description)
-            return Row(
-                metadata,
-                metadata._processors,
-                metadata._keymap,
-                Row._default_key_style,
-                row,
-            )
+            make_record = self._record_factory(query, context, cursor.description)
+            return self._records(make_record, (row,))[0]
         finally:
             cursor.close()
 
     def execute(self, query: ClauseElement) -> typing.Any:
         assert self._connection is not None, "Connection is not acquired"
         query_str, args, context = self._compile(query)
-        cursor = self._connection.cursor()
+        cursor = self._cursor()
         try:
             cursor.execute(query_str, args)
             if cursor.lastrowid == 0:
@@ -188,13 +264,28 @@ class MySQLConnection(ConnectionBackend):
         finally:
             cursor.close()
 
-    def execute_many(self, queries: typing.List[ClauseElement]) -> None:
+    def execute_many(self, query: ClauseElement, values: typing.List[dict]) -> int:
         assert self._connection is not None, "Connection is not acquired"
-        cursor = self._connection.cursor()
+        if not values:
+            return 0
+        # rows with other keys need a statement naming other columns
+        return sum(self._execute_many(query, run) for run in key_runs(values))
+
+    def _execute_many(self, query: ClauseElement, values: typing.Sequence[dict]) -> int:
+        query_str, args_list = self._compile_many(query, values)
+        cursor = self._cursor()
+        # pymysql rewrites INSERT ... VALUES into multi-row statements of at
+        # most max_stmt_length bytes; keep those below max_allowed_packet.
+        cursor.max_stmt_length = min(
+            cursor.max_stmt_length,
+            self._connection.max_allowed_packet - MAX_PACKET_HEADROOM,
+        )
+        rowcount = 0
         try:
-            for single_query in queries:
-                single_query, args, context = self._compile(single_query)
-                cursor.execute(single_query, args)
+            batch_size = self._database._execute_many_batch_size
+            for batch in batched(args_list, batch_size):
+                rowcount += cursor.executemany(query_str, batch) or 0
+            return rowcount
         finally:
             cursor.close()
 
@@ -203,18 +294,47 @@ class MySQLConnection(ConnectionBackend):
     ) -> typing.AsyncGenerator[typing.Any, None]:
         assert self._connection is not None, "Connection is not acquired"
         query_str, args, context = self._compile(query)
-        cursor = self._connection.cursor()
+        chunk_size = self._database._iterate_chunk_size
+        # Unbuffered cursor: rows are read off the socket chunk by chunk
+        # instead of the driver buffering the whole result set.
+        cursor = self._cursor(pymysql.cursors.SSCursor)
         try:
             cursor.execute(query_str, args)
-            metadata = CursorResultMetaData(context, cursor.description)
-            for row in cursor:
-                yield Row(
-                    metadata,
-                    metadata._processors,
-                    metadata._keymap,
-                    Row._default_key_style,
-                    row,
-                )
+            make_record = self._record_factory(query, context, cursor.description)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from self._records(make_record, rows)
+        finally:
+            # If the iteration was abandoned, closing the unbuffered cursor
+            # reads and discards the rest of the result so the connection
+            # can go back to the pool in a usable state: for a large result
+            # that means transferring every remaining row. To end it early,
+            # kill() the statement's session_id() from another connection
+            # (KILL QUERY) before breaking out of the loop.
+            cursor.close()
+
+    def explain(self, query: str, args: typing.Any) -> str:
+        assert self._connection is not None, "Connection is not acquired"
+        cursor = self._connection.cursor()
+        try:
+            cursor.execute("EXPLAIN FORMAT=JSON " + query, args)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+
+    def session_id(self) -> int:
+        assert self._connection is not None, "Connection is not acquired"
+        return self._connection.thread_id()
+
+    def kill(self, session_id: int) -> None:
+        assert self._connection is not None, "Connection is not acquired"
+        cursor = self._connection.cursor()
+        try:
+            # the statement fails with ER_QUERY_INTERRUPTED; the session and
+            # its connection stay usable
+            cursor.execute("KILL QUERY %s", (int(session_id),))
         finally:
             cursor.close()
 
@@ -224,31 +344,111 @@ class MySQLConnection(ConnectionBackend):
     def _compile(
         self, query: ClauseElement
     ) -> typing.Tuple[str, dict, CompilationContext]:
-        compiled = query.compile(
-            dialect=self._dialect, compile_kwargs={"render_postcompile": True}
+        hooks = self._database.hooks
+        profiler = self._database.profiler
+        started = time.perf_counter() if hooks.active else None
+        started_ns = time.perf_counter_ns() if profiler is not None else None
+        if isinstance(query, BoundStatement):
+            statement, hit = query.statement, True
+            query_str, args = statement.construct(values=query.values)
+        else:
+            statement, extracted_parameters, hit = self._database.statement_cache.compile(
+                query, self._dialect
+            )
+            query_str, args = statement.construct(extracted_parameters)
+        if started_ns is not None:
+            profiler.add("compile", time.perf_counter_ns() - started_ns)
+            profiler.set_statement(query_str)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            query_message = query_str.replace(" \n", " ").replace("\n", " ")
+            logger.debug(
+                "Query: %s Args: %s", query_message, repr(args), extra=LOG_EXTRA
+            )
+        if started is not None:
+            self._pending_event = QueryEvent(
+                query_str, args, len(args), hit, time.perf_counter() - started
+            )
+        return query_str, args, statement.context
+
+    def _cursor(self, cursor_class: typing.Any = None) -> typing.Any:
+        """
+        Open a cursor, wrapped to report the statement compiled last to the
+        query hooks while any are registered, and to time execute and fetch
+        calls while profiling.
+        """
+        if cursor_class is None:
+            cursor = self._connection.cursor()
+        else:
+            cursor = self._connection.cursor(cursor_class)
+        if self._database.profiler is not None:
+            cursor = ProfiledCursor(cursor, self._database.profiler)
+        event, self._pending_event = self._pending_event, None
+        if event is None:
+            return cursor
+        return InstrumentedCursor(cursor, event, self._database.hooks)
+
+    def _records(
+        self,
+        make_record: typing.Callable[[typing.Sequence[typing.Any]], Record],
+        rows: typing.Sequence[typing.Sequence[typing.Any]],
+    ) -> typing.List[Record]:
+        profiler = self._database.profiler
+        if profiler is None:
+            return list(map(make_record, rows))
+        started = time.perf_counter_ns()
+        records = list(map(make_record, rows))
+        profiler.add("records", time.perf_counter_ns() - started)
+        return records
+
+    def _record_factory(
+        self,
+        query: ClauseElement,
+        context: CompilationContext,
+        description: typing.Sequence[typing.Any],
+    ) -> typing.Callable[[typing.Sequence[typing.Any]], Record]:
+        record_class = query.get_execution_options().get(
+            "record_class", self._database._record_class
         )
-
-        execution_context = self._dialect.execution_ctx_cls()
-        execution_context.dialect = self._dialect
-
-        if not isinstance(query, DDLElement):
-            args = compiled.construct_params()
-            for key, val in args.items():
-                if key in compiled._bind_processors:
-                    args[key] = compiled._bind_processors[key](val)
-
-            execution_context.result_column_struct = (
-                compiled._result_columns,
-                compiled._ordered_columns,
-                compiled._textual_ordered_columns,
-                compiled._loose_column_name_matching,
+        return context.record_factory(description, record_class)
+
+    def _compile_many(
+        self, query: ClauseElement, values: typing.List[dict]
+    ) -> typing.Tuple[str, typing.List[dict]]:
+        hooks = self._database.hooks
+        profiler = self._database.profiler
+        started = time.perf_counter() if hooks.active else None
+        started_ns = time.perf_counter_ns() if profiler is not None else None
+        if isinstance(query, BoundStatement):
+            statement, extracted_parameters, hit = (
+                query.prepared.many_statement(list(values[0])), None, True
             )
         else:
-            args = {}
-
-        query_message = compiled.string.replace(" \n", " ").replace("\n", " ")
-        logger.debug("Query: %s Args: %s", query_message, repr(args), extra=LOG_EXTRA)
-        return compiled.string, args, CompilationContext(execution_context)
+            statement, extracted_parameters, hit = self._database.statement_cache.compile(
+                query, self._dialect, column_keys=list(values[0]), for_executemany=True
+            )
+        query_str, args_list = statement.construct_many(values, extracted_parameters)
+        if started_ns is not None:
+            profiler.add("compile", time.perf_counter_ns() - started_ns)
+            profiler.set_statement(query_str)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            query_message = query_str.replace(" \n", " ").replace("\n", " ")
+            logger.debug(
+                "Query: %s Args: %s",
+                query_message,
+                f"<{len(args_list)} parameter sets>",
+                extra=LOG_EXTRA,
+            )
+        if started is not None:
+            self._pending_event = QueryEvent(
+                query_str,
+                args_list,
+                sum(map(len, args_list)),
+                hit,
+                time.perf_counter() - started,
+            )
+        return query_str, args_list
 
 
     @property
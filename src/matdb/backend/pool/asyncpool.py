@@ -0,0 +1,453 @@
+import asyncio
+import logging
+import random
+import struct
+import time
+
+from pymysql import _auth, converters, err
+from pymysql.charset import charset_by_name
+from pymysql.connections import TEXT_TYPES
+from pymysql.constants import CLIENT, COMMAND, FIELD_TYPE, SERVER_STATUS
+from pymysql.protocol import FieldDescriptorPacket, MysqlPacket, OKPacketWrapper
+
+from matdb.backend.pool.base import GetConnectionFromPoolError
+from matdb.backend.pool.metrics import PoolMetrics
+
+__all__ = ['Connection', 'ConnectionPool', 'GetConnectionFromPoolError', 'Result']
+
+logger = logging.getLogger(__name__)
+
+MAX_PACKET_LEN = 2 ** 24 - 1
+
+CLIENT_FLAGS = (CLIENT.LONG_PASSWORD | CLIENT.LONG_FLAG | CLIENT.PROTOCOL_41 | CLIENT.TRANSACTIONS
+                | CLIENT.SECURE_CONNECTION | CLIENT.MULTI_RESULTS | CLIENT.PLUGIN_AUTH
+                | CLIENT.PLUGIN_AUTH_LENENC_CLIENT_DATA)
+
+_DEFAULT = object()
+
+
+class Result:
+    """
+    Result of one statement. Buffered results hold all `rows`; unbuffered ones are read with fetchmany() and
+    must be read to the end (or drained) before the connection runs another statement.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self.rows = []
+        self._converters = []
+        self._unread = False
+
+    async def _read(self, unbuffered):
+        connection = self._connection
+        packet = await connection._read_packet()
+        if packet.is_ok_packet():
+            ok = OKPacketWrapper(packet)
+            self.rowcount, self.lastrowid = ok.affected_rows, ok.insert_id
+            connection._server_status = ok.server_status
+            return
+        column_count = packet.read_length_encoded_integer()
+        fields = [FieldDescriptorPacket((await connection._read_packet()).get_all_data(), connection.encoding)
+                  for _ in range(column_count)]
+        await connection._read_packet()  # EOF after the column definitions
+        self.description = tuple(field.description() for field in fields)
+        for field in fields:
+            if field.type_code == FIELD_TYPE.JSON:
+                encoding = connection.encoding
+            elif field.type_code in TEXT_TYPES:
+                encoding = None if field.charsetnr == 63 else connection.encoding
+            else:
+                encoding = 'ascii'
+            converter = converters.decoders.get(field.type_code)
+            self._converters.append((encoding, None if converter is converters.through else converter))
+        self._unread = True
+        connection._unread_result = self
+        if not unbuffered:
+            self.rows = await self.fetchmany(None)
+            self.rowcount = len(self.rows)
+
+    async def fetchmany(self, size):
+        """Read up to `size` rows (all remaining rows if size is None)."""
+        rows = []
+        while self._unread and (size is None or len(rows) < size):
+            packet = await self._connection._read_packet()
+            if packet.is_eof_packet():
+                self._unread = False
+                self._connection._unread_result = None
+                packet.advance(3)
+                self._connection._server_status = packet.read_uint16()
+                break
+            rows.append(self._read_row(packet))
+        return rows
+
+    def _read_row(self, packet):
+        row = []
+        for encoding, converter in self._converters:
+            data = packet.read_length_coded_string()
+            if data is not None:
+                if encoding is not None:
+                    data = data.decode(encoding)
+                if converter is not None:
+                    data = converter(data)
+            row.append(data)
+        return tuple(row)
+
+    async def drain(self):
+        while self._unread:
+            await self.fetchmany(1000)
+
+
+class Connection:
+    """
+    MySQL client speaking the text protocol over asyncio streams, with pymysql's packet parsing, authentication,
+    escaping and type conversion.
+    """
+
+    def __init__(self, host='localhost', port=3306, user=None, password='', database=None, charset='utf8mb4',
+                 autocommit=True, connect_timeout=10, **kwargs):
+        self.host = host
+        self.port = port or 3306
+        self.user = user or ''
+        self.password = (password or '').encode('utf-8')
+        self.database = database
+        self.charset = charset
+        self.encoding = charset_by_name(charset).encoding
+        self.autocommit_mode = autocommit
+        self.connect_timeout = connect_timeout
+        self._reader = None
+        self._writer = None
+        self._next_seq_id = 0
+        self._server_status = 0
+        self._unread_result = None
+        self._pool = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.connect_timeout)
+        try:
+            await asyncio.wait_for(self._handshake(), self.connect_timeout)
+            if self.autocommit_mode is not None:
+                await self.query('SET AUTOCOMMIT = {}'.format(int(bool(self.autocommit_mode))))
+        except BaseException:
+            self._force_close()
+            raise
+        return self
+
+    async def _handshake(self):
+        data = (await self._read_packet()).get_all_data()
+        i = data.find(b'\0', 1) + 1
+        i += 4  # thread id
+        salt = data[i:i + 8]
+        i += 9
+        capabilities = struct.unpack('<H', data[i:i + 2])[0]
+        i += 2
+        salt_len = 0
+        if len(data) >= i + 6:
+            _, self._server_status, cap_high, salt_len = struct.unpack('<BHHB', data[i:i + 6])
+            capabilities |= cap_high << 16
+            i += 6
+        i += 10
+        salt_len = max(12, salt_len - 9)
+        salt += data[i:i + salt_len]
+        i += salt_len + 1
+        plugin = ''
+        if capabilities & CLIENT.PLUGIN_AUTH:
+            end = data.find(b'\0', i)
+            plugin = data[i:end if end >= 0 else len(data)].decode('utf-8')
+
+        flags = CLIENT_FLAGS | (CLIENT.CONNECT_WITH_DB if self.database else 0)
+        payload = struct.pack('<iIB23s', flags, MAX_PACKET_LEN, charset_by_name(self.charset).id, b'')
+        payload += self.user.encode(self.encoding) + b'\0'
+        auth_response = self._scramble(plugin, salt)
+        payload += bytes([len(auth_response)]) + auth_response
+        if self.database:
+            payload += self.database.encode(self.encoding) + b'\0'
+        payload += plugin.encode('utf-8') + b'\0'
+        self._write_packet(payload)
+        await self._authenticate(plugin, salt)
+
+    def _scramble(self, plugin, salt):
+        if plugin == 'caching_sha2_password':
+            return _auth.scramble_caching_sha2(self.password, salt) if self.password else b''
+        if plugin in ('', 'mysql_native_password'):
+            return _auth.scramble_native_password(self.password, salt)
+        raise err.OperationalError(2059, "Authentication plugin '{}' is not supported".format(plugin))
+
+    async def _authenticate(self, plugin, salt):
+        packet = await self._read_packet()
+        if packet.is_auth_switch_request():
+            packet.read_uint8()
+            plugin = packet.read_string().decode('utf-8')
+            salt = packet.read_all().rstrip(b'\0')
+            self._write_packet(self._scramble(plugin, salt))
+            packet = await self._read_packet()
+        if packet.is_extra_auth_data() and plugin == 'caching_sha2_password':
+            packet.advance(1)
+            state = packet.read_uint8()
+            if state == 4:  # full authentication: encrypt the password with the server's public key
+                self._write_packet(b'\x02')
+                public_key = (await self._read_packet()).get_all_data()[1:]
+                self._write_packet(_auth.sha2_rsa_encrypt(self.password, salt, public_key))
+            elif state != 3:  # 3: fast authentication succeeded
+                raise err.OperationalError(2059, 'caching_sha2_password: unknown state {}'.format(state))
+            packet = await self._read_packet()
+        if not packet.is_ok_packet():
+            raise err.OperationalError(2013, 'Unexpected packet during authentication')
+
+    async def _read_packet(self):
+        data = b''
+        while True:
+            header = await self._reader.readexactly(4)
+            length = header[0] | header[1] << 8 | header[2] << 16
+            self._next_seq_id = (header[3] + 1) % 256
+            data += await self._reader.readexactly(length)
+            if length < MAX_PACKET_LEN:
+                break
+        packet = MysqlPacket(data, self.encoding)
+        if packet.is_error_packet():
+            if self._unread_result is not None:
+                self._unread_result._unread = False
+                self._unread_result = None
+            packet.raise_for_error()
+        return packet
+
+    def _write_packet(self, payload):
+        while True:
+            chunk, payload = payload[:MAX_PACKET_LEN], payload[MAX_PACKET_LEN:]
+            self._writer.write(struct.pack('<I', len(chunk))[:3] + bytes([self._next_seq_id]) + chunk)
+            self._next_seq_id = (self._next_seq_id + 1) % 256
+            if len(chunk) < MAX_PACKET_LEN:
+                break
+
+    async def _command(self, command, argument=b''):
+        if self._writer is None:
+            raise err.InterfaceError(0, 'Connection is closed')
+        if self._unread_result is not None:
+            raise err.ProgrammingError(2014, 'Previous unbuffered result has not been read')
+        self._next_seq_id = 0
+        self._write_packet(bytes([command]) + argument)
+        await self._writer.drain()
+
+    def escape_args(self, args):
+        if isinstance(args, dict):
+            return {key: converters.escape_item(value, self.charset) for key, value in args.items()}
+        return tuple(converters.escape_item(value, self.charset) for value in args)
+
+    def mogrify(self, query, args=None):
+        # as pymysql: empty args still format, unescaping the "%%" of e.g. LIKE 'a%%'
+        if args is not None:
+            query = query % self.escape_args(args)
+        return query
+
+    async def query(self, query, args=None, unbuffered=False):
+        """Run one statement and return its Result."""
+        await self._command(COMMAND.COM_QUERY, self.mogrify(query, args).encode(self.encoding, 'surrogateescape'))
+        result = Result(self)
+        await result._read(unbuffered)
+        if not unbuffered:
+            # discard the extra results of e.g. a stored procedure call
+            while self._server_status & SERVER_STATUS.SERVER_MORE_RESULTS_EXISTS:
+                await Result(self)._read(False)
+        return result
+
+    async def ping(self):
+        await self._command(COMMAND.COM_PING)
+        await self._read_packet()
+
+    async def begin(self):
+        await self.query('BEGIN')
+
+    async def commit(self):
+        await self.query('COMMIT')
+
+    async def rollback(self):
+        await self.query('ROLLBACK')
+
+    async def close(self):
+        """With pool, put the connection back to the pool; without, send the quit message and close the socket."""
+        if self._pool is not None:
+            await self._pool._put_connection(self)
+            return
+        if self._writer is None:
+            return
+        try:
+            if self._unread_result is None:
+                self._next_seq_id = 0
+                self._write_packet(bytes([COMMAND.COM_QUIT]))
+                await self._writer.drain()
+        except Exception:
+            pass
+        self._force_close()
+
+    def _force_close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    @property
+    def open(self):
+        return self._writer is not None
+
+
+class ConnectionPool:
+    """
+    asyncio counterpart of mysqlpool.ConnectionPool with the same size, maxsize, con_lifetime, pre_create_num and
+    timeout semantics. Idle connections sit in an asyncio.Queue; when a connection is discarded while others wait,
+    a `None` token put on the queue wakes the next waiter, which then creates a connection in the freed slot.
+    Tokens are not connections: they are counted apart, in neither the idle nor the total gauge.
+    """
+
+    def __init__(self, size=10, maxsize=100, name=None, pre_create_num=0, con_lifetime=3600, timeout=30,
+                 lifetime_jitter=0.1, **kwargs):
+        self._size = size
+        self.maxsize = maxsize
+        self._pre_create_num = min(pre_create_num, maxsize)
+        self._con_lifetime = con_lifetime
+        self._lifetime_jitter = lifetime_jitter
+        self._timeout = timeout
+        self._kwargs = kwargs
+        self.name = name if name else '-'.join(
+            [kwargs.get('host', 'localhost'), str(kwargs.get('port', 3306)),
+             kwargs.get('user', '') or '', kwargs.get('database', '') or ''])
+        self._idle = asyncio.Queue()
+        self._slot_tokens = 0
+        self._created_num = 0
+        self._waiting = 0
+        self.metrics = PoolMetrics()
+
+    async def init(self):
+        """Create the `pre_create_num` connections."""
+        for _ in range(self._pre_create_num):
+            self._created_num += 1
+            try:
+                conn = await self._create_connection()
+            except BaseException:
+                self._created_num -= 1
+                raise
+            conn._returned = True
+            self._idle.put_nowait(conn)
+        return self
+
+    async def get_connection(self, timeout=_DEFAULT):
+        if timeout is _DEFAULT:
+            timeout = self._timeout
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        while True:
+            if self._idle.empty() and self._created_num < self.maxsize:
+                self._created_num += 1
+                conn = await self._create_in_slot()
+                break
+            if not self._idle.empty():
+                conn = self._idle.get_nowait()
+            else:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.metrics.checkout_timeout()
+                    raise GetConnectionFromPoolError(
+                        "can't get connection from pool({}), all {} connections in use".format(
+                            self.name, self.maxsize))
+                self._waiting += 1
+                try:
+                    conn = await asyncio.wait_for(self._idle.get(), remaining)
+                except asyncio.TimeoutError:
+                    self.metrics.checkout_timeout()
+                    raise GetConnectionFromPoolError("can't get connection from pool({}) within {}(s)".format(
+                        self.name, timeout)) from None
+                finally:
+                    self._waiting -= 1
+            if conn is None:
+                # a freed slot: create in it, unless another checkout took it first
+                self._slot_tokens -= 1
+                continue
+            if self._is_expired(conn):
+                await self._close_connection(conn, recycled=True)
+                conn = await self._create_in_slot()
+            break
+        conn._returned = False
+        conn._checked_out_at = now = time.monotonic()
+        self.metrics.checkout(now - start, self._created_num - self.size)
+        return conn
+
+    async def _create_in_slot(self):
+        try:
+            conn = await self._create_connection()
+        except BaseException:
+            self._release_slot()
+            raise
+        conn._returned = False
+        return conn
+
+    def _release_slot(self):
+        self._created_num -= 1
+        if self._waiting > self._slot_tokens:
+            self._slot_tokens += 1
+            self._idle.put_nowait(None)
+
+    async def _put_connection(self, conn):
+        if conn._returned:
+            raise err.ProgrammingError(0, 'this connection has already returned to the pool({})'.format(self.name))
+        self.metrics.checkin(time.monotonic() - conn._checked_out_at)
+        if conn._unread_result is not None or not conn.open:
+            await self._discard_connection(conn)
+            return
+        if self._is_expired(conn) and (self._created_num > self._size and self._waiting == 0):
+            # over the normal size: shrink rather than replace
+            await self._discard_connection(conn, recycled=True)
+            return
+        conn._returned = True
+        self._idle.put_nowait(conn)
+
+    async def _discard_connection(self, conn, recycled=False):
+        await self._close_connection(conn, recycled)
+        self._release_slot()
+
+    def _is_expired(self, conn):
+        return self._con_lifetime > 0 and time.time() >= conn._expire_ts
+
+    async def _close_connection(self, conn, recycled=False):
+        conn._pool = None
+        try:
+            await conn.close()
+        except Exception:
+            conn._force_close()
+        self.metrics.connection_closed(recycled)
+
+    async def _create_connection(self):
+        conn = await Connection(**self._kwargs).connect()
+        conn._pool = self
+        conn._create_ts = time.time()
+        conn._expire_ts = conn._create_ts + self._con_lifetime * (1 - random.uniform(0, self._lifetime_jitter))
+        conn._returned = False
+        self.metrics.connection_created()
+        logger.debug('Create new connection in pool(%s)', self.name)
+        return conn
+
+    async def close(self):
+        """Close all idle connections."""
+        while not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if conn is None:
+                self._slot_tokens -= 1
+                continue
+            await self._close_connection(conn)
+            self._created_num -= 1
+
+    def stats(self):
+        """Gauges, counters and checkout wait / hold time histograms of the pool as a dict, see PoolMetrics."""
+        idle, total = self.size, self._created_num
+        return self.metrics.snapshot(name=self.name, in_use=total - idle, idle=idle, total=total,
+                                     waiting=self._waiting, maxsize=self.maxsize)
+
+    @property
+    def size(self):
+        """available connections number for now"""
+        return self._idle.qsize() - self._slot_tokens
+
+    @property
+    def connection_num(self):
+        """total connections number of all used and available"""
+        return self._created_num
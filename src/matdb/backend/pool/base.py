@@ -0,0 +1,407 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from matdb.backend.pool.metrics import PoolMetrics
+
+__all__ = ['BaseConnectionPool', 'GetConnectionFromPoolError', 'ReturnConnectionToPoolError']
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT = object()
+
+
+class _Waiter:
+    """A thread blocked in get_connection(), served in FIFO order."""
+
+    __slots__ = ('condition', 'conn', 'slot')
+
+    def __init__(self, lock):
+        self.condition = threading.Condition(lock)
+        # set by the thread that serves this waiter: either an idle
+        # connection, or the right to create a new one (`slot`)
+        self.conn = None
+        self.slot = False
+
+
+class BaseConnectionPool:
+    """
+    Thread-safe connection pool core shared by the MySQL and MSSQL pools.
+
+    Idle connections and waiting threads are both kept in deques guarded by one lock. A connection that is
+    returned while threads are waiting is handed straight to the longest waiter; a waiter whose connection is
+    closed instead is given the right to create a new one. Subclasses implement `_new_connection()`.
+    """
+
+    default_port = 3306
+
+    def __init__(self, size=10, maxsize=100, name=None, pre_create_num=0, con_lifetime=3600, timeout=30,
+                 lifetime_jitter=0.1, maintenance_interval=0, idle_timeout=600, ping_interval=300, pre_ping=False,
+                 ping_idle_threshold=30, *args, **kwargs):
+        """
+        size: int
+            normal size of the pool
+        maxsize: int
+            max size for scalability
+        name: str
+            optional pool name (str)
+            default: host-port-user-database
+        pre_create_num: int
+            create specified number connections at the init phase; otherwise will create connection when really need.
+        con_lifetime: int
+            the max lifetime(seconds) of the connections, if it reach the specified seconds, when return to the pool:
+                1. if connction_number<=size, create a new connection and replace the overlifetime one in the pool;
+                   resolve the problem of mysql server side close due to 'wait_timeout'
+                2. If connction_number>size, close the connection and remove it from the pool.
+                   used for pool scalability.
+            in order for the arg to work as expect:
+                you should make sure that mysql's 'wait_timeout' variable is greater than the con_lifetime.
+            0 or negative means do not consider the lifetime
+        timeout: float
+            default seconds get_connection() waits for a connection when maxsize connections are in use;
+            None waits forever, 0 raises immediately
+        lifetime_jitter: float
+            each connection's lifetime is shortened by a random fraction up to this value, so connections created
+            together do not all expire together
+        maintenance_interval: float
+            seconds between runs of the background maintenance thread, 0 disables it. Each run, off the request path:
+                1. replaces idle connections that would reach their lifetime before the next run;
+                2. closes connections idle for more than `idle_timeout` seconds while above `size`;
+                3. pings connections idle for more than `ping_interval` seconds, replacing dead ones;
+                4. creates connections until the pool holds `size` again.
+        idle_timeout: float
+            see maintenance_interval, 0 disables idle reaping
+        ping_interval: float
+            see maintenance_interval, 0 disables pinging
+        pre_ping: bool or str
+            default liveness check of get_connection(): False never pings, True pings every checkout and 'idle'
+            pings only connections idle for more than `ping_idle_threshold` seconds
+        ping_idle_threshold: float
+            see pre_ping
+        args & kwargs:
+            passed to the driver's connect
+        """
+        self._size = size
+        self.maxsize = maxsize
+        self._pool = deque()
+        self._pre_create_num = pre_create_num if pre_create_num <= maxsize else maxsize
+        self._con_lifetime = con_lifetime
+        self._lifetime_jitter = lifetime_jitter
+        self._timeout = timeout
+        self._maintenance_interval = maintenance_interval
+        self._idle_timeout = idle_timeout
+        self._ping_interval = ping_interval
+        if pre_ping not in (False, True, 'idle'):
+            raise ValueError("pre_ping must be False, True or 'idle', got {!r}".format(pre_ping))
+        self._pre_ping = pre_ping
+        self._ping_idle_threshold = ping_idle_threshold
+        self._args = args
+        self._kwargs = kwargs
+        self.name = name if name else '-'.join(
+            [kwargs.get('host', 'localhost'), str(kwargs.get('port', self.default_port)),
+             kwargs.get('user', ''), kwargs.get('database', '')])
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._created_num = 0  # number of all used and available connections, guarded by _lock
+        self.metrics = PoolMetrics()
+
+        for _ in range(self._pre_create_num):
+            with self._lock:
+                self._created_num += 1
+            self._release_connection(self._create_connection())
+
+        self._closed = threading.Event()
+        self._maintenance_thread = None
+        if maintenance_interval > 0:
+            self._maintenance_thread = threading.Thread(
+                target=self._maintenance_loop, name='matdb-pool-{}'.format(self.name), daemon=True)
+            self._maintenance_thread.start()
+
+    def _new_connection(self):
+        raise NotImplementedError()  # pragma: no cover
+
+    def get_connection(self, timeout=_DEFAULT, pre_ping=_DEFAULT):
+        """
+        timeout: float
+            seconds to wait for a connection when maxsize connections are in use, defaults to the pool timeout;
+            None waits forever, 0 raises immediately
+        pre_ping: bool or str
+            before return a connection, send a ping command to the server, if the connection is broken, replace it
+            with a new one; True pings always, 'idle' only after `ping_idle_threshold` idle seconds.
+            Defaults to the pool pre_ping
+        """
+        if timeout is _DEFAULT:
+            timeout = self._timeout
+        if pre_ping is _DEFAULT:
+            pre_ping = self._pre_ping
+
+        start = time.monotonic()
+        conn = self._checkout(timeout, pre_ping)
+        conn._checked_out_at = now = time.monotonic()
+        self.metrics.checkout(now - start, self._created_num - len(self._pool))
+        logger.debug('Get connection from pool(%s)', self.name)
+        return conn
+
+    def _checkout(self, timeout, pre_ping):
+        conn = None
+        with self._lock:
+            if self._pool:
+                conn = self._pool.pop()
+            elif self._created_num < self.maxsize:
+                self._created_num += 1
+            else:
+                conn = self._wait(timeout)
+
+        if conn is None:
+            return self._create_in_slot()
+
+        # check con_lifetime
+        if self._is_expired(conn):
+            self._close_connection(conn, recycled=True)
+            logger.debug("Close connection in pool(%s) due to lifetime reached", self.name)
+            # loss one, create one: the slot is kept for the replacement
+            return self._create_in_slot()
+        if pre_ping is True or (
+                pre_ping == 'idle' and time.monotonic() - conn._checked_at >= self._ping_idle_threshold):
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                # dropped by a firewall or wait_timeout: retry once with a new connection in the same slot
+                logger.debug('Replace dead connection in pool(%s)', self.name)
+                self._close_connection(conn)
+                return self._create_in_slot()
+
+        conn._returned = False
+        return conn
+
+    def _wait(self, timeout):
+        """Block as the last waiter in line; called with the lock held. Returns a connection or None for a slot."""
+        if timeout is not None and timeout <= 0:
+            self.metrics.checkout_timeout()
+            raise GetConnectionFromPoolError("can't get connection from pool({}), all {} connections in use".format(
+                self.name, self.maxsize))
+        waiter = _Waiter(self._lock)
+        self._waiters.append(waiter)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        logger.debug('Wait for connection from pool(%s)', self.name)
+        while waiter.conn is None and not waiter.slot:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                self._waiters.remove(waiter)
+                self.metrics.checkout_timeout()
+                raise GetConnectionFromPoolError("can't get connection from pool({}) within {}(s)".format(
+                    self.name, timeout))
+            waiter.condition.wait(remaining)
+        return waiter.conn
+
+    def _create_in_slot(self):
+        """Create a connection for a slot already counted in _created_num."""
+        try:
+            conn = self._create_connection()
+        except BaseException:
+            self._release_slot()
+            raise
+        conn._returned = False
+        return conn
+
+    def _release_slot(self):
+        """Give up one counted slot, passing it to the longest waiter if there is one."""
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.slot = True
+                waiter.condition.notify()
+            else:
+                self._created_num -= 1
+
+    def _put_connection(self, conn):
+        if not hasattr(conn, '_pool') or conn._pool is None:
+            return
+        if conn._returned:
+            raise ReturnConnectionToPoolError("this connection has already returned to the pool({})".format(self.name))
+        self.metrics.checkin(time.monotonic() - conn._checked_out_at)
+        conn.cursor().close()
+        # consider the connection lifetime with the purpose of reduce active connections number
+        if self._is_expired(conn):
+            self._close_connection(conn, recycled=True)
+            logger.debug("Close connection in pool(%s) due to lifetime reached", self.name)
+            with self._lock:
+                replace = bool(self._waiters) or self._created_num <= self._size
+                if not replace:
+                    self._created_num -= 1
+            if not replace:
+                return
+            try:
+                conn = self._create_connection()
+            except Exception:
+                self._release_slot()
+                raise
+        self._release_connection(conn)
+        logger.debug("Put connection back to pool(%s)", self.name)
+
+    def _release_connection(self, conn, checked=False):
+        """
+        Hand an open connection to the longest waiter, or park it with the idle connections. `checked` marks
+        a connection coming back from a maintenance ping, which does not count as use.
+        """
+        now = time.monotonic()
+        conn._checked_at = now
+        with self._lock:
+            if self._waiters:
+                conn._returned = False
+                waiter = self._waiters.popleft()
+                waiter.conn = conn
+                waiter.condition.notify()
+            else:
+                conn._returned = True
+                if not checked:
+                    conn._idle_since = now
+                self._pool.appendleft(conn)
+
+    def _discard_connection(self, conn):
+        """Close a connection that must not be reused and free its slot."""
+        self._close_connection(conn)
+        self._release_slot()
+
+    def _is_expired(self, conn, margin=0):
+        return self._con_lifetime > 0 and time.time() + margin >= conn._expire_ts
+
+    def _close_connection(self, conn, recycled=False):
+        conn._pool = None
+        self.metrics.connection_closed(recycled)
+        try:
+            conn.close()
+        except Exception:
+            force_close = getattr(conn, '_force_close', None)
+            if force_close is not None:
+                force_close()
+
+    def _create_connection(self):
+        conn = self._new_connection()
+        conn._pool = self
+        # add attr create timestamp for connection
+        conn._create_ts = int(time.time())
+        conn._expire_ts = conn._create_ts + self._con_lifetime * (1 - random.uniform(0, self._lifetime_jitter))
+        conn._idle_since = conn._checked_at = conn._checked_out_at = time.monotonic()
+        # add attr indicate whether the connection has already return to pool, should not use any more
+        conn._returned = False
+        self.metrics.connection_created()
+        logger.debug('Create new connection in pool(%s)', self.name)
+        return conn
+
+    def _maintenance_loop(self):
+        while not self._closed.wait(self._maintenance_interval):
+            try:
+                self.maintain()
+            except Exception:
+                logger.exception('Maintenance of pool(%s) failed', self.name)
+
+    def maintain(self):
+        """
+        One maintenance run: recycle, reap, ping and top up idle connections (see `maintenance_interval`).
+        Connections being checked are taken out of the idle deque, so they are never handed out meanwhile.
+        """
+        now = time.monotonic()
+        recycle, reap, ping, dead = [], [], [], []
+        with self._lock:
+            keep = deque()
+            surplus = self._created_num - self._size
+            # oldest-idle connections sit at the right end of the deque
+            while self._pool:
+                conn = self._pool.pop()
+                idle = now - conn._idle_since
+                if self._is_expired(conn, margin=self._maintenance_interval):
+                    recycle.append(conn)
+                elif surplus > 0 and self._idle_timeout > 0 and idle >= self._idle_timeout:
+                    reap.append(conn)
+                    surplus -= 1
+                elif self._ping_interval > 0 and now - conn._checked_at >= self._ping_interval:
+                    ping.append(conn)
+                else:
+                    keep.appendleft(conn)
+            self._pool = keep
+
+        for conn in reap:
+            logger.debug("Close idle connection in pool(%s)", self.name)
+            self._discard_connection(conn)
+        for conn in ping:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                logger.debug("Replace dead connection in pool(%s)", self.name)
+                dead.append(conn)
+            else:
+                self._release_connection(conn, checked=True)
+        # the slot stays counted while the replacement is created
+        for conn in recycle:
+            self._close_connection(conn, recycled=True)
+            self._replace_in_slot()
+        for conn in dead:
+            self._close_connection(conn)
+            self._replace_in_slot()
+
+        # a failed create (the server is down) ends the top-up until the next run
+        while not self._closed.is_set():
+            with self._lock:
+                if self._created_num >= self._size:
+                    break
+                self._created_num += 1
+            if not self._replace_in_slot():
+                break
+
+    def _replace_in_slot(self):
+        """Create a connection for a counted slot; False, with the slot freed, if that failed."""
+        try:
+            conn = self._create_connection()
+        except Exception:
+            self._release_slot()
+            logger.warning("Can't create connection in pool(%s)", self.name, exc_info=True)
+            return False
+        self._release_connection(conn)
+        return True
+
+    def close(self):
+        """Stop the maintenance thread and close all idle connections."""
+        self._closed.set()
+        if self._maintenance_thread is not None:
+            self._maintenance_thread.join()
+            self._maintenance_thread = None
+        with self._lock:
+            idle, self._pool = self._pool, deque()
+        for conn in idle:
+            self._close_connection(conn)
+            self._release_slot()
+
+    def stats(self):
+        """
+        Gauges, counters and checkout wait / hold time histograms of the pool as a dict, see PoolMetrics.
+        """
+        with self._lock:
+            idle, total, waiting = len(self._pool), self._created_num, len(self._waiters)
+        return self.metrics.snapshot(name=self.name, in_use=total - idle, idle=idle, total=total,
+                                     waiting=waiting, maxsize=self.maxsize)
+
+    @property
+    def size(self):
+        """available connections number for now"""
+        return len(self._pool)
+
+    @property
+    def connection_num(self):
+        """total connections number of all used and available"""
+        return self._created_num
+
+    @property
+    def waiting_num(self):
+        """number of threads waiting for a connection"""
+        return len(self._waiters)
+
+
+class GetConnectionFromPoolError(Exception):
+    """Exception related can't get connection from pool within timeout seconds."""
+
+
+class ReturnConnectionToPoolError(Exception):
+    """Exception related can't return connection to pool."""
@@ -0,0 +1,151 @@
+import threading
+from bisect import bisect_left
+
+__all__ = ['DEFAULT_BUCKETS', 'Histogram', 'PoolMetrics', 'prometheus_text']
+
+# upper bounds (seconds) of the checkout wait and hold time histograms
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+COUNTERS = ('created', 'closed', 'recycled', 'timeouts')
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        # the last bucket counts observations above every bound (+Inf)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """Cumulative buckets as a list of (upper bound, count), ending with (inf, count)."""
+        buckets, total = [], 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class PoolMetrics:
+    """
+    Counters, checkout wait / hold time histograms and the in-use high-water mark of one pool.
+
+    Checkout and checkin, which run on every request, update the histograms without a lock: a bisect over the
+    bucket bounds and a few increments keep collection under a microsecond per checkout, at the cost of a rare
+    lost increment when two threads update the same bucket at once. The remaining counters are locked. Gauges
+    are not stored here, the pool reports them in its stats().
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.wait_time = Histogram(buckets)
+        self.hold_time = Histogram(buckets)
+        self.created = 0
+        self.closed = 0
+        self.recycled = 0
+        self.timeouts = 0
+        self.high_water = 0
+
+    def checkout(self, wait, in_use):
+        """
+        wait: float
+            seconds spent in get_connection()
+        in_use: int
+            connections checked out, including this one
+        """
+        self.wait_time.observe(wait)
+        if in_use > self.high_water:
+            self.high_water = in_use
+
+    def checkin(self, hold):
+        self.hold_time.observe(hold)
+
+    def connection_created(self):
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, recycled=False):
+        """recycled: the connection was closed for reaching its lifetime"""
+        with self._lock:
+            self.closed += 1
+            if recycled:
+                self.recycled += 1
+
+    def checkout_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, **gauges):
+        """Return the counters and histograms merged with the pool's current `gauges`."""
+        with self._lock:
+            stats = dict(gauges)
+            stats.update((name, getattr(self, name)) for name in COUNTERS)
+            stats['high_water'] = self.high_water
+            stats['wait_time'] = self.wait_time.snapshot()
+            stats['hold_time'] = self.hold_time.snapshot()
+        return stats
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(
+        key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(stats, prefix='matdb_pool'):
+    """
+    Render pool stats (one dict as returned by `stats()`, or a list of them) in the Prometheus text exposition
+    format, e.g. to serve from an existing HTTP endpoint or write for the node exporter textfile collector.
+    """
+    if isinstance(stats, dict):
+        stats = [stats]
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append('# HELP {}_{} {}'.format(prefix, name, help_text))
+        lines.append('# TYPE {}_{} {}'.format(prefix, name, kind))
+        for suffix, labels, value in samples:
+            lines.append('{}_{}{}{} {}'.format(prefix, name, suffix, _labels(**labels), _number(value)))
+
+    family('connections', 'gauge', 'Connections in the pool by state.', [
+        ('', {'pool': pool['name'], 'state': state}, pool[state])
+        for pool in stats for state in ('in_use', 'idle')])
+    family('max_connections', 'gauge', 'Maximum number of connections.', [
+        ('', {'pool': pool['name']}, pool['maxsize']) for pool in stats])
+    family('waiting', 'gauge', 'Threads waiting for a connection.', [
+        ('', {'pool': pool['name']}, pool['waiting']) for pool in stats])
+    family('high_water', 'gauge', 'Most connections in use at once.', [
+        ('', {'pool': pool['name']}, pool['high_water']) for pool in stats])
+    for counter, name, help_text in (('created', 'connections_created_total', 'Connections created.'),
+                                     ('closed', 'connections_closed_total', 'Connections closed.'),
+                                     ('recycled', 'connections_recycled_total',
+                                      'Connections closed for reaching their lifetime.'),
+                                     ('timeouts', 'checkout_timeouts_total', 'Checkouts that timed out.')):
+        family(name, 'counter', help_text, [('', {'pool': pool['name']}, pool[counter]) for pool in stats])
+    for histogram, name, help_text in (
+            ('wait_time', 'checkout_wait_seconds', 'Seconds spent waiting to check out a connection.'),
+            ('hold_time', 'hold_seconds', 'Seconds a connection was held before being returned.')):
+        samples = []
+        for pool in stats:
+            snapshot = pool[histogram]
+            samples.extend(('_bucket', {'pool': pool['name'], 'le': _number(float(bound))}, count)
+                           for bound, count in snapshot['buckets'])
+            samples.append(('_sum', {'pool': pool['name']}, snapshot['sum']))
+            samples.append(('_count', {'pool': pool['name']}, snapshot['count']))
+        family(name, 'histogram', help_text, samples)
+    return '\n'.join(lines) + '\n'
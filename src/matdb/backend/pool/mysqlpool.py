@@ -2,10 +2,10 @@
 import pymysql
 import warnings
 import logging
-import time
-from collections import deque
 
-__all__ = ['Connection', 'ConnectionPool', 'logger']
+from matdb.backend.pool.base import BaseConnectionPool, GetConnectionFromPoolError, ReturnConnectionToPoolError
+
+__all__ = ['Connection', 'ConnectionPool', 'GetConnectionFromPoolError', 'ReturnConnectionToPoolError', 'logger']
 
 warnings.filterwarnings('error', category=pymysql.err.Warning)
 # use logging module for easy debug
@@ -39,13 +39,10 @@ class Connection(pymysql.connections.Connection):
                 '''reusable connection'''
                 self._pool._put_connection(self)
             else:
-                '''no reusable connection, close it and create a new one put to the pool'''
-                self._pool = None
-                try:
-                    self.close()
-                    logger.debug("Close non-reusable connection in pool(%s) caused by %s", self._pool.name, value)
-                except Exception:
-                    self._force_close()
+                '''no reusable connection, close it and free its place in the pool'''
+                pool = self._pool
+                pool._discard_connection(self)
+                logger.debug("Close non-reusable connection in pool(%s) caused by %s", pool.name, value)
         else:
             pymysql.connections.Connection.__exit__(self, exc, value, traceback)
 
@@ -108,155 +105,12 @@ class Connection(pymysql.connections.Connection):
             return cur.fetchone() if return_one else cur.fetchall()
 
 
-class ConnectionPool:
+class ConnectionPool(BaseConnectionPool):
     """
-    Return connection_pool object, which has method can get connection from a pool with timeout and retry feature;
+    Return connection_pool object, which has method can get connection from a pool with timeout feature;
     put a reusable connection back to the pool, etc; also we can create different instance of this class that represent
     different pool of different DB Server or different user
     """
 
-    def __init__(self, size=10, maxsize=100, name=None, pre_create_num=0, con_lifetime=3600, *args, **kwargs):
-        """
-        size: int
-            normal size of the pool
-        maxsize: int
-            max size for scalability
-        name: str
-            optional pool name (str)
-            default: host-port-user-database
-        pre_create_num: int
-            create specified number connections at the init phase; otherwise will create connection when really need.
-        con_lifetime: int
-            the max lifetime(seconds) of the connections, if it reach the specified seconds, when return to the pool:
-                1. if connction_number<=size, create a new connection and replace the overlifetime one in the pool;
-                   resolve the problem of mysql server side close due to 'wait_timeout'
-                2. If connction_number>size, close the connection and remove it from the pool.
-                   used for pool scalability.
-            in order for the arg to work as expect:
-                you should make sure that mysql's 'wait_timeout' variable is greater than the con_lifetime.
-            0 or negative means do not consider the lifetime
-        args & kwargs:
-            same as pymysql.connections.Connection()
-        """
-        self._size = size
-        self.maxsize = maxsize
-        self._pool = deque()
-        self._pre_create_num = pre_create_num if pre_create_num <= maxsize else maxsize
-        self._con_lifetime = con_lifetime
-        self._args = args
-        self._kwargs = kwargs
-        self.name = name if name else '-'.join(
-            [kwargs.get('host', 'localhost'), str(kwargs.get('port', 3306)),
-             kwargs.get('user', ''), kwargs.get('database', '')])
-        self._created_num = deque()  # record the number of all used and available connections(use deque for thread-safe)
-
-        if pre_create_num > 0:
-            for _ in range(self._pre_create_num):
-                conn = self._create_connection()
-                self._pool.appendleft(conn)
-                conn._returned = True
-        else:
-            self._args = args
-            self._kwargs = kwargs
-
-    def get_connection(self, retry_num=3, retry_interval=0.1, pre_ping=False):
-        """
-        timeout: int
-            timeout of get a connection from pool, should be a int(0 means return or raise immediately)
-        retry_num: int
-            how many times will retry to get a connection
-        pre_ping: bool
-            before return a connection, send a ping command to the Mysql server, if the connection is broken, reconnect it
-        """
-        if retry_num > 10:
-            retry_num = 10  # retry_num hard limit
-        try:
-            conn = self._pool.pop()
-        except IndexError:
-            if self.connection_num < self._size:
-                return self._create_connection()
-            if retry_num > 0:
-                retry_num -= 1
-                time.sleep(retry_interval)
-                logger.debug('Retry to get connection from pool(%s)', self.name)
-                return self.get_connection(retry_num, retry_interval, pre_ping)
-            else:
-                if self.connection_num < self.maxsize:
-                    return self._create_connection()
-                else:
-                    raise GetConnectionFromPoolError("can't get connection from pool({}), retry_interval={}(s)".format(
-                        self.name, retry_num, retry_interval))
-
-        # check con_lifetime
-        if self._con_lifetime > 0 and int(time.time()) - conn._create_ts >= self._con_lifetime:
-            conn._pool = None
-            try:
-                conn.close()
-            except:
-                conn._force_close()
-            self._created_num.pop()
-            logger.debug("Close connection in pool(%s) due to lifetime reached", self.name)
-            # loss one, create one
-            return self._create_connection()
-        else:
-            if pre_ping:
-                conn.ping(reconnect=True)
-
-        conn._returned = False
-        logger.debug('Get connection from pool(%s)', self.name)
-        return conn
-
-    def _put_connection(self, conn):
-        if not hasattr(conn, '_pool') or conn._pool is None:
-            return
-        conn.cursor().close()
-        if not conn._returned:
-            # consider the connection lifetime with the purpose of reduce active connections number
-            if self._con_lifetime > 0 and int(time.time()) - conn._create_ts >= self._con_lifetime:
-                conn._pool = None
-                try:
-                    conn.close()
-                except:
-                    conn._force_close()
-                self._created_num.pop()
-                logger.debug("Close connection in pool(%s) due to lifetime reached", self.name)
-                if self.connection_num >= self._size:
-                    conn._returned = True
-                    return
-                conn = self._create_connection()
-            self._pool.appendleft(conn)
-            conn._returned = True
-            logger.debug("Put connection back to pool(%s)", self.name)
-        else:
-            raise ReturnConnectionToPoolError("this connection has already returned to the pool({})".format(self.name))
-
-    def _create_connection(self):
-        conn = Connection(*self._args, **self._kwargs)
-
-
-        conn._pool = self
-        # add attr create timestamp for connection
-        conn._create_ts = int(time.time())
-        # add attr indicate whether the connection has already return to pool, should not use any more
-        conn._returned = False
-        self._created_num.append(1)
-        logger.debug('Create new connection in pool(%s)', self.name)
-        return conn
-
-    @property
-    def size(self):
-        """available connections number for now"""
-        return len(self._pool)
-
-    @property
-    def connection_num(self):
-        """total connections number of all used and available"""
-        return len(self._created_num)
-
-
-class GetConnectionFromPoolError(Exception):
-    """Exception related can't get connection from pool within timeout seconds."""
-
-
-class ReturnConnectionToPoolError(Exception):
-    """Exception related can't return connection to pool."""
\ No newline at end of file
+    def _new_connection(self):
+        return Connection(*self._args, **self._kwargs)
@@ -0,0 +1,69 @@
+import time
+
+from dbutils.pooled_db import PooledDB, TooManyConnections
+
+from matdb.backend.pool.metrics import PoolMetrics
+
+__all__ = ['MeteredPooledDB']
+
+
+class MeteredPooledDB(PooledDB):
+    """
+    DBUtils PooledDB collecting the same PoolMetrics as BaseConnectionPool, for backends still pooling through
+    DBUtils. Only dedicated (non-shared) connections are measured, which is all PooledDB hands out for drivers
+    with threadsafety 1 such as pymssql.
+    """
+
+    def __init__(self, creator, *args, name=None, **kwargs):
+        # set before PooledDB.__init__, which already creates the `mincached` connections
+        self.metrics = PoolMetrics()
+        self.name = name if name else '-'.join(
+            [str(kwargs.get('host', 'localhost')), str(kwargs.get('port', '')),
+             str(kwargs.get('user', '')), str(kwargs.get('database', ''))])
+        super().__init__(creator, *args, **kwargs)
+        # the warm-up checkouts of those connections are not real use: keep only their creation count
+        created, self.metrics = self.metrics.created, PoolMetrics()
+        self.metrics.created = created
+
+    def steady_connection(self):
+        con = super().steady_connection()
+        self.metrics.connection_created()
+        return con
+
+    def connection(self, shareable=True):
+        start = time.monotonic()
+        try:
+            con = super().connection(shareable)
+        except TooManyConnections:
+            self.metrics.checkout_timeout()
+            raise
+        steady = getattr(con, '_con', None)
+        if steady is not None:
+            steady._checked_out_at = now = time.monotonic()
+            self.metrics.checkout(now - start, self._connections)
+        return con
+
+    def cache(self, con):
+        checked_out_at = getattr(con, '_checked_out_at', None)
+        if checked_out_at is not None:
+            self.metrics.checkin(time.monotonic() - checked_out_at)
+        # the pool lock is reentrant, so the cache-full check and the close in PooledDB.cache() agree
+        with self._lock:
+            full = self._maxcached and len(self._idle_cache) >= self._maxcached
+            super().cache(con)
+        if full:
+            self.metrics.connection_closed()
+
+    def close(self):
+        with self._lock:
+            idle = len(self._idle_cache)
+            super().close()
+        for _ in range(idle):
+            self.metrics.connection_closed()
+
+    def stats(self):
+        """Gauges, counters and histograms of the pool as a dict, see BaseConnectionPool.stats()."""
+        with self._lock:
+            in_use, idle = self._connections, len(self._idle_cache)
+        return self.metrics.snapshot(name=self.name, in_use=in_use, idle=idle, total=in_use + idle,
+                                     waiting=0, maxsize=self._maxconnections)
@@ -0,0 +1,125 @@
+import functools
+import typing
+
+from sqlalchemy.engine.cursor import CursorResultMetaData
+from sqlalchemy.engine.row import Row
+
+from matdb.interfaces import Record
+
+__all__ = ["CompactRecord", "ResultColumns", "RECORD_CLASSES", "record_factory"]
+
+RECORD_CLASSES = ("row", "compact")
+
+
+class ResultColumns:
+    """
+    Column names, name-to-index map and type processors shared by every
+    CompactRecord of one result.
+    """
+
+    __slots__ = ("keys", "keymap", "processors", "record_class")
+
+    def __init__(
+        self,
+        keys: typing.Sequence[str],
+        processors: typing.Sequence[typing.Optional[typing.Callable]] = None,
+    ) -> None:
+        self.keys = tuple(keys)
+        # On duplicate column names the first column wins.
+        self.keymap = {}  # type: typing.Dict[str, int]
+        for index, key in enumerate(self.keys):
+            self.keymap.setdefault(key, index)
+        # Only columns that actually have a processor are visited per row.
+        self.processors = [
+            (index, processor)
+            for index, processor in enumerate(processors or ())
+            if processor is not None
+        ]
+        # A subclass per result lets a record be a bare tuple, with the
+        # column map held once on its class.
+        self.record_class = type(
+            "CompactRecord", (CompactRecord,), {"__slots__": (), "_columns": self}
+        )
+
+    def __reduce__(self) -> typing.Tuple[typing.Any, ...]:
+        # pickled records hold processed values: no processors to restore
+        return ResultColumns, (self.keys,)
+
+    def make_record(self, row: typing.Sequence[typing.Any]) -> "CompactRecord":
+        if self.processors:
+            row = list(row)
+            for index, processor in self.processors:
+                row[index] = processor(row[index])
+        return self.record_class(row)
+
+    @property
+    def factory(self) -> typing.Callable[[typing.Sequence[typing.Any]], Record]:
+        """
+        `make_record`, or the record class itself when no column needs
+        processing.
+        """
+        return self.make_record if self.processors else self.record_class
+
+
+class CompactRecord(tuple, Record):
+    """
+    Lightweight tuple-based record supporting index, key and attribute
+    access, e.g. `record[0]`, `record["name"]` and `record.name`.
+    """
+
+    __slots__ = ()
+
+    _columns = None  # type: typing.ClassVar[ResultColumns]
+
+    @property
+    def _mapping(self) -> typing.Mapping:
+        return dict(zip(self._columns.keys, self))
+
+    def keys(self) -> typing.Tuple[str, ...]:
+        return self._columns.keys
+
+    def __getitem__(self, key: typing.Any) -> typing.Any:
+        if key.__class__ is str:
+            key = self._columns.keymap[key]
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        try:
+            return tuple.__getitem__(self, self._columns.keymap[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __reduce__(self) -> typing.Tuple[typing.Any, ...]:
+        # pickle memoizes the ResultColumns, so a pickled result rebuilds
+        # its record class once rather than once per record
+        return _rebuild_record, (self._columns, tuple(self))
+
+
+def _rebuild_record(
+    columns: typing.Union[ResultColumns, typing.Sequence[str]], values: tuple
+) -> CompactRecord:
+    if not isinstance(columns, ResultColumns):
+        columns = ResultColumns(columns)
+    return columns.record_class(values)
+
+
+def record_factory(
+    metadata: CursorResultMetaData, record_class: str = "row"
+) -> typing.Callable[[typing.Sequence[typing.Any]], Record]:
+    """
+    Return a callable building one record of `record_class` from a cursor row.
+    """
+    if record_class == "compact":
+        columns = ResultColumns(list(metadata.keys), metadata._processors)
+        return columns.factory
+    if record_class != "row":
+        raise ValueError(
+            f"Invalid record class {record_class!r}, expected one of {RECORD_CLASSES}"
+        )
+    return functools.partial(
+        Row,
+        metadata,
+        metadata._processors,
+        metadata._keymap,
+        Row._default_key_style,
+    )
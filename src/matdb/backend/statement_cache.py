@@ -0,0 +1,291 @@
+import threading
+import typing
+from collections import OrderedDict
+
+from sqlalchemy.engine.cursor import CursorResultMetaData
+from sqlalchemy.engine.interfaces import Dialect, ExecutionContext
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.sql.ddl import DDLElement
+
+from matdb.backend.record import record_factory
+from matdb.interfaces import Record
+
+__all__ = ["CompilationContext", "CompiledStatement", "StatementCache"]
+
+EVICTION_POLICIES = ("lru", "fifo")
+
+# Distinct cursor descriptions remembered per statement; more than a couple
+# only happens for e.g. "SELECT *" across schema changes.
+MAX_RESULT_SHAPES = 8
+
+
+class CompilationContext:
+    def __init__(self, context: ExecutionContext):
+        self.context = context
+        self._metadata = {}  # type: typing.Dict[tuple, CursorResultMetaData]
+        self._record_factories = {}  # type: typing.Dict[tuple, typing.Callable]
+
+    def result_metadata(
+        self, description: typing.Sequence[typing.Any]
+    ) -> CursorResultMetaData:
+        """
+        Return the result metadata for `description`, built once per distinct
+        cursor description of this statement.
+        """
+        key = tuple(description)
+        try:
+            return self._metadata[key]
+        except KeyError:
+            pass
+        metadata = CursorResultMetaData(self, description)
+        if len(self._metadata) >= MAX_RESULT_SHAPES:
+            self._metadata.clear()
+        self._metadata[key] = metadata
+        return metadata
+
+    def record_factory(
+        self, description: typing.Sequence[typing.Any], record_class: str
+    ) -> typing.Callable[[typing.Sequence[typing.Any]], Record]:
+        key = (record_class, tuple(description))
+        try:
+            return self._record_factories[key]
+        except KeyError:
+            pass
+        factory = record_factory(self.result_metadata(description), record_class)
+        if len(self._record_factories) >= MAX_RESULT_SHAPES:
+            self._record_factories.clear()
+        self._record_factories[key] = factory
+        return factory
+
+
+class CompiledStatement:
+    """
+    The value-independent part of a compiled query: the SQL string, the bind
+    processors and the result column structure. Instances are shared between
+    threads and connections. Their attributes are set once in __init__; the
+    per-description result metadata and record factory caches of `context`
+    are filled lazily at run time, which is thread-safe because each lookup,
+    store and clear is a single atomic dict operation (a race at worst builds
+    the same entry twice).
+    """
+
+    __slots__ = ("compiled", "context", "is_ddl", "_has_postcompile")
+
+    def __init__(
+        self,
+        query: ClauseElement,
+        dialect: Dialect,
+        cache_key: typing.Any = None,
+        column_keys: typing.Optional[typing.Sequence[str]] = None,
+        for_executemany: bool = False,
+        prepared: bool = False,
+    ) -> None:
+        self.is_ddl = isinstance(query, DDLElement)
+        if cache_key is None and not for_executemany and not prepared:
+            # Not cacheable, so values can be rendered straight into the SQL.
+            compiled = query.compile(
+                dialect=dialect, compile_kwargs={"render_postcompile": True}
+            )
+            self._has_postcompile = False
+        else:
+            # Expanding IN lists and literal-execute binds (e.g. MSSQL TOP)
+            # depend on the bound values; they are rendered per call.
+            compiled = query.compile(
+                dialect=dialect,
+                cache_key=cache_key,
+                column_keys=column_keys,
+                for_executemany=for_executemany,
+            )
+            self._has_postcompile = bool(
+                compiled.literal_execute_params or compiled.post_compile_params
+            )
+        self.compiled = compiled
+
+        execution_context = dialect.execution_ctx_cls()
+        execution_context.dialect = dialect
+        if not self.is_ddl:
+            execution_context.result_column_struct = (
+                compiled._result_columns,
+                compiled._ordered_columns,
+                compiled._textual_ordered_columns,
+                compiled._loose_column_name_matching,
+            )
+        self.context = CompilationContext(execution_context)
+
+    def construct(
+        self,
+        extracted_parameters: typing.Optional[typing.Sequence] = None,
+        values: typing.Optional[dict] = None,
+    ) -> typing.Tuple[str, dict]:
+        """
+        Return the SQL string and processed arguments for one execution,
+        `values` overriding the bound values of the compiled statement.
+        """
+        compiled = self.compiled
+        if self.is_ddl:
+            return compiled.string, {}
+
+        if not self._has_postcompile:
+            args = compiled.construct_params(
+                values, extracted_parameters=extracted_parameters
+            )
+            processors = compiled._bind_processors
+            for key, val in args.items():
+                if key in processors:
+                    args[key] = processors[key](val)
+            return compiled.string, args
+
+        expanded = compiled._process_parameters_for_postcompile(
+            compiled.construct_params(
+                values, escape_names=False, extracted_parameters=extracted_parameters
+            )
+        )
+        processors = dict(compiled._bind_processors, **expanded.processors)
+        escaped = compiled.escaped_bind_names
+        args = {}
+        for key, val in expanded.additional_parameters.items():
+            if key in processors:
+                val = processors[key](val)
+            args[escaped.get(key, key) if escaped else key] = val
+        return expanded.statement, args
+
+    def construct_many(
+        self,
+        values: typing.Sequence[dict],
+        extracted_parameters: typing.Optional[typing.Sequence] = None,
+    ) -> typing.Tuple[str, typing.List[dict]]:
+        """
+        Return the SQL string and one processed argument dict per parameter
+        set, for use with `cursor.executemany`.
+        """
+        compiled = self.compiled
+        if self.is_ddl or self._has_postcompile:
+            raise ValueError(
+                "execute_many does not support DDL or expanding IN parameters"
+            )
+
+        processors = compiled._bind_processors
+        args_list = []
+        for group_number, params in enumerate(values, 1):
+            args = compiled.construct_params(
+                params,
+                _group_number=group_number,
+                extracted_parameters=extracted_parameters,
+            )
+            for key, val in args.items():
+                if key in processors:
+                    args[key] = processors[key](val)
+            args_list.append(args)
+        return compiled.string, args_list
+
+
+class StatementCache:
+    """
+    Bounded, thread-safe cache of CompiledStatement objects, keyed on the
+    structure of a statement rather than on its bound values.
+    """
+
+    def __init__(self, maxsize: int = 500, eviction: str = "lru") -> None:
+        """
+        maxsize: int
+            max number of cached statements, 0 disables the cache
+        eviction: str
+            "lru" evicts the least recently used statement,
+            "fifo" evicts the oldest statement regardless of use
+        """
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(
+                f"Invalid eviction policy {eviction!r}, expected one of {EVICTION_POLICIES}"
+            )
+        self.maxsize = maxsize
+        self.eviction = eviction
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def compile(
+        self,
+        query: ClauseElement,
+        dialect: Dialect,
+        column_keys: typing.Optional[typing.Sequence[str]] = None,
+        for_executemany: bool = False,
+    ) -> typing.Tuple[CompiledStatement, typing.Optional[typing.Sequence], bool]:
+        """
+        Return the CompiledStatement for `query`, the bound values extracted
+        from it and whether the statement came from the cache.
+
+        `column_keys` and `for_executemany` are used to compile an INSERT or
+        UPDATE once for a list of parameter sets.
+        """
+        cache_key = None
+        if self.maxsize > 0 and not isinstance(query, DDLElement):
+            cache_key = query._generate_cache_key()
+        if cache_key is None:
+            statement = CompiledStatement(
+                query,
+                dialect,
+                column_keys=column_keys,
+                for_executemany=for_executemany,
+            )
+            return statement, None, False
+
+        key = (
+            dialect,
+            cache_key.key,
+            tuple(column_keys) if column_keys else None,
+            for_executemany,
+        )
+        statement = self.get(key)
+        if statement is not None:
+            return statement, cache_key.bindparams, True
+
+        statement = CompiledStatement(
+            query,
+            dialect,
+            cache_key,
+            column_keys=column_keys,
+            for_executemany=for_executemany,
+        )
+        self.put(key, statement)
+        return statement, cache_key.bindparams, False
+
+    def get(self, key: typing.Hashable) -> typing.Optional[CompiledStatement]:
+        with self._lock:
+            try:
+                statement = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if self.eviction == "lru":
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return statement
+
+    def put(self, key: typing.Hashable, statement: CompiledStatement) -> None:
+        with self._lock:
+            self._entries[key] = statement
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "eviction": self.eviction,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,16 +1,32 @@
+import concurrent.futures
 import contextlib
 import functools
+import hashlib
+import itertools
 import logging
+import threading
+import time
 import typing
-from contextvars import ContextVar
+from contextvars import Context, ContextVar
 from types import TracebackType
 from urllib.parse import SplitResult, parse_qsl, unquote, urlsplit
 
 from sqlalchemy import text
 from sqlalchemy.sql import ClauseElement
+from sqlalchemy.sql.dml import ValuesBase
+from sqlalchemy.sql.elements import TextClause
 
+from matdb.backend.jsonstream import write_json
+from matdb.backend.statement_cache import CompiledStatement
+from matdb.events import QueryHooks
 from matdb.importer import import_from_string
 from matdb.interfaces import DatabaseBackend, Record
+from matdb.profiler import Profiler
+from matdb.replicas import HedgedAttempt, Replica, ReplicaSet, is_connection_error
+from matdb.result_cache import ResultCache, query_tables
+from matdb.shared_cache import SharedResultCache
+from matdb.slow_log import SlowQueryLog
+from matdb.statement_stats import StatementStats
 
 try:  # pragma: no cover
     import click
@@ -33,10 +49,29 @@ except ImportError:  # pragma: no cover
 
 logger = logging.getLogger("databases")
 
+# Threads running Database.fetch_all_parallel queries, unless the
+# `parallel_workers` option says otherwise.
+PARALLEL_WORKERS = 8
+
+# Reads a second replica may duplicate when the first is slow, and the
+# threads running their copies.
+HEDGED_METHODS = frozenset(("fetch_all", "fetch_one", "fetch_val"))
+HEDGE_WORKERS = 16
+
+
+@functools.lru_cache(maxsize=1024)
+def _text_template(query: str) -> TextClause:
+    """
+    Parse a raw SQL string into a TextClause once; `bindparams()` is
+    generative, so the template itself is never modified by callers.
+    """
+    return text(query)
+
 
 class Database:
     SUPPORTED_BACKENDS = {
         "mysql": "matdb.backend.mysql:MySQLBackend",
+        "mysql+async": "matdb.backend.asyncmysql:AsyncMySQLBackend",
         "mssql": "matdb.backend.mssql:MSSQLBackend"
     }
 
@@ -45,6 +80,7 @@ class Database:
         url: typing.Union[str, "DatabaseURL"],
         *,
         force_rollback: bool = False,
+        replicas: typing.Sequence[typing.Union[str, "DatabaseURL"]] = (),
         **options: typing.Any,
     ):
         self.url = DatabaseURL(url)
@@ -58,6 +94,94 @@ class Database:
         assert issubclass(backend_cls, DatabaseBackend)
         self._backend = backend_cls(self.url, **self.options)
 
+        # Per-fingerprint statement counters, collected through the query
+        # hooks when the `statement_stats` option is set.
+        self._statement_stats = None  # type: typing.Optional[StatementStats]
+        if self._get_option("statement_stats") in (True, "true"):
+            self._statement_stats = StatementStats()
+            self.hooks.register("after_execute", self._statement_stats)
+
+        self._slow_query_log = None  # type: typing.Optional[SlowQueryLog]
+        slow_query_threshold = self._get_option("slow_query_threshold")
+        if slow_query_threshold is not None:
+            self._slow_query_log = SlowQueryLog(
+                self._backend,
+                threshold=float(slow_query_threshold),
+                sample_rate=float(self._get_option("slow_query_sample_rate", 1.0)),
+                redact=self._get_option("slow_query_redact") in (True, "true"),
+                # plans are fetched on a thread, with the blocking backend API
+                explain=self._get_option("slow_query_explain") in (True, "true")
+                and not getattr(self._backend, "is_async", False),
+            )
+            self.hooks.register("after_execute", self._slow_query_log)
+
+        # Per-phase wall time of every call; disabled, the backend's
+        # profiler stays None and no phase is timed.
+        if self._get_option("profile") in (True, "true"):
+            self._backend.profiler = Profiler()
+
+        # Results of fetch_all / fetch_one / fetch_val calls given a TTL (per
+        # call, `cache_ttl` execution option, or `result_cache_ttl`), dropped
+        # by writes through this Database to the tables they read.
+        # `result_cache="shared"` keeps them in shared memory instead, one
+        # cache for every process on the host using the same database.
+        self._result_cache = None  # type: typing.Optional[typing.Union[ResultCache, SharedResultCache]]
+        result_cache = self._get_option("result_cache")
+        default_ttl = self._get_option("result_cache_ttl")
+        if result_cache in (True, "true"):
+            self._result_cache = ResultCache(
+                max_entries=int(self._get_option("result_cache_size", 1024)),
+                max_bytes=int(self._get_option("result_cache_bytes", 64 * 1024 * 1024)),
+                default_ttl=None if default_ttl is None else float(default_ttl),
+            )
+        elif result_cache == "shared":
+            name = self._get_option("result_cache_name") or "matdb-" + hashlib.blake2b(
+                str(self.url).encode("utf-8"), digest_size=8
+            ).hexdigest()
+            self._result_cache = SharedResultCache(
+                name,
+                max_bytes=int(self._get_option("result_cache_bytes", 64 * 1024 * 1024)),
+                slot_size=int(self._get_option("result_cache_slot_size", 64 * 1024)),
+                default_ttl=None if default_ttl is None else float(default_ttl),
+            )
+        if self._result_cache is not None:
+            self._backend.result_cache = self._result_cache
+
+        # Started by the first fetch_all_parallel call / hedged read.
+        self._parallel_executor = None  # type: typing.Optional[concurrent.futures.ThreadPoolExecutor]
+        self._hedge_executor = None  # type: typing.Optional[concurrent.futures.ThreadPoolExecutor]
+        self._parallel_lock = threading.Lock()
+
+        # Reads outside a connection or transaction block go to the
+        # replicas, each with a pool of its own; writes go to `url`.
+        self._replicas = None  # type: typing.Optional[ReplicaSet]
+        if replicas:
+            replica_list = []
+            for replica_url in map(DatabaseURL, replicas):
+                backend = import_from_string(self.SUPPORTED_BACKENDS.get(
+                    replica_url.scheme, self.SUPPORTED_BACKENDS[replica_url.dialect]
+                ))(replica_url, **self.options)
+                # one statement cache, and one set of hooks and profiler
+                backend.statement_cache = self._backend.statement_cache
+                backend.hooks = self._backend.hooks
+                backend.profiler = self._backend.profiler
+                backend.result_cache = self._backend.result_cache
+                replica_list.append(Replica(replica_url.obscure_password, backend))
+            self._replicas = ReplicaSet(
+                replica_list,
+                alpha=float(self._get_option("replica_ewma_alpha", 0.2)),
+                max_failures=int(self._get_option("replica_max_failures", 3)),
+                retry_interval=float(self._get_option("replica_retry_interval", 30)),
+            )
+        # A replica read outstanding for longer than this quantile of recent
+        # read latencies (and `hedge_min_delay` seconds) is sent to a second
+        # replica as well; the first answer wins.
+        hedge_percentile = self._get_option("hedge_percentile")
+        self._hedge_percentile = (
+            None if hedge_percentile is None else float(hedge_percentile)
+        )
+        self._hedge_min_delay = float(self._get_option("hedge_min_delay", 0.002))
+
         # Connections are stored as task-local state.
         self._connection_context = ContextVar("connection_context")  # type: ContextVar
 
@@ -66,6 +190,15 @@ class Database:
         self._global_connection = None  # type: typing.Optional[Connection]
         self._global_transaction = None  # type: typing.Optional[Transaction]
 
+    def _get_option(self, key: str, default: typing.Any = None) -> typing.Any:
+        """
+        Look up an option, keyword options taking precedence over
+        DatabaseURL query options.
+        """
+        if key in self.options:
+            return self.options[key]
+        return self.url.options.get(key, default)
+
     def connect(self) -> None:
         """
         Establish the connection pool.
@@ -73,11 +206,20 @@ class Database:
         if self.is_connected:
             logger.debug("Already connected, skipping connection")
             return None
+        assert not getattr(
+            self._backend, "is_async", False
+        ), f"{self.url.scheme} is an asyncio backend, use matdb.AsyncDatabase"
 
         self._backend.connect()
         logger.info(
             "Connected to database %s", self.url.obscure_password, extra=CONNECT_EXTRA
         )
+        if self._replicas is not None:
+            for replica in self._replicas.replicas:
+                replica.backend.connect()
+                logger.info(
+                    "Connected to replica %s", replica.name, extra=CONNECT_EXTRA
+                )
         self.is_connected = True
 
         if self._force_rollback:
@@ -110,6 +252,20 @@ class Database:
         else:
             self._connection_context = ContextVar("connection_context")
 
+        with self._parallel_lock:
+            executors = (self._parallel_executor, self._hedge_executor)
+            self._parallel_executor = self._hedge_executor = None
+        for executor in executors:
+            if executor is not None:
+                # queries still running (past their timeout, or losing
+                # hedges) need the pool
+                executor.shutdown(wait=True)
+        if self._slow_query_log is not None:
+            # plans still being fetched need the pool
+            self._slow_query_log.close()
+        if self._replicas is not None:
+            for replica in self._replicas.replicas:
+                replica.backend.disconnect()
         self._backend.disconnect()
         logger.info(
             "Disconnected from database %s",
@@ -131,32 +287,223 @@ class Database:
         self.disconnect()
 
     def fetch_all(
-        self, query: typing.Union[ClauseElement, str], values: dict = None
+        self,
+        query: typing.Union[ClauseElement, str],
+        values: dict = None,
+        *,
+        cache_ttl: float = None,
     ) -> typing.List[Record]:
-        with self.connection() as connection:
-            return connection.fetch_all(query, values)
+        if self._result_cache is not None:
+            return self._cached_read("fetch_all", query, values, cache_ttl)
+        return self._read("fetch_all", query, values)
+
+    def fetch_all_parallel(
+        self,
+        queries: typing.Sequence[
+            typing.Tuple[typing.Union[ClauseElement, str], typing.Optional[dict]]
+        ],
+        timeout: float = None,
+    ) -> typing.List[typing.Union[typing.List[Record], BaseException]]:
+        """
+        Run independent `(query, values)` reads at the same time, each on its
+        own pooled connection, and return their records in order. A query
+        that failed has its exception in place of its records; one not done
+        within `timeout` seconds overall has a concurrent.futures.TimeoutError
+        (a running one still finishes in the background).
+
+        No more queries run at once than the pool has free connections when
+        called (at least one), so the fan-out cannot starve other callers.
+        The queries run outside any transaction of the caller.
+        """
+        results = [None] * len(queries)  # type: typing.List[typing.Any]
+        if self._global_connection is not None:
+            # force_rollback: the single connection cannot be shared by threads
+            for index, (query, values) in enumerate(queries):
+                try:
+                    results[index] = self.fetch_all(query, values)
+                except Exception as exc:
+                    results[index] = exc
+            return results
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        executor = self._get_parallel_executor()
+        limit = self._parallel_limit(len(queries))
+        pending = {}  # type: typing.Dict[concurrent.futures.Future, int]
+        submitted = 0
+        while submitted < len(queries) or pending:
+            while submitted < len(queries) and len(pending) < limit:
+                query, values = queries[submitted]
+                future = executor.submit(self._fetch_all_on_own_connection, query, values)
+                pending[future] = submitted
+                submitted += 1
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            done, _ = concurrent.futures.wait(
+                pending, remaining, concurrent.futures.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as exc:
+                    results[index] = exc
+
+        for index in itertools.chain(pending.values(), range(submitted, len(queries))):
+            results[index] = concurrent.futures.TimeoutError(
+                f"Query {index} did not complete within {timeout}s"
+            )
+        return results
+
+    def _get_parallel_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        assert self.is_connected, "Database is not connected"
+        with self._parallel_lock:
+            if self._parallel_executor is None:
+                self._parallel_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=int(self._get_option("parallel_workers", PARALLEL_WORKERS)),
+                    thread_name_prefix="matdb-parallel",
+                )
+            return self._parallel_executor
+
+    def _get_hedge_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._parallel_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=int(self._get_option("hedge_workers", HEDGE_WORKERS)),
+                    thread_name_prefix="matdb-hedge",
+                )
+            return self._hedge_executor
+
+    def _parallel_limit(self, count: int) -> int:
+        """Queries run at once: the pool's free connections, at least one."""
+        try:
+            stats = self._backend.pool_stats()
+        except NotImplementedError:
+            return count
+        if not stats["maxsize"]:
+            # unbounded pool
+            return count
+        free = stats["maxsize"] - stats["in_use"] - stats["waiting"]
+        return max(1, min(count, free))
+
+    def _fetch_all_on_own_connection(
+        self, query: typing.Union[ClauseElement, str], values: typing.Optional[dict]
+    ) -> typing.List[Record]:
+        # an empty context gets a fresh Connection, so the worker thread's
+        # context never keeps one; the read otherwise goes through fetch_all()
+        # like any other, result cache and replicas included
+        return Context().run(self.fetch_all, query, values)
 
     def fetch_all_as_json_string(
         self, query: typing.Union[ClauseElement, str], values: dict = None
     ) -> typing.AnyStr:
-        with self.connection() as connection:
-            return connection.fetch_all_as_json_string(query, values)
+        return self._read("fetch_all_as_json_string", query, values)
+
+    def iterate_json(
+        self,
+        query: typing.Union[ClauseElement, str],
+        values: dict = None,
+        ndjson: bool = False,
+    ) -> typing.Iterator[str]:
+        """
+        Stream the result as encoded JSON chunks: a JSON array of objects, or
+        one object per line when `ndjson=True`.
+        """
+        return self._iterate_read("iterate_json", query, values, ndjson=ndjson)
 
+    def write_json(
+        self,
+        query: typing.Union[ClauseElement, str],
+        out: typing.Any,
+        values: dict = None,
+        ndjson: bool = False,
+    ) -> int:
+        """
+        Stream the result as JSON into a file-like object or socket, returning
+        the number of characters written.
+        """
+        return self._read("write_json", query, out, values, ndjson=ndjson)
+
+    def fetch_columns(
+        self,
+        query: typing.Union[ClauseElement, str],
+        values: dict = None,
+        dtypes: typing.Union[typing.Mapping[str, typing.Any], typing.Sequence] = None,
+    ) -> typing.Dict[str, typing.Any]:
+        """
+        Fetch the result as one NumPy masked array per column, keyed by column
+        name, with NULLs masked. Requires numpy.
+        """
+        return self._read("fetch_columns", query, values, dtypes=dtypes)
 
     def fetch_one(
-        self, query: typing.Union[ClauseElement, str], values: dict = None
+        self,
+        query: typing.Union[ClauseElement, str],
+        values: dict = None,
+        *,
+        cache_ttl: float = None,
     ) -> typing.Optional[Record]:
-        with self.connection() as connection:
-            return connection.fetch_one(query, values)
+        if self._result_cache is not None:
+            return self._cached_read("fetch_one", query, values, cache_ttl)
+        return self._read("fetch_one", query, values)
 
     def fetch_val(
         self,
         query: typing.Union[ClauseElement, str],
         values: dict = None,
         column: typing.Any = 0,
+        *,
+        cache_ttl: float = None,
     ) -> typing.Any:
-        with self.connection() as connection:
-            return connection.fetch_val(query, values, column=column)
+        if self._result_cache is not None:
+            record = self._cached_read("fetch_one", query, values, cache_ttl)
+            return None if record is None else record[column]
+        return self._read("fetch_val", query, values, column=column)
+
+    def _cached_read(
+        self,
+        method: str,
+        query: typing.Union[ClauseElement, str],
+        values: typing.Optional[dict],
+        ttl: typing.Optional[float],
+    ) -> typing.Any:
+        cache = self._result_cache
+        assert cache is not None
+        built_query = Connection._build_query(query, values)
+        if ttl is None:
+            ttl = built_query.get_execution_options().get("cache_ttl", cache.default_ttl)
+        if not ttl:
+            return self._read(method, built_query)
+        statement, extracted_parameters, _ = self._backend.statement_cache.compile(
+            built_query, self._backend._dialect
+        )
+        sql, args = statement.construct(extracted_parameters)
+        key = cache.make_key(method, sql, args)
+        if key is None:
+            return self._read(method, built_query)
+        hit, result = cache.get(key)
+        if hit:
+            return list(result) if method == "fetch_all" else result
+
+        tables = tuple(query_tables(sql))
+        token = cache.begin(tables)
+        result = self._read(method, built_query)
+        # rows read inside a transaction may never be committed
+        if not self._in_transaction():
+            cache.put(
+                key, list(result) if method == "fetch_all" else result, tables, ttl, token
+            )
+        return result
+
+    def _in_transaction(self) -> bool:
+        if self._global_connection is not None:
+            return True
+        try:
+            return bool(self._connection_context.get()._transaction_stack)
+        except LookupError:
+            return False
 
     def execute(
         self, query: typing.Union[ClauseElement, str], values: dict = None
@@ -166,16 +513,311 @@ class Database:
 
     def execute_many(
         self, query: typing.Union[ClauseElement, str], values: list
-    ) -> None:
+    ) -> int:
         with self.connection() as connection:
             return connection.execute_many(query, values)
 
     def iterate(
         self, query: typing.Union[ClauseElement, str], values: dict = None
     ) -> typing.AsyncGenerator[typing.Mapping, None]:
-        with self.connection() as connection:
-            for record in connection.iterate(query, values):
-                yield record
+        return self._iterate_read("iterate", query, values)
+
+    def prepare(
+        self, query: typing.Union[ClauseElement, str], *, server_side: bool = False
+    ) -> "PreparedStatement":
+        """
+        Compile `query` once, for hot paths running the same statement over
+        and over with different values. `server_side` prepares it on the
+        server as well, once per pooled connection (MSSQL only).
+        """
+        assert not getattr(self._backend, "is_async", False), "Use AsyncDatabase"
+        return PreparedStatement(self, query, server_side=server_side)
+
+    def _replica_connection(
+        self,
+    ) -> typing.Optional[typing.Tuple[Replica, "Connection"]]:
+        """
+        A replica connection for a read, checked out; None when the read
+        goes to the primary: no replicas in rotation, or the task is in a
+        connection or transaction block.
+        """
+        if not self._reads_on_replicas():
+            return None
+        failed = []  # type: typing.List[Replica]
+        while True:
+            replica = self._replicas.choose(exclude=failed)
+            if replica is None:
+                return None
+            connection = Connection(replica.backend)
+            try:
+                connection.__enter__()
+            except Exception as exc:
+                self._replicas.release(replica, failed=True)
+                logger.warning("Checkout from replica %s failed: %r", replica.name, exc)
+                failed.append(replica)
+                continue
+            return replica, connection
+
+    def _reads_on_replicas(self) -> bool:
+        if self._replicas is None or self._global_connection is not None:
+            return False
+        try:
+            return not self._connection_context.get()._connection_counter
+        except LookupError:
+            return True
+
+    def _read(self, method: str, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        if (
+            self._hedge_percentile is not None
+            and method in HEDGED_METHODS
+            and self._reads_on_replicas()
+        ):
+            delay = self._replicas.latency_percentile(self._hedge_percentile)
+            if delay is not None:
+                return self._hedged_read(
+                    max(delay, self._hedge_min_delay), method, *args, **kwargs
+                )
+        return self._read_unhedged(method, *args, **kwargs)
+
+    def _read_unhedged(
+        self, method: str, *args: typing.Any, **kwargs: typing.Any
+    ) -> typing.Any:
+        routed = self._replica_connection()
+        if routed is None:
+            with self.connection() as connection:
+                return getattr(connection, method)(*args, **kwargs)
+        replica, connection = routed
+        started = time.perf_counter()
+        failed = False
+        try:
+            return getattr(connection, method)(*args, **kwargs)
+        except Exception as exc:
+            failed = is_connection_error(exc)
+            raise
+        finally:
+            connection.__exit__()
+            self._replicas.release(
+                replica, None if failed else time.perf_counter() - started, failed
+            )
+
+    def _hedged_read(
+        self, delay: float, method: str, *args: typing.Any, **kwargs: typing.Any
+    ) -> typing.Any:
+        """
+        Run the read on a replica, and if it has not answered after `delay`
+        seconds, on a second one too; return the first answer and kill the
+        other copy's statement.
+        """
+        first = self._replicas.choose()
+        if first is None:
+            with self.connection() as connection:
+                return getattr(connection, method)(*args, **kwargs)
+        executor = self._get_hedge_executor()
+        attempts = {}  # type: typing.Dict[concurrent.futures.Future, HedgedAttempt]
+        attempt = HedgedAttempt(first)
+        attempts[executor.submit(self._run_attempt, attempt, method, args, kwargs)] = attempt
+        done, pending = concurrent.futures.wait(attempts, delay)
+        if not done:
+            second = self._replicas.choose(exclude=[first])
+            if second is not None:
+                attempt = HedgedAttempt(second)
+                future = executor.submit(self._run_attempt, attempt, method, args, kwargs)
+                attempts[future] = attempt
+                pending.add(future)
+
+        error = None  # type: typing.Optional[Exception]
+        while done or pending:
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    error = error or exc
+                    continue
+                for loser in pending:
+                    executor.submit(self._cancel_attempt, attempts[loser])
+                return result
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+        assert error is not None
+        if is_connection_error(error):
+            # the other replicas, or the primary
+            return self._read_unhedged(method, *args, **kwargs)
+        raise error
+
+    def _run_attempt(
+        self,
+        attempt: HedgedAttempt,
+        method: str,
+        args: typing.Tuple[typing.Any, ...],
+        kwargs: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        replica = attempt.replica
+        connection = Connection(replica.backend)
+        try:
+            connection.__enter__()
+        except Exception:
+            self._replicas.release(replica, failed=True)
+            raise
+        started = time.perf_counter()
+        failed = False
+        try:
+            with attempt.lock:
+                if attempt.cancelled:
+                    raise concurrent.futures.CancelledError()
+                attempt.session_id = connection._connection.session_id()
+            return getattr(connection, method)(*args, **kwargs)
+        except Exception as exc:
+            failed = not attempt.cancelled and is_connection_error(exc)
+            raise
+        finally:
+            with attempt.lock:
+                attempt.finished = True
+                connection.__exit__()
+            elapsed = None if failed or attempt.cancelled else time.perf_counter() - started
+            self._replicas.release(replica, elapsed, failed)
+
+    def _cancel_attempt(self, attempt: HedgedAttempt) -> None:
+        with attempt.lock:
+            attempt.cancelled = True
+            if attempt.finished or attempt.session_id is None:
+                # done, or not started: it will not run the statement
+                return
+        # checked out without the lock, which the attempt needs to give its
+        # own connection back
+        try:
+            killer = attempt.replica.backend.connection()
+            killer.acquire()
+        except Exception as exc:
+            logger.warning(
+                "Cancelling a hedged read on replica %s failed: %r",
+                attempt.replica.name,
+                exc,
+            )
+            return
+        try:
+            # the lock keeps the session from going back to the pool, and
+            # on to another statement, before the kill
+            with attempt.lock:
+                if not attempt.finished:
+                    killer.kill(attempt.session_id)
+        except Exception as exc:
+            logger.warning(
+                "Cancelling a hedged read on replica %s failed: %r",
+                attempt.replica.name,
+                exc,
+            )
+        finally:
+            killer.release()
+
+    def _iterate_read(
+        self, method: str, *args: typing.Any, **kwargs: typing.Any
+    ) -> typing.Iterator[typing.Any]:
+        routed = self._replica_connection()
+        if routed is None:
+            with self.connection() as connection:
+                yield from getattr(connection, method)(*args, **kwargs)
+            return
+        replica, connection = routed
+        # the latency of a stream is the time to its first item
+        started = time.perf_counter()
+        reserved = True
+        try:
+            for item in getattr(connection, method)(*args, **kwargs):
+                if reserved:
+                    reserved = False
+                    self._replicas.release(replica, time.perf_counter() - started)
+                yield item
+        except Exception as exc:
+            if reserved:
+                reserved = False
+                self._replicas.release(replica, failed=is_connection_error(exc))
+            raise
+        finally:
+            connection.__exit__()
+            if reserved:
+                self._replicas.release(replica, time.perf_counter() - started)
+
+    def statement_cache_info(self) -> typing.Dict[str, typing.Any]:
+        """
+        Size and hit/miss counters of the backend's compiled-statement cache.
+        """
+        return self._backend.statement_cache.stats()
+
+    @property
+    def hooks(self) -> QueryHooks:
+        """
+        Registry of the functions the backend calls around every statement,
+        e.g. `database.hooks.register("after_execute", record_timing)`.
+        """
+        return self._backend.hooks
+
+    def statement_stats(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Calls, latency (total, mean, p50, p99, max), rows, errors and
+        statement cache hits per normalized SQL fingerprint, most total time
+        first. Requires the `statement_stats` option.
+        """
+        if self._statement_stats is None:
+            raise RuntimeError("statement_stats option is not enabled")
+        return self._statement_stats.snapshot()
+
+    def reset_statement_stats(self) -> None:
+        if self._statement_stats is None:
+            raise RuntimeError("statement_stats option is not enabled")
+        self._statement_stats.reset()
+
+    def profile_report(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Wall time per phase (checkout, build_query, compile, execute, fetch,
+        records, json, release) per statement fingerprint; render it with
+        `matdb.profiler.format_report()`. Requires the `profile` option.
+        """
+        if self._backend.profiler is None:
+            raise RuntimeError("profile option is not enabled")
+        return self._backend.profiler.report()
+
+    def reset_profile(self) -> None:
+        if self._backend.profiler is None:
+            raise RuntimeError("profile option is not enabled")
+        self._backend.profiler.reset()
+
+    def pool_stats(self) -> typing.Dict[str, typing.Any]:
+        """
+        Connection pool gauges, counters and checkout wait / hold time
+        histograms; render them with
+        `matdb.backend.pool.metrics.prometheus_text()`.
+        """
+        return self._backend.pool_stats()
+
+    def result_cache_stats(self) -> typing.Dict[str, typing.Any]:
+        """Size, hit / miss, eviction and invalidation counters of the result cache."""
+        if self._result_cache is None:
+            raise RuntimeError("Result cache is not enabled, set result_cache=True")
+        return self._result_cache.stats()
+
+    def invalidate_result_cache(self, *tables: str) -> None:
+        """
+        Drop cached results reading any of `tables` (all results without
+        tables), e.g. after the data changed other than through this Database.
+        """
+        if self._result_cache is None:
+            raise RuntimeError("Result cache is not enabled, set result_cache=True")
+        self._result_cache.invalidate(table.lower() for table in tables)
+
+    def replica_stats(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Per replica: latency EWMA, calls in flight, consecutive failures,
+        whether it is in rotation, and its pool_stats().
+        """
+        assert self._replicas is not None, "Database has no replicas"
+        stats = self._replicas.stats()
+        for entry, replica in zip(stats, self._replicas.replicas):
+            try:
+                entry["pool"] = replica.backend.pool_stats()
+            except NotImplementedError:
+                entry["pool"] = None
+        return stats
 
     def connection(self) -> "Connection":
         if self._global_connection is not None:
@@ -216,13 +858,22 @@ class Connection:
         self._connection_counter = 0
 
         self._transaction_stack = []  # type: typing.List[Transaction]
+        # tables written in the open transaction, invalidated again on commit
+        self._written_tables = []  # type: typing.List[typing.FrozenSet[str]]
 
 
     def __enter__(self) -> "Connection":
         self._connection_counter += 1
         try:
             if self._connection_counter == 1:
-                self._connection.acquire()
+                profiler = self._backend.profiler
+                if profiler is None:
+                    self._connection.acquire()
+                else:
+                    started = time.perf_counter_ns()
+                    self._connection.acquire()
+                    profiler.begin_query()
+                    profiler.add("checkout", time.perf_counter_ns() - started)
         except BaseException as e:
             self._connection_counter -= 1
             raise e
@@ -237,24 +888,59 @@ class Connection:
         assert self._connection is not None
         self._connection_counter -= 1
         if self._connection_counter == 0:
-            self._connection.release()
+            profiler = self._backend.profiler
+            if profiler is None:
+                self._connection.release()
+            else:
+                started = time.perf_counter_ns()
+                self._connection.release()
+                profiler.add("release", time.perf_counter_ns() - started)
+                profiler.flush()
 
     def fetch_all(
         self, query: typing.Union[ClauseElement, str], values: dict = None
     ) -> typing.List[Record]:
-        built_query = self._build_query(query, values)
+        built_query = self._query(query, values)
         return self._connection.fetch_all(built_query)
 
     def fetch_all_as_json_string(
         self, query: typing.Union[ClauseElement, str], values: dict = None
     ) -> typing.AnyStr:
-        built_query = self._build_query(query, values)
+        built_query = self._query(query, values)
         return self._connection.fetch_all_as_json_string(built_query)
 
+    def iterate_json(
+        self,
+        query: typing.Union[ClauseElement, str],
+        values: dict = None,
+        ndjson: bool = False,
+    ) -> typing.Iterator[str]:
+        built_query = self._query(query, values)
+        for chunk in self._connection.iterate_json(built_query, ndjson):
+            yield chunk
+
+    def write_json(
+        self,
+        query: typing.Union[ClauseElement, str],
+        out: typing.Any,
+        values: dict = None,
+        ndjson: bool = False,
+    ) -> int:
+        return write_json(self.iterate_json(query, values, ndjson=ndjson), out)
+
+    def fetch_columns(
+        self,
+        query: typing.Union[ClauseElement, str],
+        values: dict = None,
+        dtypes: typing.Union[typing.Mapping[str, typing.Any], typing.Sequence] = None,
+    ) -> typing.Dict[str, typing.Any]:
+        built_query = self._query(query, values)
+        return self._connection.fetch_columns(built_query, dtypes)
+
     def fetch_one(
         self, query: typing.Union[ClauseElement, str], values: dict = None
     ) -> typing.Optional[Record]:
-        built_query = self._build_query(query, values)
+        built_query = self._query(query, values)
         return self._connection.fetch_one(built_query)
 
     def fetch_val(
@@ -263,25 +949,54 @@ class Connection:
         values: dict = None,
         column: typing.Any = 0,
     ) -> typing.Any:
-        built_query = self._build_query(query, values)
+        built_query = self._query(query, values)
         return self._connection.fetch_val(built_query, column)
 
     def execute(
         self, query: typing.Union[ClauseElement, str], values: dict = None
     ) -> typing.Any:
-        built_query = self._build_query(query, values)
-        return self._connection.execute(built_query)
+        built_query = self._query(query, values)
+        result = self._connection.execute(built_query)
+        if self._backend.result_cache is not None:
+            self._invalidate_results(query)
+        return result
 
     def execute_many(
         self, query: typing.Union[ClauseElement, str], values: list
+    ) -> int:
+        built_query = self._query(query)
+        rowcount = self._connection.execute_many(built_query, values)
+        if self._backend.result_cache is not None:
+            self._invalidate_results(query)
+        return rowcount
+
+    def _invalidate_results(
+        self, query: typing.Union[ClauseElement, str, "BoundStatement"]
     ) -> None:
-        queries = [self._build_query(query, values_set) for values_set in values]
-        self._connection.execute_many(queries)
+        # a statement naming no table we can tell (e.g. CALL) drops everything
+        if isinstance(query, BoundStatement):
+            tables = query.prepared.tables
+        else:
+            tables = query_tables(query)
+        self._backend.result_cache.invalidate(tables)
+        if self._transaction_stack:
+            # until the commit, other connections may still read and cache
+            # the old rows
+            self._written_tables.append(tables)
+
+    def _transaction_ended(self, committed: bool) -> None:
+        written, self._written_tables = self._written_tables, []
+        if committed and written:
+            cache = self._backend.result_cache
+            if not all(written):
+                cache.invalidate()
+            else:
+                cache.invalidate(frozenset().union(*written))
 
     def iterate(
         self, query: typing.Union[ClauseElement, str], values: dict = None
     ) -> typing.AsyncGenerator[typing.Any, None]:
-        built_query = self._build_query(query, values)
+        built_query = self._query(query, values)
         with self.transaction():
             for record in self._connection.iterate(built_query):
                 yield record
@@ -298,12 +1013,25 @@ class Connection:
     def raw_connection(self) -> typing.Any:
         return self._connection.raw_connection
 
+    def _query(
+        self, query: typing.Union[ClauseElement, str], values: dict = None
+    ) -> ClauseElement:
+        """`_build_query`, timed while profiling."""
+        profiler = self._backend.profiler
+        if profiler is None:
+            return self._build_query(query, values)
+        profiler.begin_query()
+        started = time.perf_counter_ns()
+        built_query = self._build_query(query, values)
+        profiler.add("build_query", time.perf_counter_ns() - started)
+        return built_query
+
     @staticmethod
     def _build_query(
         query: typing.Union[ClauseElement, str], values: dict = None
     ) -> ClauseElement:
         if isinstance(query, str):
-            query = text(query)
+            query = _text_template(query)
 
             return query.bindparams(**values) if values is not None else query
         elif values:
@@ -381,15 +1109,111 @@ class Transaction:
         assert self._connection._transaction_stack[-1] is self
         self._connection._transaction_stack.pop()
         self._transaction.commit()
+        if not self._connection._transaction_stack:
+            self._connection._transaction_ended(committed=True)
         self._connection.__exit__()
 
     def rollback(self) -> None:
         assert self._connection._transaction_stack[-1] is self
         self._connection._transaction_stack.pop()
         self._transaction.rollback()
+        if not self._connection._transaction_stack:
+            self._connection._transaction_ended(committed=False)
         self._connection.__exit__()
 
 
+class PreparedStatement:
+    """
+    A statement compiled once, by `Database.prepare()`: calls bind their
+    values to the compiled SQL, skipping `_build_query` and the statement
+    cache. Values are bind parameter values (`:name` in text queries,
+    `bindparam("name")` or column names of INSERT / UPDATE constructs).
+
+    Reads go to the replicas like Database reads, but are never served from
+    or stored in the result cache; writes invalidate it as usual.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        query: typing.Union[ClauseElement, str],
+        server_side: bool = False,
+    ) -> None:
+        if isinstance(query, str):
+            query = _text_template(query)
+        self.query = query
+        self.server_side = server_side
+        self.tables = query_tables(query)
+        self.execution_options = query.get_execution_options()
+        self._database = database
+        self._dialect = database._backend._dialect
+        # INSERT / UPDATE constructs set the columns named by the values, as
+        # with `query.values(**values)`: one statement per set of names
+        self._column_keyed = isinstance(query, ValuesBase)
+        # (column keys, for executemany) -> statement
+        self._statements = {}  # type: typing.Dict[tuple, CompiledStatement]
+        self.statement = self._compile(None, False)
+
+    def _compile(
+        self, column_keys: typing.Optional[typing.Tuple[str, ...]], for_executemany: bool
+    ) -> CompiledStatement:
+        key = (column_keys, for_executemany)
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = self._statements[key] = CompiledStatement(
+                self.query,
+                self._dialect,
+                column_keys=column_keys,
+                for_executemany=for_executemany,
+                prepared=True,
+            )
+        return statement
+
+    def statement_for(self, values: typing.Optional[dict]) -> CompiledStatement:
+        """The statement for one execution with `values`."""
+        if self._column_keyed and values:
+            return self._compile(tuple(values), False)
+        return self.statement
+
+    def many_statement(self, column_keys: typing.Sequence[str]) -> CompiledStatement:
+        """The statement for executemany with parameter sets of `column_keys`."""
+        return self._compile(tuple(column_keys), True)
+
+    def fetch_all(self, values: dict = None) -> typing.List[Record]:
+        return self._database._read("fetch_all", BoundStatement(self, values))
+
+    def fetch_one(self, values: dict = None) -> typing.Optional[Record]:
+        return self._database._read("fetch_one", BoundStatement(self, values))
+
+    def fetch_val(self, values: dict = None, column: typing.Any = 0) -> typing.Any:
+        return self._database._read(
+            "fetch_val", BoundStatement(self, values), column=column
+        )
+
+    def execute(self, values: dict = None) -> typing.Any:
+        return self._database.execute(BoundStatement(self, values))
+
+    def execute_many(self, values: list) -> int:
+        return self._database.execute_many(BoundStatement(self, None), values)
+
+
+class BoundStatement:
+    """
+    A PreparedStatement and the values of one call, passed to the backends
+    in place of a query: they construct its SQL from the compiled statement.
+    """
+
+    __slots__ = ("prepared", "statement", "values")
+
+    def __init__(self, prepared: PreparedStatement, values: typing.Optional[dict]) -> None:
+        self.prepared = prepared
+        self.statement = prepared.statement_for(values)
+        self.values = values
+
+    def get_execution_options(self) -> typing.Mapping[str, typing.Any]:
+        return self.prepared.execution_options
+
+
 class _EmptyNetloc(str):
     def __bool__(self) -> bool:
         return True
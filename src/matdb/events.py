@@ -0,0 +1,121 @@
+import logging
+import threading
+import typing
+
+__all__ = ["HOOK_NAMES", "QueryEvent", "QueryHooks"]
+
+logger = logging.getLogger("databases")
+
+HOOK_NAMES = ("before_execute", "after_execute")
+
+
+class QueryEvent:
+    """
+    One statement run by a backend connection, passed to every hook.
+
+    Times are in seconds. `execute_time` covers `cursor.execute` (the server
+    round trip up to the first result packet), `fetch_time` the reading of
+    rows. `rows` counts the rows returned, or the rows affected when the
+    statement returns no result set. `bytes` is an estimate of the result
+    size: the length of str/bytes values plus 8 bytes per other value.
+    """
+
+    __slots__ = (
+        "sql",
+        "args",
+        "param_count",
+        "cache_hit",
+        "compile_time",
+        "execute_time",
+        "fetch_time",
+        "rows",
+        "bytes",
+        "error",
+    )
+
+    def __init__(
+        self,
+        sql: str,
+        args: typing.Any,
+        param_count: int,
+        cache_hit: bool = False,
+        compile_time: float = 0.0,
+    ) -> None:
+        self.sql = sql
+        self.args = args
+        self.param_count = param_count
+        self.cache_hit = cache_hit
+        self.compile_time = compile_time
+        self.execute_time = 0.0
+        self.fetch_time = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.error = None  # type: typing.Optional[BaseException]
+
+    @property
+    def duration(self) -> float:
+        return self.compile_time + self.execute_time + self.fetch_time
+
+    def __repr__(self) -> str:
+        return (
+            f"<QueryEvent {self.sql[:60]!r} duration={self.duration:.6f} "
+            f"rows={self.rows} error={self.error!r}>"
+        )
+
+
+Hook = typing.Callable[[QueryEvent], typing.Any]
+
+
+class QueryHooks:
+    """
+    Registry of the functions called around every statement a backend runs.
+
+    Backends only build QueryEvents while `active` is true, i.e. while at
+    least one hook is registered, so an empty registry costs one attribute
+    check per query. Hook lists are replaced rather than mutated, so hooks
+    can be registered while other threads are running queries.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hooks = {
+            name: () for name in HOOK_NAMES
+        }  # type: typing.Dict[str, typing.Tuple[Hook, ...]]
+        self.active = False
+
+    def register(self, name: str, hook: Hook = None) -> typing.Any:
+        """
+        Register `hook` for `name` ("before_execute" or "after_execute").
+        Without `hook`, return a decorator registering the decorated function.
+        """
+        if name not in self._hooks:
+            raise ValueError(f"Invalid hook {name!r}, expected one of {HOOK_NAMES}")
+        if hook is None:
+            return lambda hook: self.register(name, hook)
+        with self._lock:
+            self._hooks[name] = self._hooks[name] + (hook,)
+            self.active = True
+        return hook
+
+    def unregister(self, name: str, hook: Hook) -> None:
+        with self._lock:
+            hooks = list(self._hooks[name])
+            hooks.remove(hook)
+            self._hooks[name] = tuple(hooks)
+            self.active = any(self._hooks.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._hooks = {name: () for name in HOOK_NAMES}
+            self.active = False
+
+    def fire(self, name: str, event: QueryEvent) -> None:
+        """
+        Call the hooks registered for `name`. A failing hook is logged and
+        does not fail the query.
+        """
+        for hook in self._hooks[name]:
+            try:
+                hook(event)
+            except Exception:
+                logger.exception("Query hook %r failed", hook)
@@ -14,6 +14,9 @@ class DatabaseBackend:
     def connection(self) -> "ConnectionBackend":
         raise NotImplementedError()  # pragma: no cover
 
+    def pool_stats(self) -> typing.Dict[str, typing.Any]:
+        raise NotImplementedError()  # pragma: no cover
+
 
 class ConnectionBackend:
     def acquire(self) -> None:
@@ -26,6 +29,18 @@ class ConnectionBackend:
         raise NotImplementedError()  # pragma: no cover
 
     def fetch_all_as_json_string(self, query: ClauseElement) -> typing.AnyStr:
+        return "".join(self.iterate_json(query))
+
+    def iterate_json(
+        self, query: ClauseElement, ndjson: bool = False
+    ) -> typing.Iterator[str]:
+        raise NotImplementedError()  # pragma: no cover
+
+    def fetch_columns(
+        self,
+        query: ClauseElement,
+        dtypes: typing.Union[typing.Mapping[str, typing.Any], typing.Sequence] = None,
+    ) -> typing.Dict[str, typing.Any]:
         raise NotImplementedError()  # pragma: no cover
 
     def fetch_one(self, query: ClauseElement) -> typing.Optional["Record"]:
@@ -40,7 +55,9 @@ class ConnectionBackend:
     def execute(self, query: ClauseElement) -> typing.Any:
         raise NotImplementedError()  # pragma: no cover
 
-    def execute_many(self, queries: typing.List[ClauseElement]) -> None:
+    def execute_many(
+        self, query: ClauseElement, values: typing.List[dict]
+    ) -> int:
         raise NotImplementedError()  # pragma: no cover
 
     def iterate(
@@ -49,6 +66,23 @@ class ConnectionBackend:
         raise NotImplementedError()  # pragma: no cover
         yield True  # pragma: no cover
 
+    def explain(self, query: str, args: typing.Any) -> str:
+        """
+        Return the server's plan for a compiled statement, without running it.
+        """
+        raise NotImplementedError()  # pragma: no cover
+
+    def session_id(self) -> typing.Any:
+        """
+        Server-side id of the acquired connection, for `kill()` from another
+        connection.
+        """
+        raise NotImplementedError()  # pragma: no cover
+
+    def kill(self, session_id: typing.Any) -> None:
+        """Cancel the statement running on another connection's session."""
+        raise NotImplementedError()  # pragma: no cover
+
     def transaction(self) -> "TransactionBackend":
         raise NotImplementedError()  # pragma: no cover
 
@@ -71,6 +105,8 @@ class TransactionBackend:
 
 
 class Record(Sequence):
+    __slots__ = ()
+
     @property
     def _mapping(self) -> typing.Mapping:
         raise NotImplementedError()  # pragma: no cover
@@ -0,0 +1,148 @@
+import threading
+import typing
+from time import perf_counter_ns
+
+from matdb.statement_stats import fingerprint
+
+__all__ = ["PHASES", "Profiler", "format_report"]
+
+PHASES = (
+    "checkout",
+    "build_query",
+    "compile",
+    "execute",
+    "fetch",
+    "records",
+    "json",
+    "release",
+)
+
+
+class Profiler:
+    """
+    Wall time per call phase, aggregated per statement fingerprint.
+
+    Phases are added to a per-thread sample as the call runs; `compile`
+    names the statement, and the sample is folded into the totals when the
+    connection is released or the next query is built on it. Pool checkout
+    and release therefore count towards the first and last statement run
+    on a checked out connection.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # fingerprint -> [calls, total ns per phase, max ns per phase]
+        self._stats = {}  # type: typing.Dict[str, typing.List[typing.Any]]
+
+    def _sample(self) -> typing.Dict[str, int]:
+        try:
+            return self._local.phases
+        except AttributeError:
+            self._local.phases = {}
+            self._local.statement = None
+            return self._local.phases
+
+    def add(self, phase: str, elapsed_ns: int) -> None:
+        phases = self._sample()
+        phases[phase] = phases.get(phase, 0) + elapsed_ns
+
+    def begin_query(self) -> None:
+        """Start a new sample if the current one already ran a statement."""
+        self._sample()
+        if self._local.statement is not None:
+            self.flush()
+
+    def set_statement(self, sql: str) -> None:
+        self._sample()
+        self._local.statement = fingerprint(sql)
+
+    def flush(self) -> None:
+        phases = self._sample()
+        statement = self._local.statement
+        self._local.phases = {}
+        self._local.statement = None
+        if statement is None:
+            # e.g. a checkout without any statement
+            return
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                stats = self._stats[statement] = [0, [0] * len(PHASES), [0] * len(PHASES)]
+            stats[0] += 1
+            totals, maxima = stats[1], stats[2]
+            for index, phase in enumerate(PHASES):
+                elapsed = phases.get(phase, 0)
+                totals[index] += elapsed
+                if elapsed > maxima[index]:
+                    maxima[index] = elapsed
+
+    def timed(
+        self, iterator: typing.Iterator[typing.Any], phase: str, exclude: str
+    ) -> typing.Iterator[typing.Any]:
+        """
+        Yield from `iterator`, adding the time spent in it to `phase`, less
+        the time it added to the `exclude` phase itself (e.g. JSON encoding
+        without the fetches it makes).
+        """
+        while True:
+            excluded = self._sample().get(exclude, 0)
+            started = perf_counter_ns()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                item = StopIteration
+            elapsed = perf_counter_ns() - started
+            self.add(phase, elapsed - (self._sample().get(exclude, 0) - excluded))
+            if item is StopIteration:
+                return
+            yield item
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+
+    def report(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        One dict per statement fingerprint, most total time first, with the
+        call count and per phase the total, mean and max time in
+        nanoseconds.
+        """
+        with self._lock:
+            stats = [
+                (statement, calls, list(totals), list(maxima))
+                for statement, (calls, totals, maxima) in self._stats.items()
+            ]
+        report = []
+        for statement, calls, totals, maxima in stats:
+            report.append(
+                {
+                    "statement": statement,
+                    "calls": calls,
+                    "total_ns": sum(totals),
+                    "phases": {
+                        phase: {
+                            "total_ns": totals[index],
+                            "mean_ns": totals[index] // calls,
+                            "max_ns": maxima[index],
+                        }
+                        for index, phase in enumerate(PHASES)
+                    },
+                }
+            )
+        report.sort(key=lambda entry: entry["total_ns"], reverse=True)
+        return report
+
+
+def format_report(report: typing.List[typing.Dict[str, typing.Any]]) -> str:
+    """
+    Render `Profiler.report()` as a text table of mean microseconds per
+    phase, one row per statement.
+    """
+    lines = ["  ".join(f"{name:>11}" for name in ("calls",) + PHASES) + "  statement"]
+    for entry in report:
+        cells = [f"{entry['calls']:>11}"] + [
+            f"{entry['phases'][phase]['mean_ns'] / 1000:>11.1f}" for phase in PHASES
+        ]
+        lines.append("  ".join(cells) + "  " + entry["statement"])
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+import collections
+import logging
+import random
+import threading
+import time
+import typing
+
+from matdb.backend.pool.base import GetConnectionFromPoolError
+from matdb.interfaces import DatabaseBackend
+
+__all__ = ["HedgedAttempt", "Replica", "ReplicaSet"]
+
+logger = logging.getLogger("databases")
+
+# Read latencies kept for latency_percentile(), and the fewest it answers on.
+LATENCY_WINDOW = 512
+MIN_LATENCY_SAMPLES = 20
+# Observations between two recomputations of a percentile.
+PERCENTILE_REFRESH = 32
+
+# DB-API errors meaning the server or the link failed, not the statement.
+CONNECTION_ERROR_NAMES = ("OperationalError", "InterfaceError")
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    return isinstance(exc, (OSError, GetConnectionFromPoolError)) or any(
+        cls.__name__ in CONNECTION_ERROR_NAMES for cls in type(exc).__mro__
+    )
+
+
+class Replica:
+    __slots__ = ("name", "backend", "latency", "in_flight", "failures", "retry_at")
+
+    def __init__(self, name: str, backend: DatabaseBackend) -> None:
+        self.name = name
+        self.backend = backend
+        # EWMA of the call latency in seconds, 0 until the first call
+        self.latency = 0.0
+        self.in_flight = 0
+        self.failures = 0
+        self.retry_at = 0.0
+
+
+class HedgedAttempt:
+    """
+    One copy of a hedged read: its replica, and the server session running
+    it once checked out, so that the losing copy can be killed. `lock`
+    keeps the connection checked out while a kill is being sent.
+    """
+
+    __slots__ = ("replica", "lock", "session_id", "finished", "cancelled")
+
+    def __init__(self, replica: Replica) -> None:
+        self.replica = replica
+        self.lock = threading.Lock()
+        self.session_id = None  # type: typing.Any
+        self.finished = False
+        self.cancelled = False
+
+
+class ReplicaSet:
+    """
+    Picks the replica for a read: of two random replicas in rotation, the
+    one with the lower latency EWMA weighted by its calls in flight.
+
+    A replica failing `max_failures` times in a row (checkout or connection
+    errors) is taken out of rotation; after `retry_interval` seconds a
+    single read probes it, and a success puts it back.
+    """
+
+    def __init__(
+        self,
+        replicas: typing.Sequence[Replica],
+        alpha: float = 0.2,
+        max_failures: int = 3,
+        retry_interval: float = 30.0,
+    ) -> None:
+        assert replicas, "ReplicaSet needs at least one replica"
+        self.replicas = list(replicas)
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)  # type: typing.Deque[float]
+        self._observed = 0
+        # q -> (observation count when computed, value)
+        self._percentiles = {}  # type: typing.Dict[float, typing.Tuple[int, float]]
+
+    def choose(self, exclude: typing.Container[Replica] = ()) -> typing.Optional[Replica]:
+        """Reserve a replica for a call, or None if none is in rotation."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                replica
+                for replica in self.replicas
+                if replica not in exclude
+                and (replica.failures < self.max_failures or now >= replica.retry_at)
+            ]
+            if not candidates:
+                return None
+            if len(candidates) > 2:
+                candidates = random.sample(candidates, 2)
+            replica = min(candidates, key=self._score)
+            if replica.failures >= self.max_failures:
+                # probe: no other read until this one has settled it
+                replica.retry_at = now + self.retry_interval
+            replica.in_flight += 1
+            return replica
+
+    @staticmethod
+    def _score(replica: Replica) -> float:
+        return replica.latency * (replica.in_flight + 1)
+
+    def release(self, replica: Replica, elapsed: float = None, failed: bool = False) -> None:
+        """
+        End a call reserved by choose(): `elapsed` seconds if it got an
+        answer from the server, `failed` if the replica or link failed.
+        """
+        with self._lock:
+            replica.in_flight -= 1
+            if failed:
+                replica.failures += 1
+                if replica.failures == self.max_failures:
+                    replica.retry_at = time.monotonic() + self.retry_interval
+                    logger.warning("Replica %s taken out of rotation", replica.name)
+                return
+            if elapsed is not None:
+                self._latencies.append(elapsed)
+                self._observed += 1
+                if replica.latency:
+                    replica.latency += self.alpha * (elapsed - replica.latency)
+                else:
+                    replica.latency = elapsed
+            if replica.failures >= self.max_failures:
+                logger.info("Replica %s back in rotation", replica.name)
+            replica.failures = 0
+
+    def latency_percentile(self, q: float) -> typing.Optional[float]:
+        """
+        The `q` quantile (0-1) of recent read latencies over all replicas,
+        or None until enough reads were timed.
+        """
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            cached = self._percentiles.get(q)
+            if cached is None or self._observed - cached[0] >= PERCENTILE_REFRESH:
+                ordered = sorted(self._latencies)
+                value = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+                cached = self._percentiles[q] = (self._observed, value)
+            return cached[1]
+
+    def stats(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        with self._lock:
+            return [
+                {
+                    "name": replica.name,
+                    "latency": replica.latency,
+                    "in_flight": replica.in_flight,
+                    "failures": replica.failures,
+                    "in_rotation": replica.failures < self.max_failures,
+                }
+                for replica in self.replicas
+            ]
@@ -0,0 +1,200 @@
+import functools
+import re
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+import sqlalchemy
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.sql.util import find_tables
+
+from matdb.backend.instrument import estimate_bytes
+
+__all__ = ["ResultCache", "query_tables"]
+
+# Bytes charged per entry and per row on top of the column values.
+ENTRY_OVERHEAD = 200
+ROW_OVERHEAD = 64
+
+_NAME = r'[`"\[]?[\w$]+[`"\]]?(?:\s*\.\s*[`"\[]?[\w$]+[`"\]]?)*'
+_ALIAS = (
+    r"(?:\s+(?:AS\s+)?(?!(?:JOIN|INNER|LEFT|RIGHT|FULL|CROSS|OUTER|NATURAL|STRAIGHT_JOIN"
+    r"|WHERE|ON|USING|SET|GROUP|ORDER|LIMIT|UNION|VALUES|SELECT|HAVING|WITH|FOR)\b)\w+)?"
+)
+_TABLES_RE = re.compile(
+    rf"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+({_NAME}{_ALIAS}(?:\s*,\s*{_NAME}{_ALIAS})*)",
+    re.IGNORECASE,
+)
+_QUOTES = '`"[]'
+
+
+def _table_name(name: str) -> str:
+    # schema / database qualifiers are dropped: "db.t" and "t" collide,
+    # which only ever invalidates too much
+    return name.split(".")[-1].strip().strip(_QUOTES).lower()
+
+
+@functools.lru_cache(maxsize=1024)
+def _sql_tables(sql: str) -> typing.FrozenSet[str]:
+    tables = set()
+    for match in _TABLES_RE.finditer(sql):
+        for item in match.group(1).split(","):
+            tables.add(_table_name(item.split()[0]))
+    return frozenset(tables)
+
+
+def query_tables(query: typing.Union[ClauseElement, str]) -> typing.FrozenSet[str]:
+    """
+    Lower-case names of the tables a statement reads or writes: from the
+    construct for SQLAlchemy statements, from a lightweight parse of the
+    FROM / JOIN / INTO / UPDATE / TABLE clauses for text.
+    """
+    if isinstance(query, str):
+        return _sql_tables(query)
+    if isinstance(query, TextClause):
+        return _sql_tables(query.text)
+    return frozenset(
+        table.name.lower()
+        for table in find_tables(query, include_crud=True)
+        if isinstance(table, sqlalchemy.Table)
+    )
+
+
+def _freeze(value: typing.Any) -> typing.Hashable:
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ResultCache:
+    """
+    In-process cache of read results, bounded by entry count and estimated
+    bytes with LRU eviction, entries expiring after their TTL.
+
+    Writes invalidate by table name. Every table has a generation number,
+    bumped by each invalidation: a read notes the generations of its tables
+    before running (`begin()`), and its result is not stored if one changed
+    meanwhile, so a read racing a write cannot cache the pre-write rows.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: float = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size, tables)
+        self._entries = OrderedDict()  # type: OrderedDict
+        self._bytes = 0
+        self._by_table = {}  # type: typing.Dict[str, typing.Set[typing.Hashable]]
+        self._generations = {}  # type: typing.Dict[str, int]
+        # bumped by an invalidation of every table
+        self._epoch = 0
+
+    @staticmethod
+    def make_key(method: str, sql: str, args: typing.Any) -> typing.Optional[typing.Hashable]:
+        """The key of a read, or None if its arguments are not hashable."""
+        key = (method, sql, _freeze(args))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key: typing.Hashable) -> typing.Tuple[bool, typing.Any]:
+        """(True, value) on a hit, (False, None) on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[0]
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def begin(self, tables: typing.Iterable[str]) -> typing.Tuple[int, ...]:
+        with self._lock:
+            return self._token(tables)
+
+    def _token(self, tables: typing.Iterable[str]) -> typing.Tuple[int, ...]:
+        return (self._epoch,) + tuple(self._generations.get(table, 0) for table in tables)
+
+    def put(
+        self,
+        key: typing.Hashable,
+        value: typing.Any,
+        tables: typing.Sequence[str],
+        ttl: float,
+        token: typing.Tuple[int, ...],
+    ) -> None:
+        """Store a read result, unless its tables changed since `begin()`."""
+        rows = value if isinstance(value, list) else [] if value is None else [value]
+        size = ENTRY_OVERHEAD + ROW_OVERHEAD * len(rows) + estimate_bytes(rows)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            if token != self._token(tables):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size, tables)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: typing.Hashable) -> None:
+        _, _, size, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def invalidate(self, tables: typing.Iterable[str] = ()) -> None:
+        """Drop the results reading any of `tables`; no tables: all results."""
+        tables = list(tables)
+        with self._lock:
+            self.invalidations += 1
+            if not tables:
+                self._epoch += 1
+                self._entries.clear()
+                self._by_table.clear()
+                self._bytes = 0
+                return
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._remove(key)
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,332 @@
+import bisect
+import concurrent.futures
+import functools
+import hashlib
+import heapq
+import itertools
+import operator
+import queue
+import threading
+import typing
+from types import TracebackType
+
+from sqlalchemy.sql import ClauseElement
+
+from matdb.core import Connection, Database, DatabaseURL, Transaction
+from matdb.interfaces import Record
+
+__all__ = ["HashRing", "ShardedDatabase"]
+
+# Points each shard gets on the ring; more points, more even key spread.
+VIRTUAL_NODES = 160
+
+# Records buffered per shard ahead of the merge by ShardedDatabase.iterate.
+MERGE_BUFFER_SIZE = 1000
+
+_QueryType = typing.Union[ClauseElement, str]
+_OrderBy = typing.Union[str, typing.Sequence[str], typing.Callable[[Record], typing.Any]]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing with virtual nodes: adding or removing a node only
+    moves the keys of the ring arcs it gains or loses. Hashes are stable
+    across processes, so every service routes a key to the same node.
+    """
+
+    def __init__(self, nodes: typing.Iterable[str] = (), vnodes: int = VIRTUAL_NODES) -> None:
+        self.vnodes = vnodes
+        self._points = []  # type: typing.List[int]
+        self._nodes = []  # type: typing.List[str]
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node: str) -> None:
+        assert node not in self._nodes, f"Node {node} is already on the ring"
+        for index in range(self.vnodes):
+            point = _hash(f"{node}#{index}")
+            position = bisect.bisect(self._points, point)
+            self._points.insert(position, point)
+            self._nodes.insert(position, node)
+
+    def remove_node(self, node: str) -> None:
+        kept = [(point, owner) for point, owner in zip(self._points, self._nodes) if owner != node]
+        assert len(kept) < len(self._points), f"Node {node} is not on the ring"
+        self._points = [point for point, _ in kept]
+        self._nodes = [owner for _, owner in kept]
+
+    def get_node(self, key: typing.Any) -> str:
+        assert self._points, "HashRing has no nodes"
+        position = bisect.bisect(self._points, _hash(str(key)))
+        return self._nodes[position % len(self._points)]
+
+
+class ShardedDatabase:
+    """
+    One Database per shard, with calls routed by `shard_key` on a HashRing
+    of the shard names. `urls` is a list (shards named "shard0", "shard1",
+    ... in order, so keep the order stable) or a mapping of name to URL.
+
+    A call without a shard key scatters to every shard in parallel and
+    gathers the results: fetch_all concatenates them in shard order or,
+    given `order_by`, merges the per-shard results (each already sorted
+    the same way by the query) and applies `limit`. Transactions and
+    connection blocks are on the one shard of their key; scattered calls
+    run outside them.
+    """
+
+    def __init__(
+        self,
+        urls: typing.Union[
+            typing.Sequence[typing.Union[str, DatabaseURL]],
+            typing.Mapping[str, typing.Union[str, DatabaseURL]],
+        ],
+        *,
+        vnodes: int = VIRTUAL_NODES,
+        scatter_workers: int = None,
+        **options: typing.Any,
+    ) -> None:
+        if not isinstance(urls, typing.Mapping):
+            urls = {f"shard{index}": url for index, url in enumerate(urls)}
+        assert urls, "ShardedDatabase needs at least one shard"
+        self.shards = {
+            name: Database(url, **options) for name, url in urls.items()
+        }  # type: typing.Dict[str, Database]
+        self.ring = HashRing(self.shards, vnodes=vnodes)
+        self._scatter_workers = scatter_workers or 4 * len(self.shards)
+        self._executor = None  # type: typing.Optional[concurrent.futures.ThreadPoolExecutor]
+
+    def connect(self) -> None:
+        for database in self.shards.values():
+            database.connect()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._scatter_workers, thread_name_prefix="matdb-shard"
+        )
+
+    def disconnect(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for database in self.shards.values():
+            database.disconnect()
+
+    def __enter__(self) -> "ShardedDatabase":
+        self.connect()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: typing.Type[BaseException] = None,
+        exc_value: BaseException = None,
+        traceback: TracebackType = None,
+    ) -> None:
+        self.disconnect()
+
+    def shard_for(self, shard_key: typing.Any) -> Database:
+        return self.shards[self.ring.get_node(shard_key)]
+
+    def _scatter(
+        self, method: str, *args: typing.Any, **kwargs: typing.Any
+    ) -> typing.List[typing.Any]:
+        """Run a Database method on every shard at once; results in shard order."""
+        assert self._executor is not None, "ShardedDatabase is not connected"
+        futures = [
+            self._executor.submit(getattr(database, method), *args, **kwargs)
+            for database in self.shards.values()
+        ]
+        concurrent.futures.wait(futures)
+        return [future.result() for future in futures]
+
+    def fetch_all(
+        self,
+        query: _QueryType,
+        values: dict = None,
+        *,
+        shard_key: typing.Any = None,
+        order_by: _OrderBy = None,
+        descending: bool = False,
+        limit: int = None,
+    ) -> typing.List[Record]:
+        if shard_key is not None:
+            # one shard's result is already in the query's order
+            records = self.shard_for(shard_key).fetch_all(query, values)
+            return records if limit is None else records[:limit]
+        results = self._scatter("fetch_all", query, values)
+        if order_by is None:
+            records = itertools.chain.from_iterable(results)  # type: typing.Iterable[Record]
+        else:
+            records = heapq.merge(*results, key=_sort_key(order_by), reverse=descending)
+        return list(itertools.islice(records, limit))
+
+    def fetch_one(
+        self, query: _QueryType, values: dict = None, *, shard_key: typing.Any = None
+    ) -> typing.Optional[Record]:
+        """Without a shard key: the record of the first shard having one."""
+        if shard_key is not None:
+            return self.shard_for(shard_key).fetch_one(query, values)
+        for record in self._scatter("fetch_one", query, values):
+            if record is not None:
+                return record
+        return None
+
+    def fetch_val(
+        self,
+        query: _QueryType,
+        values: dict = None,
+        column: typing.Any = 0,
+        *,
+        shard_key: typing.Any = None,
+    ) -> typing.Any:
+        if shard_key is not None:
+            return self.shard_for(shard_key).fetch_val(query, values, column=column)
+        record = self.fetch_one(query, values)
+        return None if record is None else record[column]
+
+    def execute(
+        self, query: _QueryType, values: dict = None, *, shard_key: typing.Any = None
+    ) -> typing.Any:
+        """Without a shard key the statement runs on every shard, returning a list."""
+        if shard_key is not None:
+            return self.shard_for(shard_key).execute(query, values)
+        return self._scatter("execute", query, values)
+
+    def execute_many(
+        self,
+        query: _QueryType,
+        values: list,
+        *,
+        shard_key: typing.Union[str, typing.Callable[[dict], typing.Any]],
+    ) -> int:
+        """
+        `shard_key` names the key of each values dict holding its shard key
+        (or computes it); the rows are grouped per shard, and the groups
+        run in parallel.
+        """
+        get_key = shard_key if callable(shard_key) else operator.itemgetter(shard_key)
+        groups = {}  # type: typing.Dict[str, typing.List[dict]]
+        for row in values:
+            groups.setdefault(self.ring.get_node(get_key(row)), []).append(row)
+        assert self._executor is not None, "ShardedDatabase is not connected"
+        futures = [
+            self._executor.submit(self.shards[name].execute_many, query, rows)
+            for name, rows in groups.items()
+        ]
+        concurrent.futures.wait(futures)
+        return sum(future.result() for future in futures)
+
+    def iterate(
+        self,
+        query: _QueryType,
+        values: dict = None,
+        *,
+        shard_key: typing.Any = None,
+        order_by: _OrderBy = None,
+        descending: bool = False,
+        limit: int = None,
+    ) -> typing.Iterator[Record]:
+        """
+        Without a shard key, every shard streams its result from its own
+        thread; the streams are concatenated in shard order or merged by
+        `order_by`, and stopped after `limit` records.
+        """
+        if shard_key is not None:
+            yield from itertools.islice(
+                self.shard_for(shard_key).iterate(query, values), limit
+            )
+            return
+        streams = [
+            _ShardStream(functools.partial(database.iterate, query, values))
+            for database in self.shards.values()
+        ]
+        try:
+            if order_by is None:
+                records = itertools.chain.from_iterable(streams)  # type: typing.Iterable[Record]
+            else:
+                records = heapq.merge(*streams, key=_sort_key(order_by), reverse=descending)
+            yield from itertools.islice(records, limit)
+        finally:
+            for stream in streams:
+                stream.close()
+
+    def connection(self, shard_key: typing.Any) -> Connection:
+        return self.shard_for(shard_key).connection()
+
+    def transaction(
+        self, shard_key: typing.Any, *, force_rollback: bool = False, **kwargs: typing.Any
+    ) -> Transaction:
+        return self.shard_for(shard_key).transaction(force_rollback=force_rollback, **kwargs)
+
+
+def _sort_key(order_by: _OrderBy) -> typing.Callable[[Record], typing.Any]:
+    if callable(order_by):
+        return order_by
+    if isinstance(order_by, str):
+        return operator.itemgetter(order_by)
+    columns = tuple(order_by)
+    return lambda record: tuple(record[column] for column in columns)
+
+
+class _StreamEnd:
+    __slots__ = ("error",)
+
+    def __init__(self, error: typing.Optional[BaseException]) -> None:
+        self.error = error
+
+
+class _ShardStream:
+    """
+    Records of one shard's iterate(), read ahead by a thread of its own into
+    a bounded buffer. The iteration, and so its connection, stays on that
+    thread from start to close.
+    """
+
+    def __init__(self, start: typing.Callable[[], typing.Iterator[Record]]) -> None:
+        self._buffer = queue.Queue(MERGE_BUFFER_SIZE)  # type: queue.Queue
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._produce, args=(start,), name="matdb-shard-stream", daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, item: typing.Any) -> bool:
+        while not self._closed.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, start: typing.Callable[[], typing.Iterator[Record]]) -> None:
+        try:
+            iterator = start()
+            try:
+                for record in iterator:
+                    if not self._put(record):
+                        return
+            finally:
+                iterator.close()  # type: ignore[attr-defined]
+        except BaseException as exc:
+            self._put(_StreamEnd(exc))
+        else:
+            self._put(_StreamEnd(None))
+
+    def __iter__(self) -> "_ShardStream":
+        return self
+
+    def __next__(self) -> Record:
+        item = self._buffer.get()
+        if isinstance(item, _StreamEnd):
+            self._closed.set()
+            if item.error is not None:
+                raise item.error
+            raise StopIteration
+        return item
+
+    def close(self) -> None:
+        self._closed.set()
+        self._thread.join()
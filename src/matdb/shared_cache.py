@@ -0,0 +1,297 @@
+import functools
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import typing
+from multiprocessing import resource_tracker, shared_memory
+
+try:  # pragma: no cover
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+from matdb.result_cache import ResultCache
+
+__all__ = ["SharedResultCache"]
+
+MAGIC = b"matdbrc1"
+
+# Table names are hashed onto this many generation counters; two tables
+# sharing a counter only invalidate each other's results too often.
+TABLE_BUCKETS = 4096
+# Slots a key may live in; the stalest of them is replaced on a store.
+WAYS = 4
+# Tables a cached result may read; results reading more are not cached.
+MAX_TABLES = 8
+
+# magic, version, slot count, slot size, epoch
+HEADER = struct.Struct("<8sIIIxxxxQ")
+EPOCH_OFFSET = 24
+GENERATIONS_OFFSET = 64
+SLOTS_OFFSET = GENERATIONS_OFFSET + 8 * TABLE_BUCKETS
+
+# sequence, key digest, expiry (epoch seconds), cache epoch, payload length,
+# table count, table buckets, table generations
+SLOT_HEADER = struct.Struct(f"<Q16sdQII{MAX_TABLES}I{MAX_TABLES}Q")
+_U64 = struct.Struct("<Q")
+_EMPTY_DIGEST = bytes(16)
+
+# fcntl locks only exclude other processes: the threads of this one take
+# the lock of the segment name as well.
+_thread_locks = {}  # type: typing.Dict[str, threading.Lock]
+
+
+def _digest(key: typing.Hashable) -> bytes:
+    return hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).digest()
+
+
+@functools.lru_cache(maxsize=4096)
+def _table_bucket(table: str) -> int:
+    digest = hashlib.blake2b(table.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "little") % TABLE_BUCKETS
+
+
+def _open_segment(name: str, size: int, create: bool) -> shared_memory.SharedMemory:
+    try:
+        # the segment outlives the process, to survive worker restarts
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False)
+    except TypeError:  # Python < 3.13: no `track`
+        segment = shared_memory.SharedMemory(name, create=create, size=size)
+        resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore[attr-defined]
+        return segment
+
+
+class SharedResultCache:
+    """
+    Result cache shared by every process on the host through a named
+    shared memory segment of fixed size, split into fixed-size slots. A
+    drop-in alternative to ResultCache (`result_cache="shared"`).
+
+    Results are pickled into the slots of their key's set (WAYS slots).
+    Reads take no lock: each slot is a seqlock, odd while being written,
+    and a read is kept only if the sequence was even and unchanged across
+    the copy. Stores and invalidations, the rare operations, take an
+    fcntl byte-range lock on a lock file next to the segment.
+
+    Invalidation bumps per-table generation counters in the segment (or the
+    epoch, for all tables); a slot records the generations its read saw
+    before running and is stale as soon as one differs. The segment stays
+    until `unlink()`, so restarted workers find the cache warm.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        slot_size: int = 64 * 1024,
+        default_ttl: float = None,
+    ) -> None:
+        assert fcntl is not None, "SharedResultCache needs fcntl (POSIX)"
+        assert slot_size > SLOT_HEADER.size, "slot_size is too small"
+        self.name = name
+        self.default_ttl = default_ttl
+        self.slot_size = slot_size
+        slot_count = max(WAYS, (max_bytes - SLOTS_OFFSET) // slot_size // WAYS * WAYS)
+        size = SLOTS_OFFSET + slot_count * slot_size
+        self._lock_fd = os.open(
+            os.path.join(tempfile.gettempdir(), f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600
+        )
+        self._thread_lock = _thread_locks.setdefault(name, threading.Lock())
+        with self._locked(0):
+            try:
+                self._segment = _open_segment(name, size, create=True)
+                self._buf = self._segment.buf
+                HEADER.pack_into(self._buf, 0, MAGIC, 1, slot_count, slot_size, 0)
+            except FileExistsError:
+                self._segment = _open_segment(name, 0, create=False)
+                self._buf = self._segment.buf
+        magic, _, self.slot_count, existing_slot_size, _ = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or existing_slot_size != slot_size:
+            raise ValueError(
+                f"Shared memory segment {name} holds a different cache layout, "
+                "unlink() it or use another name"
+            )
+        self._payload_size = slot_size - SLOT_HEADER.size
+        self._sets = self.slot_count // WAYS
+        # per-process counters
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    make_key = staticmethod(ResultCache.make_key)
+
+    def _locked(self, byte: int) -> typing.ContextManager[None]:
+        return _RangeLock(self._lock_fd, byte, self._thread_lock)
+
+    def _slots(self, digest: bytes) -> typing.Tuple[int, range]:
+        cache_set = int.from_bytes(digest[:8], "little") % self._sets
+        return cache_set, range(cache_set * WAYS, (cache_set + 1) * WAYS)
+
+    def _slot_offset(self, index: int) -> int:
+        return SLOTS_OFFSET + index * self.slot_size
+
+    def _generation(self, bucket: int) -> int:
+        return _U64.unpack_from(self._buf, GENERATIONS_OFFSET + 8 * bucket)[0]
+
+    def get(self, key: typing.Hashable) -> typing.Tuple[bool, typing.Any]:
+        digest = _digest(key)
+        buf = self._buf
+        for index in self._slots(digest)[1]:
+            offset = self._slot_offset(index)
+            header = SLOT_HEADER.unpack_from(buf, offset)
+            sequence = header[0]
+            if sequence & 1 or header[1] != digest:
+                continue
+            start = offset + SLOT_HEADER.size
+            data = bytes(buf[start:start + header[4]])
+            if _U64.unpack_from(buf, offset)[0] != sequence:
+                # overwritten while being copied
+                continue
+            if (
+                header[2] <= time.time()
+                or header[3] != _U64.unpack_from(buf, EPOCH_OFFSET)[0]
+                or any(
+                    self._generation(header[6 + position]) != header[6 + MAX_TABLES + position]
+                    for position in range(header[5])
+                )
+            ):
+                break
+            self.hits += 1
+            return True, pickle.loads(data)
+        self.misses += 1
+        return False, None
+
+    def begin(self, tables: typing.Sequence[str]) -> typing.Tuple[int, ...]:
+        return (_U64.unpack_from(self._buf, EPOCH_OFFSET)[0],) + tuple(
+            self._generation(_table_bucket(table)) for table in tables
+        )
+
+    def put(
+        self,
+        key: typing.Hashable,
+        value: typing.Any,
+        tables: typing.Sequence[str],
+        ttl: float,
+        token: typing.Tuple[int, ...],
+    ) -> None:
+        """Store a read result, unless its tables changed since `begin()`."""
+        if len(tables) > MAX_TABLES:
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self._payload_size:
+            return
+        digest = _digest(key)
+        buckets = [_table_bucket(table) for table in tables]
+        padding = [0] * (MAX_TABLES - len(tables))
+        expires_at = time.time() + ttl
+        cache_set, indexes = self._slots(digest)
+        buf = self._buf
+        with self._locked(1 + cache_set):
+            if token != self.begin(tables):
+                return
+            offset = self._slot_offset(self._victim(digest, indexes))
+            sequence = _U64.unpack_from(buf, offset)[0]
+            _U64.pack_into(buf, offset, sequence + 1)
+            start = offset + SLOT_HEADER.size
+            buf[start:start + len(data)] = data
+            SLOT_HEADER.pack_into(
+                buf,
+                offset,
+                sequence + 1,
+                digest,
+                expires_at,
+                token[0],
+                len(data),
+                len(tables),
+                *buckets,
+                *padding,
+                *token[1:],
+                *padding,
+            )
+            _U64.pack_into(buf, offset, sequence + 2)
+        self.stores += 1
+
+    def _victim(self, digest: bytes, indexes: range) -> int:
+        """The slot to store `digest` in: its own, an empty one, or the stalest."""
+        victim, victim_expiry = indexes[0], float("inf")
+        for index in indexes:
+            slot_digest, expires_at = SLOT_HEADER.unpack_from(
+                self._buf, self._slot_offset(index)
+            )[1:3]
+            if slot_digest == digest or slot_digest == _EMPTY_DIGEST:
+                return index
+            if expires_at < victim_expiry:
+                victim, victim_expiry = index, expires_at
+        return victim
+
+    def invalidate(self, tables: typing.Iterable[str] = ()) -> None:
+        """Stale the results reading any of `tables`; no tables: all results."""
+        buckets = {_table_bucket(table) for table in tables}
+        with self._locked(0):
+            if not buckets:
+                epoch = _U64.unpack_from(self._buf, EPOCH_OFFSET)[0]
+                _U64.pack_into(self._buf, EPOCH_OFFSET, epoch + 1)
+            for bucket in buckets:
+                offset = GENERATIONS_OFFSET + 8 * bucket
+                _U64.pack_into(self._buf, offset, _U64.unpack_from(self._buf, offset)[0] + 1)
+        self.invalidations += 1
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        now = time.time()
+        used = 0
+        for index in range(self.slot_count):
+            slot_digest, expires_at = SLOT_HEADER.unpack_from(
+                self._buf, self._slot_offset(index)
+            )[1:3]
+            used += slot_digest != _EMPTY_DIGEST and expires_at > now
+        return {
+            "name": self.name,
+            "slots": self.slot_count,
+            "slot_size": self.slot_size,
+            "live_slots": used,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+        }
+
+    def close(self) -> None:
+        self._buf = None
+        self._segment.close()
+        os.close(self._lock_fd)
+
+    def unlink(self) -> None:
+        """Remove the segment from the host; attached processes keep their mapping."""
+        if not hasattr(self._segment, "_track"):
+            # Python < 3.13 unregisters on unlink what _open_segment did
+            resource_tracker.register(self._segment._name, "shared_memory")  # type: ignore[attr-defined]
+        self._segment.unlink()
+        os.unlink(os.path.join(tempfile.gettempdir(), f"{self.name}.lock"))
+
+
+class _RangeLock:
+    __slots__ = ("_fd", "_byte", "_thread_lock")
+
+    def __init__(self, fd: int, byte: int, thread_lock: threading.Lock) -> None:
+        self._fd = fd
+        self._byte = byte
+        self._thread_lock = thread_lock
+
+    def __enter__(self) -> None:
+        self._thread_lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._byte)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._byte)
+        finally:
+            self._thread_lock.release()
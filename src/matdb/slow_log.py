@@ -0,0 +1,129 @@
+import logging
+import random
+import re
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from matdb.events import QueryEvent
+from matdb.interfaces import DatabaseBackend
+from matdb.statement_stats import fingerprint
+
+__all__ = ["SlowQueryLog"]
+
+logger = logging.getLogger("databases.slow")
+
+# Statements EXPLAIN / SHOWPLAN describe without running them.
+EXPLAINABLE_RE = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.IGNORECASE)
+
+# Plans waiting for the explain thread; slow queries beyond that are logged
+# without a plan rather than queued.
+MAX_PENDING_EXPLAINS = 16
+
+
+class SlowQueryLog:
+    """
+    `after_execute` hook logging statements slower than `threshold` seconds
+    to the "databases.slow" logger, with their SQL, parameters, duration and
+    row count.
+
+    sample_rate: fraction of slow queries logged, to bound the log volume.
+    redact: log the SQL fingerprint instead of the SQL, and no parameter
+        values.
+    explain: attach the plan from the backend's `explain()`, fetched on a
+        separate pooled connection by a background thread so the slow query
+        itself is not delayed further.
+    """
+
+    def __init__(
+        self,
+        backend: DatabaseBackend,
+        threshold: float,
+        sample_rate: float = 1.0,
+        redact: bool = False,
+        explain: bool = False,
+    ) -> None:
+        self._backend = backend
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.redact = redact
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None  # type: typing.Optional[ThreadPoolExecutor]
+
+    def __call__(self, event: QueryEvent) -> None:
+        if event.duration < self.threshold:
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+
+        # executemany batches are logged but not explained
+        if (
+            self.explain
+            and isinstance(event.args, dict)
+            and EXPLAINABLE_RE.match(event.sql)
+            and self._reserve()
+        ):
+            self._get_executor().submit(self._explain_and_log, event)
+        else:
+            self._log(event)
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._pending >= MAX_PENDING_EXPLAINS:
+                return False
+            self._pending += 1
+            return True
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="matdb-explain"
+                )
+            return self._executor
+
+    def _explain_and_log(self, event: QueryEvent) -> None:
+        try:
+            connection = self._backend.connection()
+            connection.acquire()
+            try:
+                plan = connection.explain(event.sql, event.args)
+            finally:
+                connection.release()
+        except Exception as exc:
+            plan = f"<explain failed: {exc!r}>"
+        finally:
+            with self._lock:
+                self._pending -= 1
+        self._log(event, plan)
+
+    def _log(self, event: QueryEvent, plan: typing.Optional[str] = None) -> None:
+        if self.redact:
+            sql = fingerprint(event.sql)
+            args = "<redacted>"
+        else:
+            sql = event.sql
+            args = repr(event.args)
+        record = {
+            "sql": sql,
+            "args": args,
+            "duration": event.duration,
+            "rows": event.rows,
+            "error": repr(event.error) if event.error is not None else None,
+            "plan": plan,
+        }
+        message = "Slow query (%.3fs, %d rows): %s Args: %s"
+        log_args = [event.duration, event.rows, sql, args]
+        if plan is not None:
+            message += " Plan: %s"
+            log_args.append(plan)
+        logger.warning(message, *log_args, extra={"slow_query": record})
+
+    def close(self) -> None:
+        """Wait for pending plans, then stop the explain thread."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,123 @@
+import functools
+import random
+import re
+import threading
+import typing
+
+from matdb.events import QueryEvent
+
+__all__ = ["StatementStats", "fingerprint"]
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'|N'(?:[^']|'')*'")
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s|\?")
+_NUMBER_RE = re.compile(r"\b(?:0x[0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_RE = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """
+    Normalize a compiled statement so every execution of one query shape
+    maps to the same text: literals and bound parameters become `?`,
+    IN-lists collapse to `IN (...)` and multi-row VALUES lists to one row.
+    """
+    sql = _STRING_RE.sub("?", sql)
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    sql = _VALUES_RE.sub(r"\1", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+class _Entry:
+    __slots__ = ("calls", "total_time", "max_time", "rows", "errors", "cache_hits", "samples")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.samples = []  # type: typing.List[float]
+
+
+class StatementStats:
+    """
+    In-process, per-fingerprint statement counters in the spirit of
+    pg_stat_statements, fed by the `after_execute` query hook.
+
+    Latency percentiles come from a uniform reservoir sample of
+    `sample_size` durations per fingerprint. When `max_statements`
+    fingerprints are tracked, the least called one makes room for a new one.
+    """
+
+    def __init__(self, max_statements: int = 1000, sample_size: int = 256) -> None:
+        self.max_statements = max_statements
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._entries = {}  # type: typing.Dict[str, _Entry]
+
+    def __call__(self, event: QueryEvent) -> None:
+        key = fingerprint(event.sql)
+        duration = event.duration
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_statements:
+                    del self._entries[
+                        min(self._entries, key=lambda k: self._entries[k].calls)
+                    ]
+                entry = self._entries[key] = _Entry()
+            entry.calls += 1
+            entry.total_time += duration
+            if duration > entry.max_time:
+                entry.max_time = duration
+            entry.rows += event.rows
+            if event.error is not None:
+                entry.errors += 1
+            if event.cache_hit:
+                entry.cache_hits += 1
+            if len(entry.samples) < self.sample_size:
+                entry.samples.append(duration)
+            else:
+                index = random.randrange(entry.calls)
+                if index < self.sample_size:
+                    entry.samples[index] = duration
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries = {}
+
+    def snapshot(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        One dict per fingerprint, most total time first. Times are in seconds.
+        """
+        result = []
+        with self._lock:
+            for key, entry in self._entries.items():
+                samples = sorted(entry.samples)
+                result.append(
+                    {
+                        "fingerprint": key,
+                        "calls": entry.calls,
+                        "total_time": entry.total_time,
+                        "mean_time": entry.total_time / entry.calls,
+                        "p50_time": _percentile(samples, 0.50),
+                        "p99_time": _percentile(samples, 0.99),
+                        "max_time": entry.max_time,
+                        "rows": entry.rows,
+                        "errors": entry.errors,
+                        "cache_hits": entry.cache_hits,
+                    }
+                )
+        result.sort(key=lambda stats: stats["total_time"], reverse=True)
+        return result
+
+
+def _percentile(samples: typing.Sequence[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
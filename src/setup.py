@@ -47,6 +47,7 @@ setup(
     author_email="vijayanandraj.amaladoss@bofa.com",
     packages=get_packages("matdb"),
     install_requires=["sqlalchemy==1.4.41", "pymssql==2.2.5", "PyMySQL==1.0.2"],
+    extras_require={"numpy": ["numpy"]},
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Environment :: Web Environment",
@@ -0,0 +1,177 @@
+import itertools
+import threading
+
+import pymysql
+import pytest
+
+from matdb import Database
+
+session_ids = itertools.count(1)
+
+
+def _answer(connection, query, args):
+    return list(connection.pool.rows) if query.lstrip().upper().startswith("SELECT") else None
+
+
+class FakeCursor:
+    max_stmt_length = 1024000
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = 0
+        self.rows = []
+
+    def execute(self, query, args=None):
+        pool = self.connection.pool
+        with pool.lock:
+            pool.executed.append((query, args))
+            pool.threads.append(threading.current_thread().name)
+            pool.running += 1
+            pool.peak = max(pool.peak, pool.running)
+        try:
+            rows = pool.respond(self.connection, query, args)
+        finally:
+            with pool.lock:
+                pool.running -= 1
+        if rows is None:
+            self.description, self.rows, self.rowcount = None, [], pool.rowcount
+        else:
+            self.description, self.rows, self.rowcount = pool.description, list(rows), len(rows)
+
+    def executemany(self, query, args_list):
+        self.connection.pool.executed.append((query, args_list))
+        return len(args_list)
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    max_allowed_packet = 4194304
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.session = next(session_ids)
+        # set by a KILL QUERY of the session
+        self.interrupted = threading.Event()
+        pool.sessions[self.session] = self
+
+    def thread_id(self):
+        return self.session
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    def begin(self):
+        self.pool.executed.append(("BEGIN", None))
+
+    def commit(self):
+        self.pool.executed.append(("COMMIT", None))
+
+    def rollback(self):
+        self.pool.executed.append(("ROLLBACK", None))
+
+    def close(self):
+        with self.pool.lock:
+            self.pool.in_use -= 1
+            self.pool.returned += 1
+
+
+class FakePool:
+    """
+    Stands in for a MySQL backend's pool. Every statement is recorded in
+    `executed` as (sql, args) and answered by `respond(connection, sql,
+    args)`: rows, or None for a statement without a result set. By default
+    SELECTs get `rows`. `down` makes checkouts fail like an unreachable
+    server.
+    """
+
+    def __init__(
+        self,
+        name="localhost",
+        rows=(("EUR",), ("USD",)),
+        description=(("code", 253, None, 3, 3, 0, False),),
+        rowcount=1,
+        respond=_answer,
+        maxsize=10,
+    ):
+        self.name = name
+        self.rows = rows
+        self.description = description
+        self.rowcount = rowcount
+        self.respond = respond
+        self.maxsize = maxsize
+        self.down = False
+        self.executed = []
+        self.threads = []
+        self.sessions = {}
+        self.in_use = self.returned = self.running = self.peak = 0
+        self.lock = threading.Lock()
+
+    @property
+    def queries(self):
+        return [query for query, _ in self.executed]
+
+    def get_connection(self):
+        if self.down:
+            raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+        with self.lock:
+            self.in_use += 1
+        return FakeConnection(self)
+
+    def stats(self):
+        return {"name": self.name, "in_use": self.in_use, "waiting": 0, "maxsize": self.maxsize}
+
+
+def install_pool(backend, **pool_options):
+    backend.connect = backend.disconnect = lambda: None
+    backend._pool = FakePool(**pool_options)
+    return backend._pool
+
+
+@pytest.fixture
+def fake_pool():
+    """FakePool(**options): a fake pool not installed on any backend."""
+    return FakePool
+
+
+@pytest.fixture
+def fake_backend():
+    """fake_backend(backend, **options): install a FakePool on `backend`, returned."""
+    return install_pool
+
+
+@pytest.fixture
+def make_database():
+    """
+    make_database(url, pool_options={...}, **options): a connected Database
+    whose primary and replicas each have a FakePool(**pool_options) named
+    after their host.
+    """
+
+    def make(url="mysql://localhost/test", *, pool_options=None, **options):
+        database = Database(url, **options)
+        backends = [database._backend]
+        if database._replicas is not None:
+            backends += [replica.backend for replica in database._replicas.replicas]
+        for backend in backends:
+            install_pool(
+                backend, name=backend._database_url.hostname, **(pool_options or {})
+            )
+        database.connect()
+        return database
+
+    return make
@@ -0,0 +1,120 @@
+"""
+Minimal MySQL protocol stand-in for the asyncio backend tests: handshake with
+mysql_native_password (any credentials accepted), COM_QUERY, COM_PING and
+COM_QUIT. Every SELECT returns `rows` under `columns`; other statements
+return an OK packet. Statements containing FAIL return an error packet.
+"""
+import asyncio
+import struct
+
+from pymysql.constants import FIELD_TYPE
+
+COM_QUIT, COM_QUERY, COM_PING = 0x01, 0x03, 0x0E
+
+
+def lenenc(data):
+    if data is None:
+        return b"\xfb"
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    assert len(data) < 251
+    return bytes([len(data)]) + data
+
+
+def lenenc_int(value):
+    assert value < 251
+    return bytes([value])
+
+
+def column_definition(name, value):
+    if isinstance(value, int):
+        type_code, charset = FIELD_TYPE.LONGLONG, 63
+    elif isinstance(value, bytes):
+        type_code, charset = FIELD_TYPE.BLOB, 63
+    else:
+        type_code, charset = FIELD_TYPE.VAR_STRING, 45
+    return (
+        lenenc("def") + lenenc("test") + lenenc("t") + lenenc("t") + lenenc(name) + lenenc(name)
+        + b"\x0c" + struct.pack("<HIBHB", charset, 255, type_code, 0, 0) + b"\0\0"
+    )
+
+
+class FakeMySQLServer:
+    def __init__(self, columns=("id", "name"), rows=((1, "a"), (2, "b"), (3, None))):
+        self.columns = columns
+        self.rows = rows
+        self.queries = []
+        self.connections = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        seq = 0
+
+        def send(payload):
+            nonlocal seq
+            writer.write(struct.pack("<I", len(payload))[:3] + bytes([seq]) + payload)
+            seq = (seq + 1) % 256
+
+        async def receive():
+            nonlocal seq
+            header = await reader.readexactly(4)
+            seq = (header[3] + 1) % 256
+            return await reader.readexactly(int.from_bytes(header[:3], "little"))
+
+        def ok(affected_rows=0, insert_id=0):
+            send(b"\0" + lenenc_int(affected_rows) + lenenc_int(insert_id) + struct.pack("<HH", 2, 0))
+
+        def eof():
+            send(b"\xfe" + struct.pack("<HH", 0, 2))
+
+        try:
+            capabilities = 0x000FA20F | 0x00080000  # PROTOCOL_41, SECURE_CONNECTION, PLUGIN_AUTH, ...
+            send(
+                b"\x0a" + b"8.0.0-fake\0" + struct.pack("<I", self.connections) + b"12345678\0"
+                + struct.pack("<HBHHB", capabilities & 0xFFFF, 45, 2, capabilities >> 16, 21)
+                + b"\0" * 10 + b"901234567890\0" + b"mysql_native_password\0"
+            )
+            await receive()
+            ok()
+            await writer.drain()
+            while True:
+                packet = await receive()
+                command, argument = packet[0], packet[1:].decode("utf-8")
+                if command == COM_QUIT:
+                    break
+                if command == COM_QUERY:
+                    self.queries.append(argument)
+                    self._answer(argument, send, ok, eof)
+                elif command == COM_PING:
+                    ok()
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    def _answer(self, query, send, ok, eof):
+        if "FAIL" in query:
+            send(b"\xff" + struct.pack("<H", 1064) + b"#42000" + b"You have an error in your SQL syntax")
+        elif query.lstrip().upper().startswith("SELECT"):
+            send(lenenc_int(len(self.columns)))
+            first = self.rows[0] if self.rows else (None,) * len(self.columns)
+            for name, value in zip(self.columns, first):
+                send(column_definition(name, value))
+            eof()
+            for row in self.rows:
+                send(b"".join(lenenc(None if value is None else str(value)) for value in row))
+            eof()
+        elif query.lstrip().upper().startswith("INSERT"):
+            ok(affected_rows=query.count("),") + 1, insert_id=len(self.queries))
+        else:
+            ok()
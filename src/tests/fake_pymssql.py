@@ -0,0 +1,163 @@
+"""
+Stand-in for the pymssql module, enough for the MSSQL backend under DBUtils:
+`install()` puts it in sys.modules when pymssql itself is not installed.
+Connections record the batches they run; `prepare`, `execute` and
+`unprepare` answer the sp_prepare / sp_execute / sp_unprepare calls.
+"""
+import itertools
+import re
+import sys
+
+threadsafety = 1
+apilevel = "2.0"
+paramstyle = "pyformat"
+
+
+class DBAPIType:
+    # like pymssql's: compares equal to its int type code, but defines
+    # __eq__ without __hash__, so it cannot be a dict key
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        if isinstance(other, DBAPIType):
+            return self.value == other.value
+        return self.value == other
+
+
+STRING = DBAPIType(1)
+BINARY = DBAPIType(2)
+NUMBER = DBAPIType(3)
+DATETIME = DBAPIType(4)
+DECIMAL = DBAPIType(5)
+
+
+class Error(Exception):
+    pass
+
+
+class InterfaceError(Error):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+class InternalError(DatabaseError):
+    pass
+
+
+sessions = itertools.count(51)
+connections = []
+
+
+class _Conn:
+    def __init__(self):
+        self.cancels = 0
+
+    def cancel(self):
+        self.cancels += 1
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = 0
+        self._sets = []
+        self._rows = []
+
+    def execute(self, query, args=None):
+        connection = self.connection
+        if args is not None:
+            query = query % {key: repr(value) for key, value in args.items()}
+        connection.batches.append(query)
+        self.rowcount = 1
+        if query == "SELECT @@SPID":
+            self._result([(("spid", NUMBER.value),), [(connection.spid,)]])
+        elif "sp_prepare" in query:
+            handle = next(connection.handles)
+            connection.prepared[handle] = query
+            # the metadata set of the prepared query, then the handle
+            self._result([(("code", STRING.value),), []], [(("prepared_handle", NUMBER.value),), [(handle,)]])
+        elif query.startswith("EXEC sp_unprepare"):
+            del connection.prepared[int(query.split()[-1])]
+        elif query.startswith("EXEC sp_execute"):
+            handle = int(re.match(r"EXEC sp_execute (\d+)", query).group(1))
+            if handle not in connection.prepared:
+                raise OperationalError(8179, "Could not find prepared statement with handle %d" % handle)
+            self._result([(("code", STRING.value),), [("EUR",)]])
+        else:
+            self._result([(("code", STRING.value),), [("EUR",)]])
+
+    def _result(self, *sets):
+        self._sets = list(sets)
+        self.nextset()
+
+    def nextset(self):
+        if not self._sets:
+            self.description, self._rows = None, []
+            return None
+        (description, rows), self._sets = self._sets[0], self._sets[1:]
+        self.description = tuple(column + (None,) * 5 for column in description)
+        self._rows = list(rows)
+        return True
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def executemany(self, query, args_list):
+        for args in args_list:
+            self.execute(query, args)
+
+    def close(self):
+        pass
+
+
+class Connection:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.spid = next(sessions)
+        self.batches = []
+        self.prepared = {}
+        self.handles = itertools.count(1)
+        self.closed = False
+        self._conn = _Conn()
+        connections.append(self)
+
+    def cursor(self):
+        return Cursor(self)
+
+    def autocommit(self, status):
+        self.autocommit_state = status
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def connect(**kwargs):
+    return Connection(**kwargs)
+
+
+def install():
+    sys.modules.setdefault("pymssql", sys.modules[__name__])
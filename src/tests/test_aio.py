@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from matdb.aio import AsyncDatabase
+
+
+@pytest.fixture
+def make_database(fake_backend):
+    def make():
+        database = AsyncDatabase("mysql://localhost/test", max_workers=2)
+        fake_backend(
+            database.database._backend,
+            rows=[(i,) for i in range(5)],
+            description=(("id", 3, None, 11, 11, 0, False),),
+        )
+        return database
+
+    return make
+
+
+def test_async_calls_run_on_worker_threads(make_database):
+    async def main():
+        async with make_database() as database:
+            records = await database.fetch_all("SELECT id FROM t")
+            assert [record["id"] for record in records] == [0, 1, 2, 3, 4]
+            assert await database.fetch_val("SELECT id FROM t") == 0
+            return database.database._backend._pool
+
+    pool = asyncio.run(main())
+    assert all(name.startswith("matdb-aio-") for name in pool.threads)
+
+
+def test_transaction_pins_one_worker(make_database):
+    async def main():
+        async with make_database() as database:
+            pool = database.database._backend._pool
+            async with database.transaction():
+                await asyncio.gather(
+                    database.execute("DELETE FROM t"), database.execute("DELETE FROM t")
+                )
+            assert pool.queries == ["BEGIN", "DELETE FROM t", "DELETE FROM t", "COMMIT"]
+            assert len(set(pool.threads)) == 1
+
+            try:
+                async with database.transaction():
+                    raise ValueError()
+            except ValueError:
+                pass
+            assert pool.queries[-1] == "ROLLBACK"
+
+    asyncio.run(main())
+
+
+def test_iterate_prefetches_chunks(make_database):
+    async def main():
+        async with make_database() as database:
+            return [record["id"] async for record in database.iterate("SELECT id FROM t", chunk_size=2)]
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
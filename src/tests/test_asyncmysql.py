@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from pymysql import err
+
+from matdb import Database
+from matdb.aio import AsyncDatabase
+from matdb.backend.pool.asyncpool import GetConnectionFromPoolError
+from matdb.backend.pool.metrics import prometheus_text
+from fake_mysql_server import FakeMySQLServer
+
+
+def run_with_server(test, **server_options):
+    async def main():
+        server = FakeMySQLServer(**server_options)
+        port = await server.start()
+        database = AsyncDatabase(
+            f"mysql+async://user:pw@127.0.0.1:{port}/test"
+            "?pre_create_num=0&min_size=1&max_size=2"
+        )
+        try:
+            async with database:
+                await test(database, server)
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_fetch_and_execute():
+    async def test(database, server):
+        records = await database.fetch_all("SELECT id, name FROM t WHERE id > :id", {"id": 0})
+        assert [tuple(record) for record in records] == [(1, "a"), (2, "b"), (3, None)]
+        assert records[1]["name"] == "b"
+        assert server.queries[-1] == "SELECT id, name FROM t WHERE id > 0"
+        assert (await database.fetch_one("SELECT id, name FROM t"))["id"] == 1
+        assert await database.fetch_val("SELECT id, name FROM t", column=1) == "a"
+
+        assert await database.execute("INSERT INTO t (name) VALUES (:name)", {"name": "it's"}) > 0
+        assert server.queries[-1] == "INSERT INTO t (name) VALUES ('it\\'s')"
+        rowcount = await database.execute_many(
+            "INSERT INTO t (name) VALUES (:name)", [{"name": "x"}, {"name": "y"}]
+        )
+        assert rowcount == 2
+        assert server.queries[-1] == "INSERT INTO t (name) VALUES ('x'), ('y')"
+
+    run_with_server(test)
+
+
+def test_percent_signs_without_parameters():
+    async def test(database, server):
+        await database.fetch_all("SELECT id, name FROM t WHERE name LIKE 'a%'")
+        assert server.queries[-1] == "SELECT id, name FROM t WHERE name LIKE 'a%'"
+        await database.execute("UPDATE t SET name = 'x' WHERE name LIKE '%y'")
+        assert server.queries[-1] == "UPDATE t SET name = 'x' WHERE name LIKE '%y'"
+
+    run_with_server(test)
+
+
+def test_iterate_and_errors():
+    async def test(database, server):
+        events = []
+        database.database._backend.hooks.register("after_execute", events.append)
+        names = [record["name"] async for record in database.iterate("SELECT id, name FROM t")]
+        assert names == ["a", "b", None]
+        # the stream is reported once read, with its rows
+        assert [(event.rows, event.bytes) for event in events] == [(3, 26)]
+
+        # an abandoned iteration is drained before the connection is reused
+        async for record in database.iterate("SELECT id, name FROM t"):
+            break
+        assert await database.fetch_val("SELECT id, name FROM t") == 1
+
+        with pytest.raises(err.ProgrammingError):
+            await database.execute("UPDATE FAIL")
+        assert await database.fetch_val("SELECT id, name FROM t") == 1
+
+    run_with_server(test)
+
+
+def test_transactions_hold_one_connection():
+    async def test(database, server):
+        async with database.transaction():
+            await database.execute("UPDATE t SET name = 'a'")
+            async with database.transaction():
+                await database.execute("UPDATE t SET name = 'b'")
+        with pytest.raises(RuntimeError):
+            async with database.transaction():
+                raise RuntimeError()
+
+        statements = [query.split(" ")[0] for query in server.queries if query != "SET AUTOCOMMIT = 1"]
+        assert statements == ["BEGIN", "UPDATE", "SAVEPOINT", "UPDATE", "RELEASE", "COMMIT", "BEGIN", "ROLLBACK"]
+        assert server.connections == 1
+
+    run_with_server(test)
+
+
+def test_pool_limits_connections():
+    async def test(database, server):
+        results = await asyncio.gather(
+            *[database.fetch_all("SELECT id, name FROM t") for _ in range(10)]
+        )
+        assert all(len(records) == 3 for records in results)
+        assert server.connections == 2
+        stats = database.database.pool_stats()
+        assert (stats["total"], stats["in_use"], stats["maxsize"]) == (2, 0, 2)
+
+        pool = database.database._backend._pool
+        held = [await pool.get_connection(), await pool.get_connection()]
+        with pytest.raises(GetConnectionFromPoolError):
+            await pool.get_connection(timeout=0.01)
+
+        waiter = asyncio.ensure_future(pool.get_connection())
+        await asyncio.sleep(0)
+        held[0]._force_close()
+        await held[0].close()
+        # the discarded connection's slot is handed to the waiter, not counted as idle
+        stats = pool.stats()
+        assert (stats["idle"], stats["total"], stats["waiting"]) == (0, 1, 1)
+        held[0] = await waiter
+        for connection in held:
+            await connection.close()
+
+        stats = database.database.pool_stats()
+        assert (stats["idle"], stats["total"], stats["timeouts"], stats["high_water"]) == (2, 2, 1, 2)
+        assert stats["wait_time"]["count"] == stats["hold_time"]["count"]
+        assert 'matdb_pool_waiting{pool="pool1"} 0' in prometheus_text(stats)
+
+    run_with_server(test)
+
+
+def test_sync_database_rejects_async_backend():
+    with pytest.raises(AssertionError):
+        Database("mysql+async://localhost/test").connect()
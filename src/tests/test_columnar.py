@@ -0,0 +1,56 @@
+import datetime
+import decimal
+
+import pytest
+
+from matdb.backend.columnar import read_columns
+
+numpy = pytest.importorskip("numpy")
+
+
+class FakeCursor:
+    def __init__(self, description, rows):
+        self.description = description
+        self.rows = list(rows)
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+
+def test_read_columns_dtypes_and_null_masks():
+    cursor = FakeCursor(
+        (("id", 3), ("price", 246), ("name", 253), ("created", 12)),
+        [
+            (1, decimal.Decimal("1.50"), "a", datetime.datetime(2022, 1, 1)),
+            (2, None, "b", None),
+            (None, decimal.Decimal("3.25"), None, datetime.datetime(2022, 1, 3)),
+        ],
+    )
+    columns = read_columns(
+        cursor, {3: "int64", 246: "float64", 12: "datetime64[us]"}, None, chunk_size=2
+    )
+
+    assert list(columns) == ["id", "price", "name", "created"]
+    assert columns["id"].dtype == numpy.int64
+    assert columns["id"].mask.tolist() == [False, False, True]
+    assert columns["price"].filled(0).tolist() == [1.5, 0, 3.25]
+    assert columns["name"].dtype == object
+    assert columns["name"].mask.tolist() == [False, False, True]
+    assert columns["created"].dtype == numpy.dtype("datetime64[us]")
+    assert columns["created"].count() == 2
+
+
+def test_read_columns_infers_and_overrides_dtypes():
+    cursor = FakeCursor((("a", 3), ("b", 3)), [(1, 1.5), (2, 2.5)])
+    columns = read_columns(cursor, {}, {"a": "float32"}, chunk_size=10)
+
+    assert columns["a"].dtype == numpy.float32
+    assert columns["b"].dtype == numpy.float64
+    assert columns["b"].mask is numpy.ma.nomask
+
+
+def test_read_columns_empty_result():
+    columns = read_columns(FakeCursor((("a", 3),), []), {3: "int64"}, None, 10)
+    assert columns["a"].dtype == numpy.int64
+    assert len(columns["a"]) == 0
@@ -0,0 +1,72 @@
+import pymysql
+import pytest
+
+from matdb.backend.instrument import InstrumentedCursor
+from matdb.backend.mysql import MySQLBackend
+from matdb.core import Connection
+from matdb.events import QueryHooks
+
+
+NAME = (("name", 253, None, 80, 80, 0, True),)
+
+
+def lock_wait_timeout(connection, query, args):
+    raise pymysql.err.OperationalError(1205, "Lock wait timeout")
+
+
+@pytest.fixture
+def connect(fake_pool):
+    def connect(**pool_options):
+        backend = MySQLBackend("mysql://localhost/test")
+        connection = backend.connection()
+        pool = fake_pool(description=NAME, rowcount=3, **pool_options)
+        connection._connection = pool.get_connection()
+        return backend, connection
+
+    return connect
+
+
+def test_hooks_receive_timings_rows_and_bytes(connect):
+    backend, connection = connect(rows=[("alice",), ("bob",)])
+    events = []
+    backend.hooks.register("before_execute", lambda event: events.append(("before", event)))
+    backend.hooks.register("after_execute", lambda event: events.append(("after", event)))
+
+    query = Connection._build_query("SELECT name FROM users WHERE id > :id", {"id": 1})
+    assert [record["name"] for record in connection.fetch_all(query)] == ["alice", "bob"]
+
+    assert [name for name, _ in events] == ["before", "after"]
+    event = events[1][1]
+    assert event.sql == "SELECT name FROM users WHERE id > %(id)s"
+    assert event.param_count == 1
+    assert (event.rows, event.bytes) == (2, 8)
+    assert event.compile_time > 0 and event.execute_time > 0 and event.fetch_time > 0
+    assert event.error is None
+
+
+def test_hooks_report_affected_rows_and_errors(connect):
+    backend, connection = connect()
+    events = []
+    backend.hooks.register("after_execute", events.append)
+
+    assert connection.execute(Connection._build_query("DELETE FROM users")) == 3
+    assert events[-1].rows == 3
+
+    connection._connection.pool.respond = lock_wait_timeout
+    with pytest.raises(pymysql.err.OperationalError):
+        connection.execute(Connection._build_query("DELETE FROM users"))
+    assert isinstance(events[-1].error, pymysql.err.OperationalError)
+
+
+def test_inactive_hooks_use_plain_cursor(connect):
+    hooks = QueryHooks()
+    hook = hooks.register("after_execute")(lambda event: None)
+    assert hooks.active
+    hooks.unregister("after_execute", hook)
+    assert not hooks.active
+    with pytest.raises(ValueError):
+        hooks.register("before_commit", hook)
+
+    backend, connection = connect()
+    connection._compile(Connection._build_query("DELETE FROM users"))
+    assert not isinstance(connection._cursor(), InstrumentedCursor)
@@ -0,0 +1,106 @@
+from sqlalchemy import column, table
+
+from matdb.backend.bulk import multirow_insert
+from matdb.backend.mysql import MySQLBackend
+from matdb.core import Connection
+
+users = table("users", column("id"), column("name"))
+
+
+class FakeCursor:
+    max_stmt_length = 1024000
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def executemany(self, query, args):
+        self.calls.append((query, list(args)))
+        return len(args)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    max_allowed_packet = 16 * 1024 * 1024
+
+    def __init__(self):
+        self.calls = []
+
+    def cursor(self):
+        return FakeCursor(self.calls)
+
+
+def test_multirow_insert_respects_param_limit():
+    query = "INSERT INTO users (id, name) VALUES (%(id)s, %(name)s)"
+    rows = [{"id": i, "name": str(i)} for i in range(7)]
+
+    statements = list(multirow_insert(query, rows, batch_size=100, max_params=6))
+    assert len(statements) == 3
+    sql, args = statements[0]
+    assert sql == (
+        "INSERT INTO users (id, name) VALUES "
+        "(%(id__0)s, %(name__0)s), (%(id__1)s, %(name__1)s), (%(id__2)s, %(name__2)s)"
+    )
+    assert args == {
+        "id__0": 0, "name__0": "0",
+        "id__1": 1, "name__1": "1",
+        "id__2": 2, "name__2": "2",
+    }
+    assert statements[-1][1] == {"id__0": 6, "name__0": "6"}
+
+
+def test_multirow_insert_ignores_other_statements():
+    query = "UPDATE users SET name = %(name)s WHERE id = %(id)s"
+    assert multirow_insert(query, [{"id": 1, "name": "a"}], 10, 100) is None
+
+
+def test_execute_many_compiles_once_and_batches():
+    backend = MySQLBackend("mysql://localhost/test?execute_many_batch_size=2")
+    connection = backend.connection()
+    connection._connection = FakeConnection()
+    rows = [{"id": i, "name": f"user{i}"} for i in range(5)]
+
+    rowcount = connection.execute_many(Connection._build_query(users.insert()), rows)
+    assert rowcount == 5
+
+    calls = connection._connection.calls
+    assert [len(args) for _, args in calls] == [2, 2, 1]
+    assert {query for query, _ in calls} == {
+        "INSERT INTO users (id, name) VALUES (%(id)s, %(name)s)"
+    }
+    assert calls[2][1] == [{"id": 4, "name": "user4"}]
+    assert backend.statement_cache.misses == 1
+
+
+def test_execute_many_text_query():
+    backend = MySQLBackend("mysql://localhost/test")
+    connection = backend.connection()
+    connection._connection = FakeConnection()
+    query = Connection._build_query("UPDATE users SET name = :name WHERE id = :id")
+
+    assert connection.execute_many(query, [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]) == 2
+    assert connection._connection.calls == [
+        (
+            "UPDATE users SET name = %(name)s WHERE id = %(id)s",
+            [{"name": "a", "id": 1}, {"name": "b", "id": 2}],
+        )
+    ]
+
+
+def test_execute_many_rows_with_other_keys():
+    backend = MySQLBackend("mysql://localhost/test")
+    connection = backend.connection()
+    connection._connection = FakeConnection()
+    rows = [{"id": 1, "name": "a"}, {"name": "b", "id": 2}, {"id": 3}, {"id": 4, "name": "d"}]
+
+    assert connection.execute_many(Connection._build_query(users.insert()), rows) == 4
+    assert connection._connection.calls == [
+        (
+            "INSERT INTO users (id, name) VALUES (%(id)s, %(name)s)",
+            [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}],
+        ),
+        ("INSERT INTO users (id) VALUES (%(id)s)", [{"id": 3}]),
+        ("INSERT INTO users (id, name) VALUES (%(id)s, %(name)s)", [{"id": 4, "name": "d"}]),
+    ]
+    assert backend.statement_cache.misses == 2
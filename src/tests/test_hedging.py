@@ -0,0 +1,97 @@
+import time
+
+import pymysql
+import pytest
+
+from matdb.replicas import HedgedAttempt
+
+def respond(connection, query, args):
+    pool = connection.pool
+    if query.startswith("KILL QUERY"):
+        pool.sessions[args[0]].interrupted.set()
+        return None
+    if pool.delay and connection.interrupted.wait(pool.delay):
+        raise pymysql.err.OperationalError(1317, "Query execution was interrupted")
+    return [(pool.name,)]
+
+
+def killed(pool):
+    return [args[0] for query, args in pool.executed if query.startswith("KILL QUERY")]
+
+
+@pytest.fixture
+def make_database(make_database):
+    def make():
+        database = make_database(
+            "mysql://primary/test",
+            replicas=["mysql://r1/test", "mysql://r2/test"],
+            hedge_percentile=0.9,
+            hedge_min_delay=0.02,
+            pool_options={
+                "respond": respond,
+                "description": (("server", 253, None, 255, 255, 0, True),),
+            },
+        )
+        for replica in database._replicas.replicas:
+            # seconds a read stalls until its session is killed
+            replica.backend._pool.delay = 0
+        database._backend._pool.delay = 0
+        return database
+
+    return make
+
+
+def test_slow_read_is_hedged_and_the_loser_killed(make_database):
+    database = make_database()
+    r1, r2 = database._replicas.replicas
+    for _ in range(20):
+        database._replicas.release(database._replicas.choose(), 0.001)
+    # r1 looks faster, so it gets the read first, then stalls
+    r1.latency, r2.latency = 0.0001, 0.01
+    r1.backend._pool.delay = 2
+
+    started = time.monotonic()
+    assert database.fetch_val("SELECT 1") == "r2"
+    assert time.monotonic() - started < 1
+    database.disconnect()  # waits for the losing copy
+    pool = r1.backend._pool
+    assert len(killed(pool)) == 1
+    # the stalled connection and the one sending the KILL are both returned
+    assert pool.returned == 2
+    assert r1.failures == 0
+
+
+def test_fast_read_is_not_hedged(make_database):
+    database = make_database()
+    for _ in range(20):
+        database._replicas.release(database._replicas.choose(), 0.001)
+    r1, r2 = database._replicas.replicas
+    assert database.fetch_one("SELECT 1")["server"] in ("r1", "r2")
+    database.disconnect()
+    assert r1.backend._pool.returned + r2.backend._pool.returned == 1
+    assert not killed(r1.backend._pool) and not killed(r2.backend._pool)
+
+
+def test_kill_connection_is_checked_out_without_the_attempt_lock(make_database):
+    database = make_database()
+    replica = database._replicas.replicas[0]
+    pool = replica.backend._pool
+    victim = pool.get_connection()
+    attempt = HedgedAttempt(replica)
+    attempt.session_id = victim.session
+    get_connection = pool.get_connection
+
+    def checkout():
+        # a saturated pool blocks here; the attempt must still be able to
+        # give its connection back
+        assert not attempt.lock.locked()
+        return get_connection()
+
+    pool.get_connection = checkout
+    database._cancel_attempt(attempt)
+    assert killed(pool) == [victim.session] and pool.returned == 1
+
+    finished = HedgedAttempt(replica)
+    finished.session_id, finished.finished = victim.session, True
+    database._cancel_attempt(finished)
+    assert killed(pool) == [victim.session]
@@ -0,0 +1,62 @@
+import pymysql
+
+from matdb.backend.mysql import MySQLBackend
+from matdb.core import Connection
+
+
+class FakeSSCursor:
+    description = (("id", 3, None, 11, 11, 0, False),)
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.fetch_sizes = []
+        self.closed = False
+
+    def execute(self, query, args):
+        pass
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cursors = []
+        self.rows = rows
+
+    def cursor(self, cursor_class=None):
+        assert cursor_class is pymysql.cursors.SSCursor
+        cursor = FakeSSCursor(self.rows)
+        self.cursors.append(cursor)
+        return cursor
+
+
+def test_iterate_streams_in_chunks():
+    backend = MySQLBackend("mysql://localhost/test?iterate_chunk_size=2")
+    connection = backend.connection()
+    connection._connection = FakeConnection([(i,) for i in range(5)])
+
+    query = Connection._build_query("SELECT id FROM users")
+    records = [record["id"] for record in connection.iterate(query)]
+
+    assert records == [0, 1, 2, 3, 4]
+    cursor = connection._connection.cursors[0]
+    assert cursor.fetch_sizes == [2, 2, 2, 2]
+    assert cursor.closed
+
+
+def test_abandoned_iterate_closes_cursor():
+    backend = MySQLBackend("mysql://localhost/test?iterate_chunk_size=2")
+    connection = backend.connection()
+    connection._connection = FakeConnection([(i,) for i in range(5)])
+
+    iterator = connection.iterate(Connection._build_query("SELECT id FROM users"))
+    assert next(iterator)["id"] == 0
+    iterator.close()
+
+    assert connection._connection.cursors[0].closed
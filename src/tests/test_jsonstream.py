@@ -0,0 +1,68 @@
+import datetime
+import decimal
+import io
+import json
+
+from matdb.backend.jsonstream import alchemyencoder, iter_json, write_json
+
+
+class FakeCursor:
+    def __init__(self, description, rows):
+        self.description = description
+        self.rows = list(rows)
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+
+DESCRIPTION = (("id", 3), ("name", 253), ("price", 246), ("created", 12), ("opens", 11))
+ROWS = [
+    (1, "café \"x\"", decimal.Decimal("1.50"), datetime.datetime(2022, 1, 1, 10, 30), datetime.time(1, 2)),
+    (2, None, decimal.Decimal("2"), None, None),
+    (None, "b", None, datetime.date(2022, 1, 3), datetime.time(9, 0)),
+]
+
+
+def test_iter_json_matches_json_dumps():
+    expected = json.dumps(
+        [dict(zip([c[0] for c in DESCRIPTION], row)) for row in ROWS],
+        default=alchemyencoder,
+    )
+    chunks = list(iter_json(FakeCursor(DESCRIPTION, ROWS), chunk_size=2))
+    assert len(chunks) == 3
+    assert "".join(chunks) == expected
+
+
+def test_iter_json_empty_result():
+    assert "".join(iter_json(FakeCursor(DESCRIPTION, []), chunk_size=2)) == "[]"
+    assert "".join(iter_json(FakeCursor(DESCRIPTION, []), 2, ndjson=True)) == ""
+
+
+def test_iter_json_ndjson():
+    text = "".join(iter_json(FakeCursor(DESCRIPTION, ROWS), 2, ndjson=True))
+    lines = text.splitlines()
+    assert text.endswith("\n")
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, None]
+
+
+class FakeSocket:
+    def __init__(self):
+        self.data = b""
+
+    def sendall(self, data):
+        self.data += data
+
+
+def test_write_json_targets():
+    text_out = io.StringIO()
+    written = write_json(iter_json(FakeCursor(DESCRIPTION, ROWS), 2), text_out)
+    assert written == len(text_out.getvalue())
+
+    binary_out = io.BytesIO()
+    write_json(iter_json(FakeCursor(DESCRIPTION, ROWS), 2), binary_out)
+    assert binary_out.getvalue().decode() == text_out.getvalue()
+
+    sock = FakeSocket()
+    write_json(iter_json(FakeCursor(DESCRIPTION, ROWS), 2), sock)
+    assert sock.data == binary_out.getvalue()
@@ -0,0 +1,114 @@
+import pytest
+
+import fake_pymssql
+
+fake_pymssql.install()
+
+from matdb import Database  # noqa: E402
+from matdb.backend import mssql  # noqa: E402
+from matdb.backend.mssql import MSSQLBackend  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def driver(monkeypatch):
+    monkeypatch.setattr(mssql, "pymssql", fake_pymssql)
+    fake_pymssql.connections.clear()
+
+
+def test_disconnect_closes_the_pool():
+    backend = MSSQLBackend("mssql://sa:pw@localhost:1433/test")
+    backend.connect()
+    connection = backend.connection()
+    connection.acquire()
+    connection.release()
+    assert backend.pool_stats()["idle"] == 5
+
+    backend.disconnect()
+    assert backend._pool is None
+    assert all(raw.closed for raw in fake_pymssql.connections)
+
+
+def make_database():
+    database = Database("mssql://sa:pw@localhost:1433/test?min_size=1&pre_create_num=1&max_size=1")
+    database.connect()
+    return database
+
+
+def raw_connection(database):
+    with database.connection() as connection:
+        return connection.raw_connection._con._con
+
+
+def test_session_state_outlives_checkouts():
+    database = make_database()
+    raw = raw_connection(database)
+    for _ in range(2):
+        with database.connection() as connection:
+            assert connection._connection.session_id() == raw.spid
+    assert raw.batches.count("SELECT @@SPID") == 1
+
+    statement = database.prepare("SELECT code FROM rates WHERE code = :code", server_side=True)
+    for code in ("EUR", "USD"):
+        assert [record["code"] for record in statement.fetch_all({"code": code})] == ["EUR"]
+    assert [batch for batch in raw.batches if "sp_" in batch] == [
+        "DECLARE @handle int; EXEC sp_prepare @handle OUTPUT, N'@code nvarchar(max)', "
+        "N'SELECT code FROM rates WHERE code = @code'; SELECT @handle AS prepared_handle",
+        "EXEC sp_execute 1, 'EUR'",
+        "EXEC sp_execute 1, 'USD'",
+    ]
+    assert statement.fetch_val({"code": 1}) == "EUR"
+    assert raw.batches[-1] == "EXEC sp_execute 2, 1"
+    assert len(raw.prepared) == 2
+    database.disconnect()
+
+
+def test_reconnect_starts_a_new_session():
+    database = make_database()
+    statement = database.prepare("SELECT code FROM rates WHERE code = :code", server_side=True)
+    statement.fetch_all({"code": "EUR"})
+    with database.connection() as connection:
+        # what SteadyDBConnection does when it reopens
+        connection.raw_connection._con._con = fake_pymssql.connect()
+        assert connection._connection.session_id() == fake_pymssql.connections[-1].spid
+    statement.fetch_all({"code": "EUR"})
+    raw = raw_connection(database)
+    assert raw.batches[-1] == "EXEC sp_execute 1, 'EUR'"
+    assert len(raw.prepared) == 1
+    database.disconnect()
+
+
+def test_prepared_handles_are_capped(monkeypatch):
+    monkeypatch.setattr(mssql, "MAX_PREPARED_HANDLES", 2)
+    database = make_database()
+    for column in ("a", "b", "c"):
+        database.prepare(f"SELECT {column} FROM t WHERE id = :id", server_side=True).fetch_one({"id": 1})
+    raw = raw_connection(database)
+    assert [batch for batch in raw.batches if batch.startswith("EXEC sp_unprepare")] == [
+        "EXEC sp_unprepare 1",
+        "EXEC sp_unprepare 2",
+    ]
+    assert list(raw.prepared) == [3]
+    database.disconnect()
+
+
+def test_fetch_columns_maps_type_codes():
+    pytest.importorskip("numpy")
+    database = make_database()
+    columns = database.fetch_columns("SELECT code FROM currencies")
+    assert columns["code"].dtype == object and list(columns["code"]) == ["EUR"]
+    database.disconnect()
+
+
+def test_abandoned_iteration_is_cancelled():
+    database = make_database()
+    raw = raw_connection(database)
+    for record in database.iterate("SELECT code FROM currencies"):
+        break
+    assert raw._conn.cancels == 1
+
+    # without pymssql's cancel() the rest of the result is read instead
+    del raw._conn
+    for record in database.iterate("SELECT code FROM currencies"):
+        break
+    assert database.fetch_val("SELECT code FROM currencies") == "EUR"
+    database.disconnect()
@@ -0,0 +1,82 @@
+import concurrent.futures
+import time
+
+import pytest
+
+
+def respond(connection, query, args):
+    if "fail" in query:
+        raise ValueError(query)
+    time.sleep(float(args.get("delay", 0.05)) if args else 0.05)
+    return [(args["id"],)] if args else []
+
+
+@pytest.fixture
+def make_database(make_database):
+    def make(maxsize, **options):
+        return make_database(
+            pool_options={
+                "respond": respond,
+                "description": (("id", 3, None, 11, 11, 0, False),),
+                "maxsize": maxsize,
+            },
+            **options,
+        )
+
+    return make
+
+
+def test_fetch_all_parallel_returns_results_in_order(make_database):
+    database = make_database(maxsize=10)
+    queries = [("SELECT id FROM t WHERE id = :id", {"id": i}) for i in range(6)]
+    queries.insert(2, ("SELECT fail", None))
+    started = time.monotonic()
+    results = database.fetch_all_parallel(queries)
+    elapsed = time.monotonic() - started
+
+    assert [records[0]["id"] for records in results[:2] + results[3:]] == list(range(6))
+    assert isinstance(results[2], ValueError)
+    assert elapsed < 6 * 0.05
+    assert database._backend._pool.peak > 1
+    database.disconnect()
+    assert database._backend._pool.in_use == 0
+
+
+def test_fetch_all_parallel_concurrency_is_capped_by_free_connections(make_database):
+    database = make_database(maxsize=4)
+    pool = database._backend._pool
+    with database.connection():
+        # one of the four connections is held by the caller
+        results = database.fetch_all_parallel(
+            [("SELECT id FROM t WHERE id = :id", {"id": i}) for i in range(9)]
+        )
+    assert [records[0]["id"] for records in results] == list(range(9))
+    assert pool.peak == 3
+    database.disconnect()
+
+
+def test_fetch_all_parallel_timeout(make_database):
+    database = make_database(maxsize=1)
+    results = database.fetch_all_parallel(
+        [
+            ("SELECT id FROM t WHERE id = :id AND :delay > 0", {"id": 1, "delay": 0.01}),
+            ("SELECT id FROM t WHERE id = :id AND :delay > 0", {"id": 2, "delay": 0.5}),
+            ("SELECT id FROM t WHERE id = :id AND :delay > 0", {"id": 3, "delay": 0.01}),
+        ],
+        timeout=0.2,
+    )
+    assert results[0][0]["id"] == 1
+    assert isinstance(results[1], concurrent.futures.TimeoutError)
+    assert isinstance(results[2], concurrent.futures.TimeoutError)
+    database.disconnect()
+
+
+def test_fetch_all_parallel_reads_through_the_result_cache(make_database):
+    database = make_database(maxsize=4, result_cache=True, result_cache_ttl=60)
+    query = ("SELECT id FROM t WHERE id = :id", {"id": 1})
+    assert database.fetch_all(*query)[0]["id"] == 1
+    pool = database._backend._pool
+    results = database.fetch_all_parallel([query, query])
+    assert [records[0]["id"] for records in results] == [1, 1]
+    assert len(pool.executed) == 1
+    database.disconnect()
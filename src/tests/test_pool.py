@@ -0,0 +1,286 @@
+import threading
+import time
+
+import pytest
+from dbutils.pooled_db import TooManyConnections
+
+from matdb.backend.pool.base import (
+    BaseConnectionPool,
+    GetConnectionFromPoolError,
+    ReturnConnectionToPoolError,
+)
+from matdb.backend.pool.metrics import prometheus_text
+from matdb.backend.pool.pooleddb import MeteredPooledDB
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.alive = True
+        self.pings = 0
+
+    def ping(self, reconnect=True):
+        self.pings += 1
+        if not self.alive:
+            raise ConnectionError("gone")
+
+    def cursor(self):
+        return FakeCursor()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool._put_connection(self)
+        else:
+            self.closed = True
+
+
+class FakeDBAPIConnection:
+    threadsafety = 1
+
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool(BaseConnectionPool):
+    def __init__(self, *args, **kwargs):
+        self.created = 0
+        super().__init__(*args, **kwargs)
+
+    def _new_connection(self):
+        self.created += 1
+        return FakeConnection(self.created)
+
+
+def test_pool_grows_to_maxsize_then_times_out():
+    pool = FakePool(size=1, maxsize=2, timeout=0.05)
+    first = pool.get_connection()
+    second = pool.get_connection()
+    assert pool.connection_num == 2
+
+    started = time.monotonic()
+    with pytest.raises(GetConnectionFromPoolError):
+        pool.get_connection()
+    assert time.monotonic() - started >= 0.05
+    assert pool.waiting_num == 0
+
+    with pytest.raises(GetConnectionFromPoolError):
+        pool.get_connection(timeout=0)
+
+    first.close()
+    assert pool.get_connection() is first
+    second.close()
+    with pytest.raises(ReturnConnectionToPoolError):
+        pool._put_connection(second)
+
+
+def test_returned_connection_goes_to_longest_waiter():
+    pool = FakePool(size=1, maxsize=1, timeout=5)
+    conn = pool.get_connection()
+    order = []
+
+    def worker(name):
+        got = pool.get_connection()
+        order.append(name)
+        time.sleep(0.01)
+        got.close()
+
+    threads = []
+    for name in range(3):
+        thread = threading.Thread(target=worker, args=(name,))
+        thread.start()
+        threads.append(thread)
+        while pool.waiting_num < name + 1:
+            time.sleep(0.001)
+
+    conn.close()
+    for thread in threads:
+        thread.join()
+
+    assert order == [0, 1, 2]
+    assert pool.created == 1
+    assert pool.size == 1
+
+
+def test_discarded_connection_frees_slot_for_waiter():
+    pool = FakePool(size=1, maxsize=1, timeout=5)
+    conn = pool.get_connection()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(pool.get_connection()))
+    thread.start()
+    while pool.waiting_num < 1:
+        time.sleep(0.001)
+
+    pool._discard_connection(conn)
+    thread.join()
+
+    assert conn.closed
+    assert result[0].number == 2
+    assert pool.connection_num == 1
+
+
+def test_accounting_under_many_threads():
+    pool = FakePool(size=2, maxsize=4, timeout=5)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(200):
+                conn = pool.get_connection()
+                assert pool.connection_num <= 4
+                conn.close()
+        except Exception as exc:  # pragma: no cover
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert pool.connection_num == pool.size == pool.created <= 4
+
+
+def test_maintain_recycles_reaps_pings_and_tops_up():
+    pool = FakePool(size=2, maxsize=4, pre_create_num=0, idle_timeout=10, ping_interval=5,
+                    con_lifetime=3600, lifetime_jitter=0)
+    pool.maintain()
+    assert pool.connection_num == pool.size == 2
+
+    conns = [pool.get_connection() for _ in range(4)]
+    for conn in conns:
+        conn.close()
+    expiring, idle, dead, fresh = conns
+    expiring._expire_ts = time.time() - 1
+    idle._idle_since -= 20
+    idle._checked_at -= 20
+    dead._checked_at -= 6
+    dead.alive = False
+
+    pool.maintain()
+
+    assert expiring.closed and idle.closed and dead.closed
+    assert not fresh.closed
+    assert dead.pings == 1 and fresh.pings == 0
+    # one idle connection above size was reaped, the others replaced
+    assert pool.connection_num == pool.size == 3
+    assert pool.created == 6
+
+
+def test_maintain_stops_top_up_after_failed_create():
+    pool = FakePool(size=3, maxsize=4)
+
+    def refuse():
+        pool.created += 1
+        raise ConnectionError("refused")
+
+    pool._new_connection = refuse
+    pool.maintain()
+    assert pool.created == 1
+    assert pool.connection_num == 0
+
+    pool._new_connection = lambda: FakeConnection(0)
+    pool.maintain()
+    assert pool.connection_num == pool.size == 3
+
+
+def test_maintenance_thread_and_close():
+    pool = FakePool(size=2, maxsize=4, maintenance_interval=0.01)
+    deadline = time.monotonic() + 5
+    while pool.size < 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert pool.size == 2
+
+    idle = list(pool._pool)
+    pool.close()
+    assert pool._maintenance_thread is None
+    assert all(conn.closed for conn in idle)
+    assert pool.connection_num == 0
+
+
+def test_lifetime_jitter():
+    pool = FakePool(con_lifetime=1000, lifetime_jitter=0.5)
+    lifetimes = {pool._create_connection()._expire_ts - time.time() for _ in range(20)}
+    assert all(490 <= lifetime <= 1000 for lifetime in lifetimes)
+    assert len(lifetimes) > 1
+
+
+def test_idle_pre_ping_replaces_dead_connection():
+    pool = FakePool(size=1, maxsize=1, pre_ping="idle", ping_idle_threshold=10)
+    conn = pool.get_connection()
+    conn.close()
+
+    assert pool.get_connection() is conn
+    assert conn.pings == 0
+    conn.close()
+
+    conn._checked_at -= 11
+    conn.alive = False
+    replacement = pool.get_connection()
+    assert replacement is not conn
+    assert conn.pings == 1 and conn.closed
+    assert pool.connection_num == 1
+
+    replacement.close()
+    assert pool.get_connection(pre_ping=True) is replacement
+    assert replacement.pings == 1
+
+
+def test_invalid_pre_ping():
+    with pytest.raises(ValueError):
+        FakePool(pre_ping="sometimes")
+
+
+def test_pool_stats_and_prometheus_text():
+    pool = FakePool(size=2, maxsize=2, timeout=0, name="main")
+    first = pool.get_connection()
+    second = pool.get_connection()
+    with pytest.raises(GetConnectionFromPoolError):
+        pool.get_connection()
+    first.close()
+
+    stats = pool.stats()
+    assert (stats["in_use"], stats["idle"], stats["total"]) == (1, 1, 2)
+    assert (stats["created"], stats["timeouts"], stats["high_water"]) == (2, 1, 2)
+    assert stats["wait_time"]["count"] == 2
+    assert stats["hold_time"]["count"] == 1
+    assert stats["wait_time"]["buckets"][-1] == (float("inf"), 2)
+
+    text = prometheus_text(stats)
+    assert 'matdb_pool_connections{pool="main",state="in_use"} 1' in text
+    assert 'matdb_pool_checkout_timeouts_total{pool="main"} 1' in text
+    assert 'matdb_pool_checkout_wait_seconds_bucket{pool="main",le="+Inf"} 2' in text
+    assert "# TYPE matdb_pool_hold_seconds histogram" in text
+    second.close()
+
+
+def test_metered_pooled_db():
+    pool = MeteredPooledDB(
+        FakeDBAPIConnection, mincached=1, maxcached=1, maxconnections=2, failures=ConnectionError, name="mssql")
+    first = pool.connection()
+    second = pool.connection()
+    with pytest.raises(TooManyConnections):
+        pool.connection()
+    first.close()
+    second.close()
+
+    stats = pool.stats()
+    assert (stats["in_use"], stats["idle"], stats["maxsize"]) == (0, 1, 2)
+    assert (stats["created"], stats["closed"], stats["timeouts"]) == (2, 1, 1)
+    assert stats["high_water"] == 2
+    assert stats["hold_time"]["count"] == 2
@@ -0,0 +1,66 @@
+import pytest
+import sqlalchemy
+
+metadata = sqlalchemy.MetaData()
+rates = sqlalchemy.Table(
+    "rates",
+    metadata,
+    sqlalchemy.Column("code", sqlalchemy.String(3)),
+    sqlalchemy.Column("rate", sqlalchemy.Float),
+)
+
+
+def test_prepared_calls_skip_compilation(make_database):
+    database = make_database()
+    queries = database._backend._pool.executed
+    select = database.prepare("SELECT code FROM rates WHERE code = :code")
+    update = database.prepare(
+        rates.update().where(rates.c.code == sqlalchemy.bindparam("match"))
+    )
+    insert = database.prepare(rates.insert())
+    compiles = database._backend.statement_cache.stats()
+
+    for code in ("EUR", "USD"):
+        assert [record["code"] for record in select.fetch_all({"code": code})] == ["EUR", "USD"]
+    assert select.fetch_val({"code": "EUR"}) == "EUR"
+    assert update.execute({"match": "EUR", "rate": 1.5}) == 1
+    assert insert.execute_many([{"code": "EUR", "rate": 1.0}, {"code": "USD", "rate": 1.1}]) == 2
+    assert database._backend.statement_cache.stats() == compiles
+
+    assert queries[:3] == [
+        ("SELECT code FROM rates WHERE code = %(code)s", {"code": "EUR"}),
+        ("SELECT code FROM rates WHERE code = %(code)s", {"code": "USD"}),
+        ("SELECT code FROM rates WHERE code = %(code)s", {"code": "EUR"}),
+    ]
+    assert queries[3] == (
+        "UPDATE rates SET rate=%(rate)s WHERE rates.code = %(match)s",
+        {"rate": 1.5, "match": "EUR"},
+    )
+    assert queries[4] == (
+        "INSERT INTO rates (code, rate) VALUES (%(code)s, %(rate)s)",
+        [{"code": "EUR", "rate": 1.0}, {"code": "USD", "rate": 1.1}],
+    )
+
+    with pytest.raises(sqlalchemy.exc.InvalidRequestError):
+        select.fetch_all()
+
+
+def test_prepared_expanding_in_and_result_cache(make_database):
+    database = make_database(result_cache=True)
+    queries = database._backend._pool.executed
+    select = database.prepare(
+        sqlalchemy.select(rates.c.code).where(
+            rates.c.code.in_(sqlalchemy.bindparam("codes", expanding=True))
+        )
+    )
+    select.fetch_all({"codes": ["EUR", "USD"]})
+    assert queries[-1] == (
+        "SELECT rates.code \nFROM rates \nWHERE rates.code IN (%(codes_1)s, %(codes_2)s)",
+        {"codes_1": "EUR", "codes_2": "USD"},
+    )
+
+    query = "SELECT code FROM rates"
+    database.fetch_all(query, cache_ttl=60)
+    database.prepare("DELETE FROM rates WHERE code = :code").execute({"code": "EUR"})
+    database.fetch_all(query, cache_ttl=60)
+    assert [sql for sql, _ in queries].count(query) == 2
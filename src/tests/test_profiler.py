@@ -0,0 +1,36 @@
+import pytest
+
+from matdb.core import Database
+from matdb.profiler import PHASES, format_report
+
+
+def test_profile_report_times_each_phase(make_database):
+    database = make_database(
+        "mysql://localhost/test?profile=true",
+        pool_options={
+            "rows": [("alice",), ("bob",)],
+            "description": (("name", 253, None, 80, 80, 0, True),),
+        },
+    )
+
+    query = "SELECT name FROM users WHERE id > :id"
+    for _ in range(2):
+        assert len(database.fetch_all(query, {"id": 1})) == 2
+    assert database.fetch_all_as_json_string(query, {"id": 1}).startswith("[{")
+
+    report = database.profile_report()
+    assert [entry["calls"] for entry in report] == [3]
+    phases = report[0]["phases"]
+    assert report[0]["statement"] == "SELECT name FROM users WHERE id > ?"
+    assert all(phases[phase]["total_ns"] > 0 for phase in PHASES)
+    assert "SELECT name FROM users" in format_report(report)
+
+    database.reset_profile()
+    assert database.profile_report() == []
+
+
+def test_profiling_is_disabled_by_default():
+    database = Database("mysql://localhost/test")
+    assert database._backend.profiler is None
+    with pytest.raises(RuntimeError):
+        database.profile_report()
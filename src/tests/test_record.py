@@ -0,0 +1,35 @@
+import pickle
+
+import pytest
+
+from matdb.backend.record import CompactRecord, ResultColumns
+
+
+def test_compact_record_access():
+    columns = ResultColumns(["id", "name"])
+    record = columns.make_record((1, "a"))
+
+    assert record[0] == 1
+    assert record["name"] == "a"
+    assert record.name == "a"
+    assert record[-1] == "a"
+    assert list(record) == [1, "a"]
+    assert dict(record._mapping) == {"id": 1, "name": "a"}
+    assert record == (1, "a")
+    assert isinstance(record, CompactRecord)
+    assert not hasattr(record, "__dict__")
+    with pytest.raises(AttributeError):
+        record.missing
+
+
+def test_compact_record_applies_only_present_processors():
+    columns = ResultColumns(["id", "flag"], [None, bool])
+    assert columns.processors == [(1, bool)]
+    assert columns.make_record((1, 0)) == (1, False)
+
+
+def test_compact_record_pickles():
+    record = ResultColumns(["id", "name"]).make_record((1, "a"))
+    restored = pickle.loads(pickle.dumps(record))
+    assert isinstance(restored, CompactRecord)
+    assert restored.name == "a"
@@ -0,0 +1,76 @@
+import pytest
+
+from matdb.replicas import Replica, ReplicaSet
+
+
+def server_name(connection, query, args):
+    return [(connection.pool.name,)] if query.startswith("SELECT") else None
+
+
+@pytest.fixture
+def make_database(make_database):
+    def make(**options):
+        return make_database(
+            "mysql://primary/test",
+            replicas=["mysql://r1/test", "mysql://r2/test"],
+            pool_options={
+                "respond": server_name,
+                "description": (("server", 253, None, 255, 255, 0, True),),
+            },
+            **options,
+        )
+
+    return make
+
+
+def test_reads_go_to_replicas_and_writes_to_primary(make_database):
+    database = make_database()
+    servers = {database.fetch_val("SELECT 1") for _ in range(20)}
+    assert servers == {"r1", "r2"}
+    assert [record["server"] for record in database.iterate("SELECT 1")] in (["r1"], ["r2"])
+
+    database.execute("UPDATE t SET a = 1")
+    assert database._backend._pool.queries == ["UPDATE t SET a = 1"]
+
+    with database.transaction():
+        assert database.fetch_val("SELECT 1") == "primary"
+        database.execute("UPDATE t SET a = 2")
+    assert [query.split()[0] for query in database._backend._pool.queries] == [
+        "UPDATE",
+        "BEGIN",
+        "SELECT",
+        "UPDATE",
+        "COMMIT",
+    ]
+    assert all(stats["latency"] > 0 for stats in database.replica_stats())
+
+
+def test_failing_replica_is_taken_out_of_rotation(make_database):
+    database = make_database(replica_max_failures=2, replica_retry_interval=3600)
+    r1, r2 = database._replicas.replicas
+    r1.backend._pool.down = True
+    # a failed checkout falls back to the other replica
+    assert {database.fetch_val("SELECT 1") for _ in range(20)} == {"r2"}
+    assert [stats["in_rotation"] for stats in database.replica_stats()] == [False, True]
+
+    r2.backend._pool.down = True
+    assert database.fetch_val("SELECT 1") == "primary"
+
+
+def test_replica_set_prefers_lower_latency_and_probes_after_retry_interval():
+    fast, slow = Replica("fast", None), Replica("slow", None)
+    replicas = ReplicaSet([fast, slow], max_failures=1, retry_interval=0)
+    replicas.release(replicas.choose(exclude=[slow]), 0.001)
+    replicas.release(replicas.choose(exclude=[fast]), 0.1)
+    for _ in range(5):
+        replica = replicas.choose()
+        assert replica is fast
+        replicas.release(replica, 0.001)
+
+    replicas.release(replicas.choose(exclude=[slow]), failed=True)
+    # retry_interval elapsed: the next read probes the failed replica
+    replica = replicas.choose(exclude=[slow])
+    assert replica is fast
+    replicas.release(replica, 0.001)
+    assert fast.failures == 0
+
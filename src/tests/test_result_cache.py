@@ -0,0 +1,107 @@
+import time
+
+import sqlalchemy
+
+from matdb.result_cache import ResultCache, query_tables
+
+metadata = sqlalchemy.MetaData()
+currencies = sqlalchemy.Table(
+    "currencies",
+    metadata,
+    sqlalchemy.Column("code", sqlalchemy.String(3), primary_key=True),
+)
+rates = sqlalchemy.Table(
+    "rates",
+    metadata,
+    sqlalchemy.Column("code", sqlalchemy.String(3)),
+    sqlalchemy.Column("rate", sqlalchemy.Float),
+)
+
+
+def reads(database):
+    return sum(query.startswith("SELECT") for query in database._backend._pool.queries)
+
+
+def test_query_tables():
+    assert query_tables("SELECT * FROM `db`.`Users` u JOIN orders o ON u.id = o.uid") == {
+        "users",
+        "orders",
+    }
+    assert query_tables("SELECT a FROM t1, t2 AS x WHERE 1") == {"t1", "t2"}
+    assert query_tables("UPDATE [dbo].[rates] SET rate = 1") == {"rates"}
+    assert query_tables("INSERT INTO rates (code) SELECT code FROM currencies") == {
+        "rates",
+        "currencies",
+    }
+    assert query_tables("CALL refresh()") == set()
+    query = sqlalchemy.select(currencies).join(rates, rates.c.code == currencies.c.code)
+    assert query_tables(query) == {"currencies", "rates"}
+    assert query_tables(rates.update().values(rate=1.0)) == {"rates"}
+
+
+def test_result_cache_bounds_and_ttl():
+    cache = ResultCache(max_entries=2, default_ttl=60)
+    for index in range(3):
+        cache.put(index, [("x",)], ("t",), 60, cache.begin(("t",)))
+    assert [cache.get(index)[0] for index in range(3)] == [False, True, True]
+    assert cache.stats()["evictions"] == 1
+
+    cache.put("short", [("x",)], (), 0.01, cache.begin(()))
+    time.sleep(0.02)
+    assert cache.get("short") == (False, None)
+
+    # a write between the read's begin() and put() keeps its rows out
+    token = cache.begin(("t",))
+    cache.invalidate(["t"])
+    cache.put("stale", [("x",)], ("t",), 60, token)
+    assert cache.get("stale") == (False, None)
+
+    small = ResultCache(max_bytes=1000)
+    small.put("big", [("x" * 2000,)], (), 60, small.begin(()))
+    assert small.get("big") == (False, None)
+
+
+def test_cached_reads_and_invalidation(make_database):
+    database = make_database(result_cache=True)
+    query = sqlalchemy.select(currencies)
+    for _ in range(3):
+        assert [record["code"] for record in database.fetch_all(query, cache_ttl=60)] == ["EUR", "USD"]
+    assert reads(database) == 1
+    # no TTL: not cached
+    database.fetch_all(query)
+    assert reads(database) == 2
+
+    assert database.fetch_val("SELECT code FROM currencies WHERE code = :code", {"code": "EUR"}, cache_ttl=60) == "EUR"
+    assert database.fetch_val("SELECT code FROM currencies WHERE code = :code", {"code": "EUR"}, cache_ttl=60) == "EUR"
+    assert database.fetch_val("SELECT code FROM currencies WHERE code = :code", {"code": "USD"}, cache_ttl=60) == "EUR"
+    assert reads(database) == 4
+
+    database.execute(rates.insert().values(code="EUR", rate=1.0))
+    database.fetch_all(query, cache_ttl=60)
+    assert reads(database) == 4  # still cached
+
+    database.execute("UPDATE currencies SET code = 'EUR'")
+    database.fetch_all(query, cache_ttl=60)
+    assert reads(database) == 5
+
+    stats = database.result_cache_stats()
+    assert stats["hits"] == 4 and stats["invalidations"] == 2
+
+
+def test_statement_ttl_and_transactions(make_database):
+    database = make_database(result_cache=True)
+    query = sqlalchemy.select(currencies).execution_options(cache_ttl=60)
+    database.fetch_all(query)
+    with database.transaction():
+        database.execute("DELETE FROM currencies")
+        # read inside the transaction: not cached
+        database.fetch_all(query)
+        database.fetch_all(query)
+    assert reads(database) == 3
+    database.fetch_all(query)
+    database.fetch_all(query)
+    assert reads(database) == 4
+
+    database.invalidate_result_cache("CURRENCIES")
+    database.fetch_all(query)
+    assert reads(database) == 5
@@ -0,0 +1,80 @@
+import collections
+
+import pytest
+
+from matdb import ShardedDatabase
+from matdb.sharding import HashRing
+
+
+def shard_rows(connection, query, args):
+    pool = connection.pool
+    if query == "SELECT fail":
+        raise ValueError(pool.name)
+    return [(id, pool.name) for id in pool.ids] if query.startswith("SELECT") else None
+
+
+@pytest.fixture
+def make_database(fake_backend):
+    def make():
+        database = ShardedDatabase({"a": "mysql://a/test", "b": "mysql://b/test"})
+        for name, ids in (("a", [1, 4, 5]), ("b", [2, 3, 6])):
+            pool = fake_backend(
+                database.shards[name]._backend,
+                name=name,
+                respond=shard_rows,
+                description=(
+                    ("id", 3, None, 11, 11, 0, False),
+                    ("shard", 253, None, 255, 255, 0, True),
+                ),
+            )
+            pool.ids = ids
+        return database
+
+    return make
+
+
+def test_hash_ring_spreads_keys_and_moves_few_on_change():
+    ring = HashRing(["a", "b", "c", "d"])
+    before = {key: ring.get_node(key) for key in range(10000)}
+    counts = collections.Counter(before.values())
+    assert min(counts.values()) > 1500
+
+    ring.remove_node("d")
+    moved = [key for key in before if ring.get_node(key) != before[key]]
+    assert all(before[key] == "d" for key in moved)
+    ring.add_node("d")
+    assert {key: ring.get_node(key) for key in range(10000)} == before
+
+
+def test_routed_and_scattered_calls(make_database):
+    with make_database() as database:
+        shard = database.ring.get_node(42)
+        assert database.fetch_all("SELECT id FROM t", shard_key=42)[0]["shard"] == shard
+        records = database.fetch_all("SELECT id FROM t ORDER BY id", shard_key=42, order_by="id", limit=2)
+        assert len(records) == 2
+
+        records = database.fetch_all("SELECT id FROM t ORDER BY id", order_by="id", limit=4)
+        assert [record["id"] for record in records] == [1, 2, 3, 4]
+        records = database.iterate("SELECT id FROM t ORDER BY id", order_by=["id"], limit=5)
+        assert [record["id"] for record in records] == [1, 2, 3, 4, 5]
+        assert len(list(database.iterate("SELECT id FROM t"))) == 6
+
+        assert database.execute("UPDATE t SET x = 1") == [1, 1]
+        rows = [{"id": id} for id in range(20)]
+        assert database.execute_many("INSERT INTO t (id) VALUES (:id)", rows, shard_key="id") == 20
+
+        with pytest.raises(ValueError):
+            database.fetch_all("SELECT fail")
+        with pytest.raises(ValueError):
+            list(database.iterate("SELECT fail"))
+
+
+def test_transaction_stays_on_one_shard(make_database):
+    with make_database() as database:
+        shard = database.ring.get_node("customer-7")
+        with database.transaction("customer-7"):
+            database.execute("UPDATE t SET x = 1", shard_key="customer-7")
+        queries = database.shards[shard]._backend._pool.queries
+        assert queries == ["BEGIN", "UPDATE t SET x = 1", "COMMIT"]
+        other = next(name for name in database.shards if name != shard)
+        assert database.shards[other]._backend._pool.queries == []
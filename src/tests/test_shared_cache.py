@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import time
+import uuid
+
+import pytest
+import sqlalchemy
+
+from matdb.backend.record import ResultColumns
+from matdb.shared_cache import SharedResultCache
+
+metadata = sqlalchemy.MetaData()
+currencies = sqlalchemy.Table(
+    "currencies",
+    metadata,
+    sqlalchemy.Column("code", sqlalchemy.String(3), primary_key=True),
+)
+
+
+@pytest.fixture
+def name():
+    name = f"matdb-test-{uuid.uuid4().hex[:12]}"
+    yield name
+    cache = SharedResultCache(name, max_bytes=1024 * 1024, slot_size=4096)
+    cache.unlink()
+    cache.close()
+
+
+def _store(name, key):
+    cache = SharedResultCache(name, max_bytes=1024 * 1024, slot_size=4096)
+    cache.put(key, [("from", os.getpid())], ("t",), 60, cache.begin(("t",)))
+    cache.close()
+
+
+def test_instances_share_results_and_invalidations(name):
+    first = SharedResultCache(name, max_bytes=1024 * 1024, slot_size=4096)
+    second = SharedResultCache(name, max_bytes=1024 * 1024, slot_size=4096)
+    records = [ResultColumns(["code"]).record_class(("EUR",))]
+    first.put("rates", records, ("rates",), 60, first.begin(("rates",)))
+    hit, value = second.get("rates")
+    assert hit and value[0]["code"] == "EUR"
+
+    first.put("currencies", [("x",)], ("currencies",), 60, first.begin(("currencies",)))
+    second.invalidate(["rates"])
+    assert first.get("rates") == (False, None)
+    assert first.get("currencies")[0]
+
+    # a write between the read's begin() and put() keeps its rows out
+    token = first.begin(("rates",))
+    second.invalidate(["rates"])
+    first.put("rates", [("x",)], ("rates",), 60, token)
+    assert second.get("rates") == (False, None)
+
+    second.invalidate()
+    assert first.get("currencies") == (False, None)
+
+    first.put("short", [("x",)], (), 0.01, first.begin(()))
+    time.sleep(0.02)
+    assert first.get("short") == (False, None)
+    first.put("big", [("x" * 5000,)], (), 60, first.begin(()))
+    assert first.get("big") == (False, None)
+
+    with pytest.raises(ValueError):
+        SharedResultCache(name, max_bytes=1024 * 1024, slot_size=8192)
+    first.close()
+    second.close()
+
+
+def test_results_cross_processes(name):
+    process = multiprocessing.get_context("spawn").Process(target=_store, args=(name, "key"))
+    process.start()
+    process.join()
+    cache = SharedResultCache(name, max_bytes=1024 * 1024, slot_size=4096)
+    assert cache.get("key") == (True, [("from", process.pid)])
+    cache.close()
+
+
+def test_databases_share_cached_reads(make_database, name):
+    options = dict(
+        result_cache="shared",
+        result_cache_name=name,
+        result_cache_bytes=1024 * 1024,
+        result_cache_slot_size=4096,
+    )
+    first, second = make_database(**options), make_database(**options)
+    query = sqlalchemy.select(currencies)
+    assert [record["code"] for record in first.fetch_all(query, cache_ttl=60)] == ["EUR", "USD"]
+    assert [record["code"] for record in second.fetch_all(query, cache_ttl=60)] == ["EUR", "USD"]
+    assert (len(first._backend._pool.queries), len(second._backend._pool.queries)) == (1, 0)
+
+    second.execute("DELETE FROM currencies WHERE code = 'USD'")
+    first.fetch_all(query, cache_ttl=60)
+    assert len(first._backend._pool.queries) == 2
+    assert second.result_cache_stats()["live_slots"] == 1
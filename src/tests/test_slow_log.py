@@ -0,0 +1,65 @@
+import logging
+
+from matdb.events import QueryEvent
+from matdb.slow_log import SlowQueryLog
+
+
+class FakeConnection:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def acquire(self):
+        self.backend.acquired += 1
+
+    def release(self):
+        self.backend.released += 1
+
+    def explain(self, query, args):
+        return f"plan for {query}"
+
+
+class FakeBackend:
+    def __init__(self):
+        self.acquired = self.released = 0
+
+    def connection(self):
+        return FakeConnection(self)
+
+
+def make_event(sql, duration, args=None):
+    event = QueryEvent(sql, {"id": 42} if args is None else args, 1)
+    event.execute_time = duration
+    event.rows = 1
+    return event
+
+
+def test_slow_queries_are_logged_with_plan(caplog):
+    backend = FakeBackend()
+    slow_log = SlowQueryLog(backend, threshold=0.5, explain=True)
+    with caplog.at_level(logging.WARNING, logger="databases.slow"):
+        slow_log(make_event("SELECT * FROM users WHERE id = %(id)s", 0.1))
+        slow_log(make_event("SELECT * FROM users WHERE id = %(id)s", 0.7))
+        slow_log(make_event("INSERT INTO users (id) VALUES (%(id)s)", 0.9, args=[{"id": 1}]))
+        slow_log.close()
+
+    records = sorted(caplog.records, key=lambda record: record.slow_query["duration"])
+    assert [record.slow_query["duration"] for record in records] == [0.7, 0.9]
+    assert records[0].slow_query["plan"] == "plan for SELECT * FROM users WHERE id = %(id)s"
+    assert records[0].slow_query["args"] == "{'id': 42}"
+    # executemany batches are not explained
+    assert records[1].slow_query["plan"] is None
+    assert backend.acquired == backend.released == 1
+
+
+def test_slow_log_sampling_and_redaction(caplog):
+    slow_log = SlowQueryLog(FakeBackend(), threshold=0.5, sample_rate=0.0)
+    with caplog.at_level(logging.WARNING, logger="databases.slow"):
+        slow_log(make_event("SELECT 1", 1.0))
+        assert not caplog.records
+
+        slow_log.sample_rate, slow_log.redact = 1.0, True
+        slow_log(make_event("SELECT * FROM users WHERE name = 'bob'", 1.0))
+
+    record = caplog.records[0].slow_query
+    assert record["sql"] == "SELECT * FROM users WHERE name = ?"
+    assert record["args"] == "<redacted>"
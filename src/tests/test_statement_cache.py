@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy import column, select, table, text
+
+from matdb.backend.mysql import MySQLBackend
+from matdb.backend.statement_cache import StatementCache
+
+users = table("users", column("id"), column("name"))
+
+
+def test_statement_cache_lru_eviction():
+    cache = StatementCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats() == {
+        "size": 2,
+        "maxsize": 2,
+        "eviction": "lru",
+        "hits": 2,
+        "misses": 1,
+        "evictions": 1,
+    }
+
+
+def test_statement_cache_fifo_eviction():
+    cache = StatementCache(maxsize=2, eviction="fifo")
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_statement_cache_invalid_eviction():
+    with pytest.raises(ValueError):
+        StatementCache(eviction="random")
+
+
+def test_compile_reuses_statement_for_new_values():
+    backend = MySQLBackend("mysql://localhost/test")
+    connection = backend.connection()
+
+    query = text("SELECT * FROM users WHERE id = :id")
+    sql, args, context = connection._compile(query.bindparams(id=1))
+    assert args == {"id": 1}
+    sql2, args2, context2 = connection._compile(query.bindparams(id=2))
+    assert sql2 == sql
+    assert args2 == {"id": 2}
+    assert context2 is context
+    assert backend.statement_cache.hits == 1
+    assert backend.statement_cache.misses == 1
+
+
+def test_compile_expands_in_lists_per_call():
+    backend = MySQLBackend("mysql://localhost/test")
+    connection = backend.connection()
+
+    sql, args, _ = connection._compile(
+        select(users).where(users.c.id.in_([1, 2])).limit(5)
+    )
+    assert sql.count("%(id_1_") == 2
+    assert sorted(args.values()) == [1, 2, 5]
+
+    sql, args, _ = connection._compile(
+        select(users).where(users.c.id.in_([7, 8, 9])).limit(1)
+    )
+    assert sql.count("%(id_1_") == 3
+    assert sorted(args.values()) == [1, 7, 8, 9]
+    assert backend.statement_cache.hits == 1
+
+
+def test_compile_with_cache_disabled():
+    backend = MySQLBackend("mysql://localhost/test?statement_cache_size=0")
+    connection = backend.connection()
+
+    sql, args, _ = connection._compile(select(users).where(users.c.id == 3))
+    assert args == {"id_1": 3}
+    assert len(backend.statement_cache) == 0
+
+
+def test_build_query_reuses_text_template():
+    from matdb.core import Connection, _text_template
+
+    sql = "SELECT * FROM users WHERE name = :name"
+    first = Connection._build_query(sql, {"name": "a"})
+    second = Connection._build_query(sql, {"name": "b"})
+    assert first is not second
+    assert Connection._build_query(sql) is _text_template(sql)
+
+    backend = MySQLBackend("mysql://localhost/test")
+    connection = backend.connection()
+    assert connection._compile(first)[1] == {"name": "a"}
+    assert connection._compile(second)[1] == {"name": "b"}
+    assert backend.statement_cache.hits == 1
+
+
+def test_result_metadata_reused_per_description():
+    backend = MySQLBackend("mysql://localhost/test")
+    connection = backend.connection()
+    description = (("id", 3, None, 11, 11, 0, False),)
+
+    query = text("SELECT id FROM users WHERE id = :id")
+    _, _, context = connection._compile(query.bindparams(id=1))
+    factory = context.record_factory(description, "row")
+    metadata = context.result_metadata(description)
+
+    _, _, context2 = connection._compile(query.bindparams(id=2))
+    assert context2.record_factory(list(description), "row") is factory
+    assert context2.result_metadata(description) is metadata
+    assert context2.record_factory(description, "compact") is not factory
+    assert factory((5,))[0] == 5
@@ -0,0 +1,60 @@
+import pytest
+
+from matdb.core import Database
+from matdb.events import QueryEvent
+from matdb.statement_stats import StatementStats, fingerprint
+
+
+def test_fingerprint_strips_literals_and_collapses_lists():
+    assert fingerprint(
+        "SELECT * FROM users WHERE id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)"
+    ) == fingerprint("SELECT * FROM users WHERE id IN (%(id_1_1)s)")
+    assert fingerprint(
+        "SELECT  name FROM t1\n WHERE name = 'it''s' AND age > 42 LIMIT 10"
+    ) == "SELECT name FROM t1 WHERE name = ? AND age > ? LIMIT ?"
+    assert fingerprint(
+        "INSERT INTO t (a, b) VALUES (%(a__0)s, %(b__0)s), (%(a__1)s, %(b__1)s)"
+    ) == "INSERT INTO t (a, b) VALUES (?, ?)"
+
+
+def make_event(sql, duration, rows=1, error=None, cache_hit=True):
+    event = QueryEvent(sql, {}, 0, cache_hit)
+    event.execute_time = duration
+    event.rows = rows
+    event.error = error
+    return event
+
+
+def test_statement_stats_aggregates_by_fingerprint():
+    stats = StatementStats(max_statements=2)
+    for value in range(100):
+        stats(make_event(f"SELECT * FROM users WHERE id = {value}", value / 1000))
+    stats(make_event("DELETE FROM users", 1.0, rows=0, error=ValueError(), cache_hit=False))
+
+    users, delete = stats.snapshot()
+    assert (delete["fingerprint"], delete["errors"], delete["cache_hits"]) == (
+        "DELETE FROM users", 1, 0
+    )
+    assert users["fingerprint"] == "SELECT * FROM users WHERE id = ?"
+    assert (users["calls"], users["rows"], users["cache_hits"]) == (100, 100, 100)
+    assert users["mean_time"] == pytest.approx(0.0495)
+    assert users["p50_time"] == pytest.approx(0.050)
+    assert users["p99_time"] == pytest.approx(0.099)
+
+    # the least called fingerprint makes room for a new one
+    stats(make_event("UPDATE users SET name = 'x'", 0.5))
+    assert {entry["fingerprint"] for entry in stats.snapshot()} == {
+        "SELECT * FROM users WHERE id = ?",
+        "UPDATE users SET name = ?",
+    }
+    stats.reset()
+    assert stats.snapshot() == []
+
+
+def test_database_statement_stats_option():
+    database = Database("mysql://localhost/test?statement_stats=true")
+    assert database.hooks.active
+    assert database.statement_stats() == []
+
+    with pytest.raises(RuntimeError):
+        Database("mysql://localhost/test").statement_stats()